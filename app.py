@@ -1,14 +1,26 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
 import sqlite3
-import requests
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
 import time
-from fpdf import FPDF
-import bcrypt
-import os
+
+from cyberfinance.config import USUARIO_PADRAO, LISTA_CATEGORIAS, MOEDAS_SUPORTADAS
+from cyberfinance import movimentacoes as mov
+from cyberfinance import importacao
+from cyberfinance import migracoes
+from cyberfinance import metricas
+from cyberfinance import auditoria
+from cyberfinance import backup
+from cyberfinance import arquivo_frio
+from cyberfinance import metas
+from cyberfinance import busca
+from cyberfinance import previsao
+from cyberfinance import recorrencias
+from cyberfinance import shards
+from cyberfinance import cotacoes
+from cyberfinance.cache import incrementar_versao
+from cyberfinance import auth
+from cyberfinance.servicos import lancar_despesa, lancar_receita
 
 # --- 1. CONFIGURAÇÃO E ESTILO PREMIUM ---
 st.set_page_config(page_title="CyberFinance Pro", page_icon="💎", layout="wide")
@@ -74,147 +86,27 @@ def aplicar_ui_cyber():
     </style>
     """, unsafe_allow_html=True)
 
-# --- 2. CORE: BANCO DE DADOS ---
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_DIR = os.path.join(BASE_DIR, "data")
-DATA_DIR_OK = True
-try:
-    os.makedirs(DATA_DIR, exist_ok=True)
-except Exception:
-    DATA_DIR_OK = False
-
-DB_FILE = os.path.join(DATA_DIR, "financeiro.db") if DATA_DIR_OK else os.path.join(BASE_DIR, "financeiro.db")
-USUARIO_PADRAO = "admin"
-SENHA_PADRAO_TEXTO = "1234" # Senha para comparação de fallback
-LISTA_CATEGORIAS = ["Alimentação", "Transporte", "Lazer", "Educação", "Hardware", "Contas Fixas", "Outros"]
-
-def init_db():
-    with sqlite3.connect(DB_FILE) as conn:
-        c = conn.cursor()
-        c.execute('CREATE TABLE IF NOT EXISTS movimentacoes (id INTEGER PRIMARY KEY AUTOINCREMENT, data DATE, categoria TEXT, descricao TEXT, valor REAL, tipo TEXT)')
-        c.execute('CREATE TABLE IF NOT EXISTS logs_auditoria (id INTEGER PRIMARY KEY AUTOINCREMENT, data_hora TEXT, acao TEXT, usuario TEXT)')
-        c.execute('CREATE TABLE IF NOT EXISTS metas (categoria TEXT PRIMARY KEY, valor_limite REAL)')
-        c.execute('CREATE TABLE IF NOT EXISTS metas_usuario (categoria TEXT NOT NULL, usuario TEXT NOT NULL, valor_limite REAL, PRIMARY KEY (categoria, usuario))')
-        c.execute('CREATE TABLE IF NOT EXISTS usuarios (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE NOT NULL, password_hash TEXT NOT NULL, criado_em TEXT)')
-        
-        # Inicializa metas zeradas se não existirem (legado)
-        c.execute("SELECT COUNT(*) FROM metas")
-        if c.fetchone()[0] == 0:
-            for cat in LISTA_CATEGORIAS:
-                c.execute("INSERT INTO metas (categoria, valor_limite) VALUES (?, ?)", (cat, 0.0))
-        # Garante usuário admin padrão no banco
-        c.execute("SELECT COUNT(*) FROM usuarios WHERE username = ?", (USUARIO_PADRAO,))
-        if c.fetchone()[0] == 0:
-            hash_admin = bcrypt.hashpw(SENHA_PADRAO_TEXTO.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-            c.execute("INSERT INTO usuarios (username, password_hash, criado_em) VALUES (?,?,?)",
-                      (USUARIO_PADRAO, hash_admin, datetime.now().strftime("%Y-%m-%d %H:%M")))
-        conn.commit()
-
-def run_query(q, p=()):
-    with sqlite3.connect(DB_FILE) as conn:
-        conn.execute(q, p); conn.commit()
-
-def get_data(q):
-    with sqlite3.connect(DB_FILE) as conn:
-        return pd.read_sql(q, conn)
-
-def ensure_schema_per_user():
-    with sqlite3.connect(DB_FILE) as conn:
-        c = conn.cursor()
-
-        # movimentacoes: adiciona coluna usuario se não existir
-        cols_mov = [r[1] for r in c.execute("PRAGMA table_info(movimentacoes)").fetchall()]
-        if "usuario" not in cols_mov:
-            c.execute("ALTER TABLE movimentacoes ADD COLUMN usuario TEXT")
-            c.execute("UPDATE movimentacoes SET usuario = ? WHERE usuario IS NULL", (USUARIO_PADRAO,))
-
-        # metas_usuario: cria se não existir e migra metas legadas
-        c.execute('CREATE TABLE IF NOT EXISTS metas_usuario (categoria TEXT NOT NULL, usuario TEXT NOT NULL, valor_limite REAL, PRIMARY KEY (categoria, usuario))')
-        c.execute("SELECT COUNT(*) FROM metas_usuario")
-        if c.fetchone()[0] == 0:
-            # migra metas legadas para admin
-            for cat, val in c.execute("SELECT categoria, valor_limite FROM metas").fetchall():
-                c.execute("INSERT OR REPLACE INTO metas_usuario (categoria, usuario, valor_limite) VALUES (?, ?, ?)", (cat, USUARIO_PADRAO, val))
-
-        conn.commit()
-
-def seed_metas_usuario(usuario):
-    with sqlite3.connect(DB_FILE) as conn:
-        c = conn.cursor()
-        for cat in LISTA_CATEGORIAS:
-            c.execute("SELECT COUNT(*) FROM metas_usuario WHERE categoria = ? AND usuario = ?", (cat, usuario))
-            if c.fetchone()[0] == 0:
-                c.execute("INSERT INTO metas_usuario (categoria, usuario, valor_limite) VALUES (?, ?, ?)", (cat, usuario, 0.0))
-        conn.commit()
-
-def ensure_users_table():
-    try:
-        with sqlite3.connect(DB_FILE) as conn:
-            conn.execute("SELECT 1 FROM usuarios LIMIT 1")
-    except sqlite3.OperationalError:
-        # Cria a tabela caso o banco tenha sido gerado antes da migração
-        init_db()
-
-def get_user_hash(username):
-    ensure_users_table()
-    with sqlite3.connect(DB_FILE) as conn:
-        c = conn.cursor()
-        c.execute("SELECT password_hash FROM usuarios WHERE username = ?", (username,))
-        row = c.fetchone()
-        return row[0] if row else None
-
-def create_user(username, password):
-    ensure_users_table()
-    ensure_schema_per_user()
-    senha_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-    run_query("INSERT INTO usuarios (username, password_hash, criado_em) VALUES (?,?,?)",
-              (username, senha_hash, datetime.now().strftime("%Y-%m-%d %H:%M")))
-    seed_metas_usuario(username)
-
-# --- 3. FUNCIONALIDADES AUXILIARES ---
-class PDFRelatorio(FPDF):
-    def header(self):
-        self.set_font('Arial', 'B', 15)
-        self.cell(0, 10, 'RELATORIO CYBERFINANCE', 0, 1, 'C')
-
-def gerar_pdf(df_v):
-    pdf = PDFRelatorio(); pdf.add_page(); pdf.set_font("Arial", size=12)
-    def txt(t): return str(t).encode('latin-1', 'replace').decode('latin-1')
-    
-    r = df_v[df_v['tipo']=='Receita']['valor'].sum()
-    d = df_v[df_v['tipo']=='Despesa']['valor'].sum()
-    
-    pdf.cell(0, 10, txt(f"Resumo Financeiro do Periodo"), 0, 1)
-    pdf.cell(0, 10, txt(f"Total Ganhos: R$ {r:.2f}"), 0, 1)
-    pdf.cell(0, 10, txt(f"Total Gastos: R$ {d:.2f}"), 0, 1)
-    pdf.cell(0, 10, txt(f"Saldo Final: R$ {r-d:.2f}"), 0, 1)
-    pdf.ln(10)
-    pdf.cell(0, 10, txt("Extrato Detalhado:"), 0, 1)
-    
-    for index, row in df_v.iterrows():
-        linha = f"{row['data']} | {row['tipo']} | {row['categoria']} | R$ {row['valor']:.2f}"
-        pdf.cell(0, 10, txt(linha), 0, 1)
-        
-    return bytes(pdf.output())
-
-def classificar_ia(desc):
-    d = desc.lower()
-    if any(x in d for x in ['mc', 'pizza', 'ifood', 'burger', 'comida', 'restaurante']): return "Alimentação"
-    if any(x in d for x in ['uber', 'gasolina', 'posto', 'shell', '99', 'metro']): return "Transporte"
-    if any(x in d for x in ['netflix', 'spotify', 'steam', 'cinema', 'game', 'prime']): return "Lazer"
-    if any(x in d for x in ['faculdade', 'curso', 'livro', 'udemy', 'alura']): return "Educação"
-    if any(x in d for x in ['monitor', 'mouse', 'teclado', 'placa', 'ssd', 'ram']): return "Hardware"
-    if any(x in d for x in ['luz', 'agua', 'internet', 'aluguel']): return "Contas Fixas"
-    return "Outros"
-
 # --- INICIALIZAÇÃO ---
-init_db()
-ensure_schema_per_user()
+# Migrações versionadas: só a primeira execução do processo toca no schema
+migracoes.migrar()
+metricas.instalar()
+backup.iniciar_agendador()
 aplicar_ui_cyber()
 
 # --- 4. LOGIN (COM HASHING & FALLBACK) ---
 if 'logado' not in st.session_state: st.session_state['logado'] = False
 
+# Sessão assinada na URL: recarregar a página não pede login de novo; conferida a cada rerun,
+# então um token revogado (logout em outra aba, troca de senha) ou vencido derruba a sessão
+usuario_token = auth.validar_token(st.query_params.get("sessao"))
+if usuario_token:
+    st.session_state['logado'] = True
+    st.session_state['usuario'] = usuario_token
+elif st.session_state['logado'] and "sessao" in st.query_params:
+    st.session_state['logado'] = False
+    st.session_state.pop('usuario', None)
+    st.query_params.pop("sessao", None)
+
 if not st.session_state['logado']:
     _, col, _ = st.columns([1,1.5,1])
     with col:
@@ -227,33 +119,20 @@ if not st.session_state['logado']:
             p = st.text_input("Chave de Acesso", type="password", key="login_pass")
 
             if st.button("AUTENTICAR"):
-                senha_correta = False
-
-                # 1) Validação por usuário cadastrado
-                hash_salvo = get_user_hash(u)
-                if hash_salvo:
-                    try:
-                        if bcrypt.checkpw(p.encode('utf-8'), hash_salvo.encode('utf-8')):
-                            senha_correta = True
-                    except:
-                        pass
-                elif u:
-                    st.info("Usuário não encontrado. Use a aba Cadastrar.")
-
-                # 2) Fallback do admin (senha texto) para não travar acesso
-                if not senha_correta and u == USUARIO_PADRAO and p == SENHA_PADRAO_TEXTO:
-                    senha_correta = True
+                # bcrypt no pool do módulo auth (inclui o fallback do admin)
+                with st.spinner("Descriptografando acesso..."):
+                    senha_correta = auth.autenticar(u, p)
 
                 if senha_correta:
-                    with st.spinner("Descriptografando acesso..."):
-                        time.sleep(0.8)
                     st.session_state['logado'] = True
                     st.session_state['usuario'] = u
-                    seed_metas_usuario(u)
-                    run_query("INSERT INTO logs_auditoria (data_hora, acao, usuario) VALUES (?,?,?)", 
-                              (datetime.now().strftime("%Y-%m-%d %H:%M"), "Login Realizado", u))
+                    st.query_params["sessao"] = auth.emitir_token(u)
+                    auditoria.registrar("Login Realizado", u)
+                    incrementar_versao(u)
                     st.rerun()
                 else:
+                    if u and not auth.get_user_hash(u):
+                        st.info("Usuário não encontrado. Use a aba Cadastrar.")
                     st.error("ACESSO NEGADO: Credenciais Inválidas")
 
         with tab_cadastro:
@@ -268,11 +147,10 @@ if not st.session_state['logado']:
                     st.warning("As senhas não conferem.")
                 else:
                     try:
-                        create_user(nu, np)
-                        run_query("INSERT INTO logs_auditoria (data_hora, acao, usuario) VALUES (?,?,?)",
-                                  (datetime.now().strftime("%Y-%m-%d %H:%M"), "Usuário Criado", nu))
+                        auth.create_user(nu, np)
+                        auditoria.registrar("Usuário Criado", nu)
                         # Confirma se o usuário ficou persistido
-                        if get_user_hash(nu):
+                        if auth.get_user_hash(nu):
                             st.success("Usuário criado com sucesso. Faça login.")
                         else:
                             st.error("Falha ao persistir o usuário. Verifique permissões do banco.")
@@ -283,12 +161,14 @@ if not st.session_state['logado']:
     st.stop()
 
 # --- 5. SIDEBAR (MENU LATERAL) ---
-with st.sidebar:
+with st.sidebar, metricas.secao("sidebar"):
     usuario_atual = st.session_state.get('usuario', USUARIO_PADRAO)
     st.markdown(f"### 👤 USUÁRIO: {usuario_atual.upper()}")
     if st.button("🔒 Encerrar Sessão"): 
+        auth.encerrar_sessoes(usuario_atual)  # o token da URL deixa de valer (e o de outras abas também)
         st.session_state['logado'] = False
         st.session_state.pop('usuario', None)
+        st.query_params.pop("sessao", None)
         st.rerun()
     st.divider()
 
@@ -302,104 +182,144 @@ with st.sidebar:
             cat = st.selectbox("Categoria", ["Auto"] + LISTA_CATEGORIAS)
             val = st.number_input("Valor Total", min_value=0.0, step=0.01)
             par = st.slider("Parcelas", 1, 12, 1)
+            fixa = st.checkbox("Conta fixa (repete todo mês)")
             if st.form_submit_button("Lançar Despesa"):
-                cat_f = classificar_ia(dsc) if cat == "Auto" else cat
-                for i in range(par):
-                    d_p = dt + relativedelta(months=i)
-                    valor_parc = val / par
-                    desc_final = f"{dsc} ({i+1}/{par})" if par > 1 else dsc
-                    run_query("INSERT INTO movimentacoes (data, categoria, descricao, valor, tipo, usuario) VALUES (?,?,?,?,?,?)", 
-                              (d_p, cat_f, desc_final, valor_parc, "Despesa", usuario_atual))
-                st.success("Despesa Gravada!")
-                time.sleep(0.5)
-                st.rerun()
+                try:
+                    lancar_despesa(usuario_atual, dt, dsc, val, cat, parcelas=par, fixa=fixa)
+                except ValueError as e:
+                    st.error(str(e))
+                else:
+                    st.success("Despesa Gravada!")
+                    time.sleep(0.5)
+                    st.rerun()
 
     with t_rec:
         with st.form("fr"):
             rd = st.date_input("Data", key="rd")
             rs = st.text_input("Fonte")
             rv = st.number_input("Valor", min_value=0.0, step=0.01, key="rv")
+            fixa_r = st.checkbox("Repete todo mês", key="rfixa")
             if st.form_submit_button("Salvar Receita"):
-                run_query("INSERT INTO movimentacoes (data, categoria, descricao, valor, tipo, usuario) VALUES (?,?,?,?,?,?)", 
-                          (rd, "Receita", rs, rv, "Receita", usuario_atual))
+                lancar_receita(usuario_atual, rd, rs, rv, fixa=fixa_r)
                 st.rerun()
 
     with t_csv:
         arq = st.file_uploader("Subir CSV", type="csv")
         if arq and st.button("Processar CSV"):
             try:
-                df_c = pd.read_csv(arq)
-                count = 0
-                for _, r in df_c.iterrows():
-                    # Adapte as colunas conforme seu CSV
-                    run_query("INSERT INTO movimentacoes (data, categoria, descricao, valor, tipo, usuario) VALUES (?,?,?,?,?,?)", 
-                              (r.get('Data', datetime.now()), r.get('Categoria', 'Outros'), r.get('Descricao','Importado CSV'), r.get('Valor', 0), r.get('Tipo','Despesa'), usuario_atual))
-                    count += 1
-                st.success(f"{count} registros importados!")
+                barra = st.progress(0.0, text="Importando...")
+                def _progresso(p):
+                    barra.progress(p['fracao'] or 0.0, text=f"{p['lidas']} linhas lidas ({p['linhas_por_s']:,.0f} linhas/s)")
+                res = importacao.importar_csv(arq, usuario_atual, progresso=_progresso)
+                barra.progress(1.0, text=f"Concluído em {res['segundos']:.1f}s")
+                st.success(f"{res['inseridas']} registros importados!")
+                if res['duplicadas']:
+                    st.info(f"{res['duplicadas']} linhas já existentes foram ignoradas.")
             except Exception as e:
                 st.error(f"Erro ao ler CSV: {e}")
 
+    regras = recorrencias.regras(usuario_atual)
+    ativas = regras[regras["encerrada_em"].isna()]
+    if len(ativas):
+        with st.expander(f"🔁 Recorrências e parcelamentos ({len(ativas)})"):
+            rotulos = {f"{r.descricao} · R$ {r.valor_centavos / 100:,.2f}"
+                       f"{f' em {r.quantidade:.0f}x' if r.parcelado else '/mês'} · desde {r.inicio}": r.id
+                       for r in ativas.itertuples()}
+            escolha = st.selectbox("Regra", list(rotulos), key="rec_sel")
+            e1, e2 = st.columns(2)
+            if e1.button("Encerrar", help="Para as próximas ocorrências; as passadas continuam"):
+                recorrencias.encerrar(usuario_atual, rotulos[escolha])
+                st.rerun()
+            if e2.button("Excluir", help="Remove a regra e todas as ocorrências"):
+                recorrencias.excluir(usuario_atual, rotulos[escolha])
+                st.rerun()
+
     st.divider()
     st.subheader("💱 Conversor Rápido")
-    moeda = st.selectbox("Converter de:", ["USD", "EUR", "BTC"])
+    moeda = st.selectbox("Converter de:", MOEDAS_SUPORTADAS)
     v_ext = st.number_input("Valor Estrangeiro", 0.0, key="ve")
     if st.button("Ver Cotação em BRL"):
         try:
-            url = f"https://economia.awesomeapi.com.br/last/{moeda}-BRL"
-            res = requests.get(url).json()
-            cotacao = float(res[f"{moeda}BRL"]["bid"])
+            res = cotacoes.get_servico().cotacao(moeda)
+            cotacao = res["valor"]
             convertido = v_ext * cotacao
             st.info(f"Cotação: R$ {cotacao:.2f}")
             st.success(f"**Total: R$ {convertido:.2f}**")
-        except:
+            if res["origem"] == "historico":
+                st.caption(f"⚠️ API indisponível: usando a última cotação conhecida ({res['obtido_em']}).")
+        except cotacoes.ErroCotacao:
             st.warning("Sem conexão com a API de moedas.")
 
 # --- 6. PAINEL CENTRAL (DASHBOARD) ---
 usuario_atual = st.session_state.get('usuario', USUARIO_PADRAO)
-df = get_data(f"SELECT * FROM movimentacoes WHERE usuario = '{usuario_atual}'")
-metas_df = get_data(f"SELECT * FROM metas_usuario WHERE usuario = '{usuario_atual}'")
+meses_disponiveis = mov.listar_meses(usuario_atual)
 
 col_t, col_p = st.columns([4,1])
 col_t.title("📊 Terminal CyberFinance")
 
-# Botão de PDF
-def gerar_pdf(df_v):
-    pdf = PDFRelatorio(); pdf.add_page(); pdf.set_font("Arial", size=12)
-    def txt(t): return str(t).encode('latin-1', 'replace').decode('latin-1')
-    
-    r = df_v[df_v['tipo']=='Receita']['valor'].sum()
-    d = df_v[df_v['tipo']=='Despesa']['valor'].sum()
-    
-    pdf.cell(0, 10, txt(f"Resumo Financeiro do Periodo"), 0, 1)
-    pdf.cell(0, 10, txt(f"Total Ganhos: R$ {r:.2f}"), 0, 1)
-    pdf.cell(0, 10, txt(f"Total Gastos: R$ {d:.2f}"), 0, 1)
-    pdf.cell(0, 10, txt(f"Saldo Final: R$ {r-d:.2f}"), 0, 1)
-    pdf.ln(10)
-    pdf.cell(0, 10, txt("Extrato Detalhado:"), 0, 1)
-    
-    for index, row in df_v.iterrows():
-        linha = f"{row['data']} | {row['tipo']} | {row['categoria']} | R$ {row['valor']:.2f}"
-        pdf.cell(0, 10, txt(linha), 0, 1)
-        
-    # CORREÇÃO AQUI: Forçamos a saída como String ('S') e codificamos para bytes
-    return pdf.output(dest='S').encode('latin-1')
+# Botão de PDF (renderizado em segundo plano; fica pronto sem travar o painel)
+def botao_pdf(usuario, mes):
+    from cyberfinance import relatorio  # fpdf só é carregado depois do login
+
+    futuro = relatorio.solicitar_relatorio(usuario, mes)
+    if not futuro.done():
+        aguardar_pdf(usuario, mes)
+    elif futuro.exception() is not None:
+        st.caption("⚠️ Falha ao gerar PDF.")
+    else:
+        st.download_button("📄 PDF", futuro.result(), file_name=f"relatorio_{mes}.pdf", mime="application/pdf")
+
+# Só existe enquanto o PDF está pendente: pronto, o app roda de novo e o fragmento some (e para de consultar)
+@st.fragment(run_every="2s")
+def aguardar_pdf(usuario, mes):
+    from cyberfinance import relatorio
+
+    if relatorio.solicitar_relatorio(usuario, mes).done():
+        st.rerun()
+    st.caption("⏳ Gerando PDF...")
+
+# Gráficos: o Plotly é pesado e só é importado quando um gráfico é desenhado (nunca na tela de acesso)
+def grafico_categorias(alvo, gastos_cat):
+    import plotly.express as px
+
+    fig = px.bar(gastos_cat, x='categoria', y='valor', color='valor',
+                 title="Gastos por Categoria", template="plotly_dark",
+                 color_continuous_scale=['#00ADB5', '#00f5d4'])
+    alvo.plotly_chart(fig, use_container_width=True)
+
+def grafico_balanco(alvo, totais):
+    import plotly.express as px
+
+    fig = px.pie(totais, values='valor', names='tipo', hole=0.5,
+                 title="Balanço Mensal", template="plotly_dark",
+                 color='tipo',
+                 color_discrete_map={'Receita':'#00f5d4','Despesa':'#ff2e63'})
+    alvo.plotly_chart(fig, use_container_width=True)
+
+def grafico_linhas(dados, titulo, media=None):
+    import plotly.express as px
+
+    fig = px.line(dados, title=titulo, markers=True)
+    if media is not None:
+        fig.add_hline(y=media, line_dash="dot", line_color="red", annotation_text="Média")
+    fig.update_layout(template="plotly_dark")
+    st.plotly_chart(fig, use_container_width=True)
+
 # ABAS DO SISTEMA
 tab_dash, tab_busca, tab_metas, tab_previsao, tab_aud = st.tabs(["📈 Painel", "🔍 Busca Global", "🎯 Metas", "🔮 Previsão", "🛡️ Auditoria"])
 
-with tab_dash:
-    if not df.empty:
-        df['data'] = pd.to_datetime(df['data'])
-        df['mes'] = df['data'].dt.strftime('%Y-%m')
-        meses_disponiveis = sorted(df['mes'].unique(), reverse=True)
+with tab_dash, metricas.secao("painel"):
+    if meses_disponiveis:
         mes_sel = st.selectbox("Selecione o Período:", meses_disponiveis)
         
-        # Filtra dados do mês
-        df_v = df[df['mes'] == mes_sel].copy()
+        # Carrega só as linhas do mês selecionado
+        df_v = mov.carregar_mes(usuario_atual, mes_sel)
+        with col_p:
+            botao_pdf(usuario_atual, mes_sel)
         
-        # KPIs
-        rec = df_v[df_v['tipo']=='Receita']['valor'].sum()
-        des = df_v[df_v['tipo']=='Despesa']['valor'].sum()
-        saldo = rec - des
+        # KPIs (agregados no SQLite)
+        kpis = mov.kpis_mes(usuario_atual, mes_sel)
+        rec, des, saldo = kpis['receita'], kpis['despesa'], kpis['saldo']
         
         c1, c2, c3 = st.columns(3)
         c1.metric("GANHOS", f"R$ {rec:,.2f}", delta="+")
@@ -412,49 +332,54 @@ with tab_dash:
         g1, g2 = st.columns(2)
         
         # Gráfico de Barras (Gastos por Categoria)
-        gastos_cat = df_v[df_v['tipo']=='Despesa'].groupby('categoria')['valor'].sum().reset_index()
-        fig_bar = px.bar(gastos_cat, x='categoria', y='valor', color='valor', 
-                         title="Gastos por Categoria", template="plotly_dark",
-                         color_continuous_scale=['#00ADB5', '#00f5d4'])
-        g1.plotly_chart(fig_bar, use_container_width=True)
+        grafico_categorias(g1, mov.totais_categoria(usuario_atual, mes_sel))
         
         # Gráfico de Pizza (Receita vs Despesa)
-        fig_pie = px.pie(df_v, values='valor', names='tipo', hole=0.5, 
-                         title="Balanço Mensal", template="plotly_dark", 
-                         color='tipo',
-                         color_discrete_map={'Receita':'#00f5d4','Despesa':'#ff2e63'})
-        g2.plotly_chart(fig_pie, use_container_width=True)
+        grafico_balanco(g2, mov.totais_tipo(usuario_atual, mes_sel))
     else:
         st.info("Nenhum dado encontrado. Use o menu lateral para lançar sua primeira despesa.")
 
-with tab_busca:
+with tab_busca, metricas.secao("busca"):
     st.subheader("🔍 Localizar Transações (Histórico Completo)")
     termo_busca = st.text_input("O que você procura?", placeholder="Ex: Pizza, Salário, Vivo...")
     
     if termo_busca:
-        # Busca segura usando parâmetros SQL
-        q_busca = f"SELECT * FROM movimentacoes WHERE usuario = '{usuario_atual}' AND (descricao LIKE '%{termo_busca}%' OR categoria LIKE '%{termo_busca}%')"
-        res_busca = get_data(q_busca)
+        # Índice FTS5 paginado por cursor; total e soma vêm de um agregado
+        if st.session_state.get('busca_termo') != termo_busca:
+            st.session_state['busca_termo'] = termo_busca
+            st.session_state['busca_cursores'] = [None]
+        cursores = st.session_state['busca_cursores']
+        n_busca, soma_busca = busca.totais(usuario_atual, termo_busca)
         
-        if not res_busca.empty:
-            st.success(f"Encontrados {len(res_busca)} registros.")
-            st.metric(f"Soma Total para '{termo_busca}'", f"R$ {res_busca['valor'].sum():,.2f}")
-            st.dataframe(res_busca.sort_values('data', ascending=False), use_container_width=True, hide_index=True)
+        if n_busca:
+            st.success(f"Encontrados {n_busca} registros.")
+            st.metric(f"Soma Total para '{termo_busca}'", f"R$ {soma_busca:,.2f}")
+            pagina, proximo = busca.buscar(usuario_atual, termo_busca, cursores[-1])
+            st.dataframe(pagina, use_container_width=True, hide_index=True,
+                         column_config={"data": st.column_config.DateColumn("data", format="YYYY-MM-DD")})
+            
+            nav1, nav2, nav3 = st.columns([1, 2, 1])
+            nav2.caption(f"Página {len(cursores)} de {-(-n_busca // busca.TAMANHO_PAGINA)}")
+            if len(cursores) > 1 and nav1.button("◀ Anterior"):
+                cursores.pop()
+                st.rerun()
+            if proximo is not None and nav3.button("Próxima ▶"):
+                cursores.append(proximo)
+                st.rerun()
         else:
             st.warning("Nenhum registro encontrado.")
 
-with tab_metas:
+with tab_metas, metricas.secao("metas"):
     st.subheader("⚙️ Configuração de Limites")
     with st.form("fm_metas"):
         cols = st.columns(3)
         novas_metas = {}
+        metas_atuais = metas.carregar_metas(usuario_atual)
         for i, cat in enumerate(LISTA_CATEGORIAS):
-            val_atual = metas_df[metas_df['categoria']==cat]['valor_limite'].values[0] if not metas_df.empty else 0.0
-            novas_metas[cat] = cols[i%3].number_input(f"Meta: {cat}", value=float(val_atual))
+            novas_metas[cat] = cols[i%3].number_input(f"Meta: {cat}", value=float(metas_atuais[cat]))
         
         if st.form_submit_button("Salvar Todas as Metas"):
-            for cat, val in novas_metas.items():
-                run_query("INSERT OR REPLACE INTO metas_usuario (categoria, usuario, valor_limite) VALUES (?, ?, ?)", (cat, usuario_atual, val))
+            metas.salvar_metas(usuario_atual, novas_metas)
             st.success("Metas Atualizadas!")
             time.sleep(0.5)
             st.rerun()
@@ -462,16 +387,14 @@ with tab_metas:
     st.divider()
     st.subheader("📊 Acompanhamento (Mês Selecionado)")
     
-    # Só exibe progresso se houver dados filtrados na aba Painel
-    if 'df_v' in locals() and not df_v.empty:
+    # Só exibe progresso se houver um mês selecionado na aba Painel
+    if meses_disponiveis:
         cols_prog = st.columns(3)
+        # Gasto x limite de todas as categorias numa consulta só
+        prog = metas.progresso_metas(usuario_atual, mes_sel).set_index('categoria')
         for i, cat in enumerate(LISTA_CATEGORIAS):
-            # Pega o limite
-            limite_res = get_data(f"SELECT valor_limite FROM metas_usuario WHERE categoria='{cat}' AND usuario = '{usuario_atual}'")
-            limite = limite_res.values[0][0] if not limite_res.empty else 0.0
-            
-            # Pega o gasto atual
-            gasto_atual = df_v[(df_v['categoria']==cat) & (df_v['tipo']=='Despesa')]['valor'].sum()
+            limite = prog.at[cat, 'limite'] if cat in prog.index else 0.0
+            gasto_atual = prog.at[cat, 'gasto'] if cat in prog.index else 0.0
             
             if limite > 0:
                 with cols_prog[i%3]:
@@ -484,23 +407,19 @@ with tab_metas:
                     else:
                         st.caption(f"🟢 R$ {gasto_atual:.2f} / {limite:.2f}")
 
-with tab_previsao:
+with tab_previsao, metricas.secao("previsao"):
     st.subheader("🔮 Inteligência Preditiva (BI)")
     st.caption("Análise baseada na média histórica dos meses anteriores vs. mês atual.")
 
-    if not df.empty:
-        # Prepara dados para histórico
-        df_hist = df[df['tipo'] == 'Despesa'].copy()
-        df_hist['data'] = pd.to_datetime(df_hist['data'])
-        
-        # Agrupa gastos por mês
-        gastos_mensais = df_hist.resample('M', on='data')['valor'].sum()
+    if meses_disponiveis:
+        # Gastos por mês agregados no SQLite
+        gastos_mensais = mov.gastos_mensais(usuario_atual)
         
         if len(gastos_mensais) >= 1:
             media_historica = gastos_mensais.mean()
             
-            # Gasto do mês atual (seguro contra variável inexistente)
-            gasto_do_mes = df_v[df_v['tipo'] == 'Despesa']['valor'].sum() if 'df_v' in locals() else 0.0
+            # Gasto do mês selecionado no Painel
+            gasto_do_mes = mov.kpis_mes(usuario_atual, mes_sel)['despesa']
             
             col_prev1, col_prev2 = st.columns(2)
             col_prev1.metric("Média Histórica Mensal", f"R$ {media_historica:,.2f}")
@@ -520,37 +439,130 @@ with tab_previsao:
                 st.success(f"Excelente. Você está {perc_abaixo:.1f}% abaixo da sua média usual.")
 
             # Gráfico de Linha (Tendência)
-            fig_trend = px.line(gastos_mensais, title="Histórico de Gastos (Tendência)", markers=True)
-            fig_trend.add_hline(y=media_historica, line_dash="dot", line_color="red", annotation_text="Média")
-            fig_trend.update_layout(template="plotly_dark")
-            st.plotly_chart(fig_trend, use_container_width=True)
+            grafico_linhas(gastos_mensais, "Histórico de Gastos (Tendência)", media=media_historica)
+
+            # Modelos por categoria (projeção do mês corrente + próximos meses)
+            modelo = previsao.ajustar(usuario_atual)
+            st.markdown("---")
+            st.subheader("📅 Projeção de Fechamento do Mês Corrente")
+            proj = modelo.projecao_mes_atual()
+            if not proj.empty:
+                col_proj1, col_proj2 = st.columns(2)
+                col_proj1.metric("Gasto até Hoje", f"R$ {proj['gasto_ate_hoje'].sum():,.2f}")
+                col_proj2.metric("Projeção Fim do Mês", f"R$ {proj['projecao_fim_mes'].sum():,.2f}")
+                st.dataframe(proj.round(2), use_container_width=True, hide_index=True)
+
+                n_meses = st.slider("Meses à frente", 1, 12, 3)
+                prev = modelo.previsoes(n_meses).groupby('mes')[['ewma', 'sazonal']].sum()
+                grafico_linhas(prev, "Previsão de Gastos (EWMA x Sazonal)")
+
+                erro = modelo.backtest()
+                if erro['ewma']['n']:
+                    st.caption(f"Backtest (erro médio absoluto por categoria/mês): "
+                               f"EWMA R$ {erro['ewma']['mae']:,.2f} · Sazonal R$ {erro['sazonal']['mae']:,.2f}")
         else:
             st.info("Dados insuficientes para gerar previsão (necessário mais de um mês de uso).")
 
-with tab_aud:
+with tab_aud, metricas.secao("auditoria"):
     st.subheader("🛡️ Auditoria de Sistema (Logs)")
     st.caption("Rastreamento de segurança para conformidade.")
     col_f1, col_f2, col_f3 = st.columns(3)
     data_ini = col_f1.date_input("Data inicial", value=(datetime.now() - relativedelta(days=30)).date())
     data_fim = col_f2.date_input("Data final", value=datetime.now().date())
-    acoes_logs = get_data("SELECT DISTINCT acao FROM logs_auditoria ORDER BY acao")["acao"].tolist()
-    filtro_acao = col_f3.selectbox("Tipo de ação", ["Todas"] + acoes_logs)
+    # Valores distintos por "loose index scan" (um seek por valor, sem varrer a tabela)
+    filtro_acao = col_f3.selectbox("Tipo de ação", ["Todas"] + auditoria.acoes())
 
     if usuario_atual == USUARIO_PADRAO:
-        usuarios_logs = get_data("SELECT DISTINCT usuario FROM logs_auditoria ORDER BY usuario")["usuario"].tolist()
-        opcoes = ["Todos"] + usuarios_logs
-        filtro_user = st.selectbox("Filtrar por usuário", opcoes)
+        filtro_user = st.selectbox("Filtrar por usuário", ["Todos"] + auditoria.usuarios())
     else:
         filtro_user = usuario_atual
 
-    where = []
-    if filtro_user != "Todos":
-        where.append(f"usuario = '{filtro_user}'")
-    if filtro_acao != "Todas":
-        where.append(f"acao = '{filtro_acao}'")
-    if data_ini and data_fim:
-        where.append(f"date(data_hora) BETWEEN '{data_ini}' AND '{data_fim}'")
-
-    where_sql = " WHERE " + " AND ".join(where) if where else ""
-    logs = get_data(f"SELECT * FROM logs_auditoria{where_sql} ORDER BY id DESC")
-    st.dataframe(logs, use_container_width=True)
+    filtros = dict(usuario=None if filtro_user == "Todos" else filtro_user,
+                   acao=None if filtro_acao == "Todas" else filtro_acao,
+                   data_ini=data_ini or None, data_fim=data_fim or None)
+    # Paginação por cursor (data_hora, id); filtros novos voltam para a primeira página
+    if st.session_state.get('aud_filtros') != filtros:
+        st.session_state['aud_filtros'] = filtros
+        st.session_state['aud_cursores'] = [None]
+    cursores_aud = st.session_state['aud_cursores']
+    total_logs = auditoria.contar(**filtros)
+    logs, proximo_aud = auditoria.pagina(**filtros, cursor=cursores_aud[-1])
+    st.dataframe(logs, use_container_width=True, hide_index=True)
+
+    nav_a1, nav_a2, nav_a3 = st.columns([1, 2, 1])
+    nav_a2.caption(f"{total_logs} registros · Página {len(cursores_aud)} de {max(1, -(-total_logs // auditoria.TAMANHO_PAGINA))}")
+    if len(cursores_aud) > 1 and nav_a1.button("◀ Anterior", key="aud_ant"):
+        cursores_aud.pop()
+        st.rerun()
+    if proximo_aud is not None and nav_a3.button("Próxima ▶", key="aud_prox"):
+        cursores_aud.append(proximo_aud)
+        st.rerun()
+
+    # Retenção (só admin): meses antigos saem da tabela principal
+    if usuario_atual == USUARIO_PADRAO:
+        with st.expander("🗄️ Retenção do Log"):
+            meses_manter = st.number_input("Meses mantidos na tabela principal", 1, 120, auditoria.MESES_RETENCAO)
+            destino = st.radio("Arquivar em", ["tabela", "arquivo"], horizontal=True,
+                               format_func={"tabela": "Tabelas mensais (mesmo banco)", "arquivo": "Arquivos CSV.gz"}.get)
+            pendentes = auditoria.meses_antigos(meses_manter)
+            st.caption(f"Meses a arquivar: {', '.join(pendentes) if pendentes else 'nenhum'}")
+            if pendentes and st.button("Arquivar agora"):
+                movidos = auditoria.arquivar(meses_manter, destino)
+                st.success(f"{sum(n for _, n in movidos)} registros arquivados de {len(movidos)} meses.")
+            arquivadas = auditoria.tabelas_arquivo()
+            if arquivadas:
+                st.caption("Tabelas de arquivo: " + ", ".join(f"{m} ({n})" for m, n in arquivadas.items()))
+
+    # Métricas de desempenho (só admin): janela do buffer em memória + log de lentas
+    if usuario_atual == USUARIO_PADRAO:
+        with st.expander("⏱️ Métricas de Desempenho"):
+            st.caption(f"Últimos {metricas.TAMANHO_BUFFER} registros do processo. "
+                       f"Consultas acima de {metricas.LIMITE_CONSULTA_LENTA_MS:.0f} ms vão para o log de lentas.")
+            st.markdown("**Seções**")
+            st.dataframe(metricas.resumo("secao").drop(columns=["tipo", "consulta"]), use_container_width=True, hide_index=True)
+            st.markdown("**Consultas (por impressão digital)**")
+            st.dataframe(metricas.resumo("sql").drop(columns=["tipo"]), use_container_width=True, hide_index=True)
+            st.markdown("**Consultas lentas**")
+            st.dataframe(metricas.consultas_lentas(), use_container_width=True, hide_index=True)
+            if st.button("Exportar métricas (Prometheus)"):
+                try:
+                    st.success(f"Métricas gravadas em {metricas.exportar_prometheus()}")
+                except OSError as e:
+                    st.error(f"Falha ao gravar métricas: {e}")
+
+    # Backups (só admin): snapshots online; restauração é pelo CLI, com o app parado
+    if usuario_atual == USUARIO_PADRAO:
+        with st.expander("💾 Backups"):
+            st.caption(f"Snapshots em {backup.BACKUP_DIR} · mantidos os {backup.BACKUP_MANTER} mais recentes. "
+                       "Restaurar: python -m cyberfinance.backup --restaurar ARQUIVO")
+            if backup.ultimo_erro:
+                st.warning(f"Último backup automático falhou: {backup.ultimo_erro}")
+            if st.button("Fazer backup agora"):
+                try:
+                    arquivo = backup.criar_backup()
+                    backup.aplicar_retencao()
+                    st.success(f"Backup gravado em {arquivo}")
+                except (OSError, sqlite3.Error, backup.ErroBackup) as e:
+                    st.error(f"Falha no backup: {e}")
+            st.dataframe(backup.historico(20), use_container_width=True, hide_index=True)
+
+    # Arquivo frio (só admin): meses antigos saem do SQLite para Parquet
+    if usuario_atual == USUARIO_PADRAO:
+        with st.expander("🧊 Arquivo Frio"):
+            meses_quentes = st.number_input("Meses mantidos no SQLite", 1, 240, arquivo_frio.MESES_QUENTES)
+            st.caption(f"Partições em {arquivo_frio.PASTA_ARQUIVO_FRIO}. Busca, painel e relatórios "
+                       "continuam lendo os meses arquivados.")
+            if st.button("Arquivar meses antigos"):
+                with st.spinner("Gravando partições Parquet..."):
+                    movidos = arquivo_frio.arquivar(meses_quentes)
+                st.success(f"{sum(n for *_, n in movidos)} lançamentos movidos em {len(movidos)} partições.")
+            st.dataframe(arquivo_frio.catalogo(), use_container_width=True, hide_index=True)
+
+    # Shards (só admin): dados de cada usuário no seu próprio arquivo SQLite
+    if usuario_atual == USUARIO_PADRAO:
+        with st.expander("🧩 Shards"):
+            if shards.ativo():
+                st.caption(f"{len(shards.registrados())} shards; usuários, auditoria e métricas ficam no catálogo.")
+            else:
+                st.caption("Banco monolítico. Dividir (com o app parado): python -m cyberfinance.shards --dividir 8")
+            st.dataframe(shards.resumo(), use_container_width=True, hide_index=True)
@@ -0,0 +1 @@
+"""Núcleo do CyberFinance Pro (acesso a dados e regras de negócio)."""
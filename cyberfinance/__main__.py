@@ -0,0 +1,77 @@
+"""Lotes headless do CyberFinance, sem Streamlit (ver ``servicos``).
+
+* ``importar``: CSVs de uma pasta, uma subpasta por usuário;
+* ``relatorios``: o PDF do mês de cada usuário, em paralelo;
+* ``estouros``: metas estouradas de todos os usuários.
+
+Uso::
+
+    python -m cyberfinance [--banco ARQ] importar PASTA [--usuario U] [--threads N]
+    python -m cyberfinance [--banco ARQ] relatorios [--mes AAAA-MM] [--saida PASTA] [--processos N]
+    python -m cyberfinance [--banco ARQ] estouros [--mes AAAA-MM] [--ate AAAA-MM] [--saida ARQ.csv]
+"""
+import argparse
+import sys
+from datetime import date
+
+import pandas as pd
+
+from . import metas, migracoes, servicos
+from .config import PASTA_RELATORIOS, THREADS_IMPORTACAO
+from .db import configurar
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m cyberfinance",
+                                     description="Lotes headless do CyberFinance (importação, relatórios, metas).")
+    parser.add_argument("--banco", help="caminho do banco (padrão: o do app)")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("importar", help="importa os CSVs de uma pasta (uma subpasta por usuário)")
+    p.add_argument("pasta")
+    p.add_argument("--usuario", help="importa os CSVs da própria pasta para este usuário")
+    p.add_argument("--threads", type=int, default=THREADS_IMPORTACAO, help="usuários importados em paralelo")
+
+    p = sub.add_parser("relatorios", help="gera o PDF do mês de cada usuário")
+    p.add_argument("--mes", help="AAAA-MM (padrão: o mês anterior)")
+    p.add_argument("--saida", default=PASTA_RELATORIOS, help="pasta dos PDFs")
+    p.add_argument("--usuario", action="append", help="limita aos usuários indicados (repetível)")
+    p.add_argument("--processos", type=int, help="processos em paralelo (padrão: número de CPUs)")
+
+    p = sub.add_parser("estouros", help="lista as metas estouradas de todos os usuários")
+    p.add_argument("--mes", help="AAAA-MM (padrão: o mês corrente)")
+    p.add_argument("--ate", help="último mês do intervalo (AAAA-MM)")
+    p.add_argument("--usuario", help="limita a um usuário")
+    p.add_argument("--saida", help="grava a lista em CSV")
+
+    args = parser.parse_args(argv)
+    if args.banco:
+        configurar(args.banco)
+    migracoes.migrar()
+
+    if args.comando == "importar":
+        res = servicos.importar_pasta(
+            args.pasta, args.usuario, args.threads,
+            progresso=lambda l: print(f"{l['usuario']}: {l['arquivo']} -> "
+                                      f"{l['erro'] or str(l['inseridas']) + ' inseridas'}", file=sys.stderr))
+        print(f"{len(res)} arquivos, {res['inseridas'].sum():,} lançamentos inseridos, "
+              f"{res['duplicadas'].sum():,} duplicados ignorados, {res['erro'].notna().sum()} com erro.")
+        return 1 if res["erro"].notna().any() else 0
+    elif args.comando == "relatorios":
+        mes = args.mes or (pd.Period(date.today(), freq="M") - 1).strftime("%Y-%m")
+        res = servicos.relatorios_mes(
+            mes, args.saida, args.usuario, args.processos,
+            progresso=lambda l: print(f"{l['usuario']}: {l['erro'] or l['arquivo']}", file=sys.stderr))
+        print(f"{(res['erro'].isna()).sum()} relatórios de {mes} em {args.saida}, {res['erro'].notna().sum()} com erro.")
+        return 1 if res["erro"].notna().any() else 0
+    elif args.comando == "estouros":
+        mes = args.mes or date.today().strftime("%Y-%m")
+        df = metas.estouros(mes, args.ate, args.usuario)
+        if args.saida:
+            df.to_csv(args.saida, index=False)
+        print(df.to_string(index=False) if len(df) else "Nenhuma meta estourada.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,363 @@
+"""Arquivo frio: meses antigos de ``movimentacoes`` em Parquet, fora do SQLite.
+
+``arquivar`` move os meses anteriores aos últimos ``MESES_QUENTES`` para
+``data/arquivo_frio/usuario=<nome>/mes=AAAA-MM/dados.parquet`` (colunar,
+zstd) e apaga as linhas do banco, um mês por transação. O catálogo
+``meses_arquivados`` diz quais (usuário, mês) têm partição; leituras de
+quem não tem nada arquivado nem olham o disco.
+
+As leituras continuam enxergando o histórico inteiro:
+
+* ``resumo_mensal`` mantém as linhas dos meses arquivados (KPIs, tendência
+  e a previsão leem dali); ``resumo.reconstruir`` soma de volta os
+  agregados do Parquet.
+* ``movimentacoes.carregar_mes`` (painel e relatório PDF) e a ``busca``
+  juntam as partições às linhas vivas. ``ler`` empurra os filtros: o de mês
+  descarta diretórios inteiros e os de data/categoria usam as estatísticas
+  dos row groups.
+* A importação de CSV consulta os hashes arquivados, então reimportar um
+  extrato antigo não duplica lançamentos.
+
+Lançamentos gravados depois num mês já arquivado ficam no SQLite até o
+próximo ``arquivar``, que os acrescenta à partição. Os arquivos Parquet não
+entram nos backups do SQLite. Partições gravadas antes da migração 14 têm
+``valor`` REAL em vez de ``valor_centavos``; as leituras convertem na hora.
+
+Manutenção::
+
+    python -m cyberfinance.arquivo_frio --arquivar [--meses 24] [--usuario X] [--vacuum]
+    python -m cyberfinance.arquivo_frio --listar
+"""
+import argparse
+import os
+import re
+import unicodedata
+from datetime import date, datetime
+from urllib.parse import quote
+
+import pandas as pd
+
+from . import shards
+from .cache import cacheado
+from .config import MESES_QUENTES, PASTA_ARQUIVO_FRIO
+from .db import get_pool
+from .shards import pool_de
+
+NOME_ARQUIVO = "dados.parquet"
+COMPRESSAO = "zstd"
+COLUNAS_BUSCA = ["id", "data", "tipo", "categoria", "descricao", "valor_centavos"]
+MARCA_INI, MARCA_FIM = "«", "»"
+
+
+def garantir_schema(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS meses_arquivados (usuario TEXT NOT NULL, mes TEXT NOT NULL, "
+                 "linhas INTEGER NOT NULL, total REAL NOT NULL, arquivado_em TEXT NOT NULL, "
+                 "PRIMARY KEY (usuario, mes)) WITHOUT ROWID")
+
+
+def _pasta_usuario(usuario, pasta=PASTA_ARQUIVO_FRIO):
+    # valores de partição hive vão codificados como URI (o pyarrow decodifica na leitura)
+    return os.path.join(pasta, f"usuario={quote(usuario, safe='')}")
+
+
+def _caminho(usuario, mes, pasta=PASTA_ARQUIVO_FRIO):
+    return os.path.join(_pasta_usuario(usuario, pasta), f"mes={mes}", NOME_ARQUIVO)
+
+
+def _esquema(conn=None):
+    """Esquema Arrow das colunas de ``movimentacoes`` (tipos declarados no SQLite)."""
+    import pyarrow as pa
+
+    conn = conn or get_pool().conexao()
+    tipos = {"INTEGER": pa.int64(), "REAL": pa.float64()}
+    return pa.schema([(nome, tipos.get((tipo or "").upper(), pa.string()))
+                      for _, nome, tipo, *_ in conn.execute("PRAGMA table_info(movimentacoes)").fetchall()])
+
+
+def _centavos(tabela):
+    """Preenche ``valor_centavos`` das partições legadas a partir de ``valor`` (REAL) e descarta ``valor``."""
+    if "valor" not in tabela.column_names:
+        return tabela
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    # mesmo arredondamento da migração (ROUND do SQLite: metade para longe do zero)
+    legado = pc.cast(pc.round(pc.multiply(tabela["valor"].fill_null(0.0), 100), round_mode="half_towards_infinity"),
+                     pa.int64())
+    if "valor_centavos" in tabela.column_names:
+        i = tabela.column_names.index("valor_centavos")
+        tabela = tabela.set_column(i, "valor_centavos", pc.coalesce(tabela["valor_centavos"], legado))
+    else:
+        tabela = tabela.append_column("valor_centavos", legado)
+    return tabela.drop_columns(["valor"])
+
+
+def _dataset(pasta, particoes, esquema=None):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    esquema = esquema or _esquema()
+    # ``valor`` só existe nas partições legadas; nas novas vem nulo
+    campos = list(esquema) + [pa.field("valor", pa.float64())]
+    campos += [f for f in particoes if f.name not in esquema.names]
+    return ds.dataset(pasta, format="parquet", schema=pa.schema(campos),
+                      partitioning=ds.partitioning(particoes, flavor="hive"))
+
+
+def _vazio(colunas=None):
+    cols = colunas or [r[1] for r in get_pool().consultar("PRAGMA table_info(movimentacoes)")]
+    return pd.DataFrame(columns=cols)
+
+
+@cacheado
+def meses_arquivados(usuario):
+    return [r[0] for r in pool_de(usuario).consultar(
+        "SELECT mes FROM meses_arquivados WHERE usuario = ? ORDER BY mes", (usuario,))]
+
+
+def _mes_do_ultimo_dia(fim):
+    # fim exclusivo 'AAAA-MM-DD' -> mês do último dia incluído
+    return (pd.Period(fim, freq="D") - 1).strftime("%Y-%m")
+
+
+def ler(usuario, data_ini=None, data_fim=None, categorias=None, colunas=None, filtro=None):
+    """Linhas arquivadas do usuário em [data_ini, data_fim), filtradas no próprio Parquet.
+
+    ``filtro`` é uma expressão extra do ``pyarrow.dataset`` (ver ``buscar``).
+    """
+    pasta = _pasta_usuario(usuario)
+    if not os.path.isdir(pasta):
+        return _vazio(colunas)
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    esquema = _esquema()
+    dataset = _dataset(pasta, pa.schema([("mes", pa.string())]), esquema)
+    filtros = []
+    if data_ini is not None:
+        filtros += [ds.field("mes") >= str(data_ini)[:7], ds.field("data") >= str(data_ini)]
+    if data_fim is not None:
+        filtros += [ds.field("mes") <= _mes_do_ultimo_dia(str(data_fim)), ds.field("data") < str(data_fim)]
+    if categorias is not None:
+        filtros.append(ds.field("categoria").isin(list(categorias)))
+    for f in filtros:
+        filtro = f if filtro is None else filtro & f
+    colunas = colunas or esquema.names
+    extra = ["valor"] if "valor_centavos" in colunas and "valor" not in colunas else []
+    tabela = _centavos(dataset.to_table(columns=colunas + extra, filter=filtro))
+    return tabela.select(colunas).to_pandas()
+
+
+def arquivar(meses_manter=MESES_QUENTES, usuario=None, hoje=None, progresso=None):
+    """Move para Parquet os meses anteriores aos últimos ``meses_manter``.
+
+    Cada (usuário, mês) é uma transação: grava a partição (acrescentando a
+    uma já existente), apaga as linhas do SQLite preservando o
+    ``resumo_mensal`` daquele mês e atualiza o catálogo.
+    Retorna [(usuário, mês, linhas), ...].
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    hoje = hoje or date.today()
+    corte = (pd.Period(hoje, freq="M") - (meses_manter - 1)).strftime("%Y-%m")
+    # meses com mais lançamentos no resumo do que no catálogo: nunca arquivados ou com linhas atrasadas
+    q = ("SELECT r.usuario, r.mes FROM resumo_mensal r LEFT JOIN meses_arquivados a "
+         "ON a.usuario = r.usuario AND a.mes = r.mes WHERE r.mes != '' AND r.mes < ? AND r.usuario != ''")
+    p = [corte]
+    if usuario is not None:
+        q += " AND r.usuario = ?"
+        p.append(usuario)
+    q += " GROUP BY r.usuario, r.mes HAVING SUM(r.quantidade) > COALESCE(MAX(a.linhas), 0) ORDER BY r.usuario, r.mes"
+    alvos = [pool_de(usuario)] if usuario is not None else shards.pools()
+    pendentes = [(pool, u, mes) for pool in alvos for u, mes in pool.consultar(q, p)]
+    esquema = _esquema()
+    movidos = []
+    for i, (pool, u, mes) in enumerate(pendentes):
+        if progresso:
+            progresso(i, len(pendentes))
+        ini = f"{mes}-01"
+        fim = (pd.Period(mes, freq="M") + 1).strftime("%Y-%m-01")
+        with pool.transacao() as conn:
+            df = pd.read_sql(f"SELECT {', '.join(esquema.names)} FROM movimentacoes "
+                             "WHERE usuario = ? AND data >= ? AND data < ? ORDER BY data, id",
+                             conn, params=(u, ini, fim))
+            if df.empty:
+                continue
+            caminho = _caminho(u, mes)
+            if os.path.exists(caminho):
+                # linhas atrasadas de um mês já arquivado: acrescenta à partição
+                antigo = _centavos(pq.read_table(caminho, partitioning=None)).to_pandas()
+                df = (pd.concat([antigo, df]).drop_duplicates("id", keep="last")
+                      .sort_values(["data", "id"], ignore_index=True))
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+            pq.write_table(pa.Table.from_pandas(df, schema=esquema, preserve_index=False),
+                           caminho + ".tmp", compression=COMPRESSAO)
+            os.replace(caminho + ".tmp", caminho)
+            # o DELETE dispara os triggers do resumo; o agregado do mês é regravado igual
+            resumo = conn.execute("SELECT usuario, mes, tipo, categoria, total_centavos, quantidade "
+                                  "FROM resumo_mensal WHERE usuario = ? AND mes = ?", (u, mes)).fetchall()
+            n = conn.execute("DELETE FROM movimentacoes WHERE usuario = ? AND data >= ? AND data < ?",
+                             (u, ini, fim)).rowcount
+            conn.executemany("INSERT OR REPLACE INTO resumo_mensal (usuario, mes, tipo, categoria, total_centavos, "
+                             "quantidade) VALUES (?,?,?,?,?,?)", resumo)
+            conn.execute("INSERT OR REPLACE INTO meses_arquivados (usuario, mes, linhas, total, arquivado_em) "
+                         "VALUES (?,?,?,?,?)", (u, mes, len(df), int(df["valor_centavos"].sum()) / 100,
+                                                datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+        movidos.append((u, mes, n))
+    return movidos
+
+
+def agregados(usuario=None):
+    """Soma e quantidade por (usuario, mes, tipo, categoria) das partições, no formato do ``resumo_mensal``."""
+    colunas = ["usuario", "mes", "tipo", "categoria", "total_centavos", "quantidade"]
+    pasta = PASTA_ARQUIVO_FRIO if usuario is None else _pasta_usuario(usuario)
+    if not os.path.isdir(pasta):
+        return pd.DataFrame(columns=colunas)
+    import pyarrow as pa
+
+    if usuario is None:
+        particoes = pa.schema([("usuario", pa.string()), ("mes", pa.string())])
+    else:
+        particoes = pa.schema([("mes", pa.string())])
+    colunas_lidas = ["mes", "tipo", "categoria", "valor_centavos", "valor", "id"] + (["usuario"] if usuario is None else [])
+    tabela = _centavos(_dataset(pasta, particoes).to_table(columns=colunas_lidas))
+    chaves = ["usuario", "mes", "tipo", "categoria"] if usuario is None else ["mes", "tipo", "categoria"]
+    # chaves nulas viram '' como nos triggers do resumo
+    tabela = pa.table({c: tabela[c].fill_null("") if c in chaves else tabela[c] for c in tabela.column_names})
+    df = tabela.group_by(chaves).aggregate([("valor_centavos", "sum"), ("id", "count")]).to_pandas()
+    df = df.rename(columns={"valor_centavos_sum": "total_centavos", "id_count": "quantidade"})
+    if usuario is not None:
+        df["usuario"] = usuario
+    df["total_centavos"] = df["total_centavos"].fillna(0).astype("int64")
+    return df[colunas]
+
+
+# --- Busca ---
+def _variantes():
+    # letra ASCII -> ela e as letras latinas acentuadas que viram ela sem acento ('c' -> 'cç')
+    variantes = {}
+    for codigo in range(0xC0, 0x250):
+        c = chr(codigo).lower()
+        base = unicodedata.normalize("NFKD", c).encode("ascii", "ignore").decode("ascii")[:1].lower()
+        if base.isalpha() and len(c) == 1:
+            variantes.setdefault(base, {base}).add(c)
+    return {base: "".join(sorted(letras)) for base, letras in variantes.items()}
+
+
+_VARIANTES = _variantes()
+
+
+def _padrao_token(token):
+    """Regex RE2 de um token como prefixo de palavra, sem distinguir acento (a caixa fica com o ignore_case).
+
+    O RE2 não tem lookbehind: o início de palavra é o começo do texto ou um
+    caractere que não é letra, número ou '_' (o mesmo ``(?<!\\w)`` do FTS).
+    """
+    t = unicodedata.normalize("NFKD", token).encode("ascii", "ignore").decode("ascii").lower()
+    if not t:
+        return None
+    corpo = "".join(f"[{_VARIANTES[c]}]" if c in _VARIANTES else re.escape(c) for c in t)
+    return r"(?:^|[^\pL\pN_])" + corpo
+
+
+def _dobrar(texto):
+    # sem acento e minúsculo, um caractere por caractere (as posições batem com o original)
+    return "".join((unicodedata.normalize("NFKD", c).encode("ascii", "ignore").decode("ascii") or c)[:1].lower()
+                   for c in texto)
+
+
+def _destacar(texto, marcar):
+    partes, fim = [], 0
+    for m in marcar.finditer(_dobrar(texto)):
+        partes += [texto[fim:m.start()], MARCA_INI, texto[m.start():m.end()], MARCA_FIM]
+        fim = m.end()
+    return "".join(partes) + texto[fim:]
+
+
+def destacar(descricoes, tokens):
+    """Descrições com as palavras que começam pelos ``tokens`` entre as marcas (sem distinguir acento)."""
+    marcar = re.compile(r"(?<!\w)(?:" + "|".join(re.escape(_dobrar(t)) for t in tokens) + r")\w*")
+    return [_destacar(d, marcar) for d in descricoes.fillna("")]
+
+
+@cacheado
+def buscar(usuario, termo):
+    """Linhas arquivadas que a busca FTS encontraria (todo token é prefixo de uma palavra), data desc.
+
+    O casamento roda dentro da leitura do Parquet (``pyarrow.compute``), só
+    sobre as colunas da busca: apenas as linhas encontradas viram DataFrame.
+    """
+    tokens = re.findall(r"\w+", termo or "")
+    padroes = [p for p in map(_padrao_token, tokens) if p]
+    if not padroes or not meses_arquivados(usuario):
+        return pd.DataFrame(columns=COLUNAS_BUSCA + ["destaque"])
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+
+    filtro = None
+    for p in padroes:
+        # cada token em descricao ou categoria (nulos não casam)
+        casa = (pc.match_substring_regex(ds.field("descricao"), p, ignore_case=True)
+                | pc.match_substring_regex(ds.field("categoria"), p, ignore_case=True))
+        filtro = casa if filtro is None else filtro & casa
+    df = ler(usuario, colunas=COLUNAS_BUSCA, filtro=filtro)
+    df["destaque"] = destacar(df["descricao"], tokens)
+    return df.sort_values(["data", "id"], ascending=False, ignore_index=True)
+
+
+# --- Importação ---
+def hashes_arquivados(usuario, lote):
+    """Hashes de ``lote`` (colunas data e hash_importacao) que já estão no arquivo frio."""
+    arquivados = meses_arquivados(usuario)
+    if not arquivados:
+        return set()
+    meses = sorted(set(lote["data"].str.slice(0, 7)) & set(arquivados))
+    if not meses:
+        return set()
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    pasta = _pasta_usuario(usuario)
+    dataset = ds.dataset(pasta, format="parquet",
+                         partitioning=ds.partitioning(pa.schema([("mes", pa.string())]), flavor="hive"))
+    hashes = lote["hash_importacao"].dropna().unique().tolist()
+    tabela = dataset.to_table(columns=["hash_importacao"],
+                              filter=ds.field("mes").isin(meses) & ds.field("hash_importacao").isin(hashes))
+    return set(tabela.column("hash_importacao").to_pylist())
+
+
+def catalogo():
+    # cada usuário está num shard só: as linhas por usuário de cada shard já são finais
+    df = shards.consultar_df(
+        "SELECT usuario, COUNT(*) AS meses, MIN(mes) AS primeiro, MAX(mes) AS ultimo, SUM(linhas) AS linhas, "
+        "ROUND(SUM(total), 2) AS total FROM meses_arquivados GROUP BY usuario")
+    return df.sort_values("usuario", ignore_index=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Arquivo frio (Parquet) de movimentações antigas.")
+    parser.add_argument("--arquivar", action="store_true", help="move meses antigos do SQLite para Parquet")
+    parser.add_argument("--meses", type=int, default=MESES_QUENTES, help="meses mantidos no SQLite")
+    parser.add_argument("--usuario", help="limita a um usuário")
+    parser.add_argument("--vacuum", action="store_true", help="compacta o banco depois de arquivar")
+    parser.add_argument("--listar", action="store_true", help="mostra o catálogo do arquivo frio")
+    args = parser.parse_args(argv)
+    from . import migracoes
+
+    migracoes.migrar()
+    if args.arquivar:
+        movidos = arquivar(args.meses, args.usuario)
+        print(f"{sum(n for *_, n in movidos)} linhas arquivadas em {len(movidos)} partições.")
+        if args.vacuum and movidos:
+            for pool in shards.pools():
+                pool.conexao().execute("VACUUM")
+            print("Banco compactado.")
+    elif args.listar:
+        print(catalogo().to_string(index=False))
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""Log de auditoria: gravação em lote, consulta paginada e retenção.
+
+* ``data_hora`` é texto ISO ('YYYY-MM-DD HH:MM[:SS]'), que ordena igual ao
+  tempo; os filtros usam intervalos (``>=``/``<``) sobre ele, e os índices
+  (usuario, data_hora, id) e (acao, data_hora, id) cobrem o filtro e a
+  ordenação da aba Auditoria.
+* ``registrar`` só enfileira; uma thread grava a fila em lotes (um
+  ``executemany`` por lote), fora da thread do script do Streamlit.
+* ``pagina`` usa paginação por cursor (data_hora, id): o custo de cada
+  página não depende de quantas já foram vistas.
+* Ações, usuários, contagem e a primeira página ficam no cache versionado
+  (escopo ``ESCOPO_AUDITORIA``): os reruns da aba não voltam ao banco até
+  um lote novo ser gravado, neste ou em outro processo.
+* ``arquivar`` move meses antigos para tabelas ``logs_auditoria_AAAA_MM`` ou
+  para arquivos CSV gzip em ``data/auditoria``.
+
+Manutenção::
+
+    python -m cyberfinance.auditoria --arquivar --meses 12 [--destino arquivo]
+"""
+import argparse
+import atexit
+import os
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+from .cache import ESCOPO_AUDITORIA, get_data_cacheado, incrementar_gravada, incrementar_versao
+from .config import BASE_DIR, DATA_DIR, DATA_DIR_OK
+from .db import get_pool
+
+TAMANHO_LOTE = 500
+MAX_PENDENTES = 100_000   # com o banco fora do ar, descarta os mais antigos além disso
+INTERVALO_GRAVACAO = 0.5  # segundos entre descargas da fila
+TAMANHO_PAGINA = 100
+MESES_RETENCAO = 12
+PASTA_ARQUIVO = os.path.join(DATA_DIR if DATA_DIR_OK else BASE_DIR, "auditoria")
+PREFIXO_TABELA_ARQUIVO = "logs_auditoria_"
+
+INDICES = [
+    "CREATE INDEX IF NOT EXISTS idx_aud_usuario_data ON logs_auditoria (usuario, data_hora, id)",
+    "CREATE INDEX IF NOT EXISTS idx_aud_acao_data ON logs_auditoria (acao, data_hora, id)",
+    # visão do admin sem filtro de usuário/ação
+    "CREATE INDEX IF NOT EXISTS idx_aud_data ON logs_auditoria (data_hora, id)",
+]
+SQL_INSERT = "INSERT INTO logs_auditoria (data_hora, acao, usuario) VALUES (?,?,?)"
+
+
+def garantir_schema(conn):
+    for ddl in INDICES:
+        conn.execute(ddl)
+
+
+# --- Gravação em lote ---
+_pendentes = []
+_cond = threading.Condition()
+_gravacao_lock = threading.Lock()   # uma descarga por vez (thread ou descarregar())
+_escritor = None
+
+
+def agora():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def registrar(acao, usuario, quando=None):
+    """Enfileira um evento; a gravação acontece em lote na thread do escritor."""
+    with _cond:
+        _pendentes.append((quando or agora(), acao, usuario))
+        if len(_pendentes) >= TAMANHO_LOTE:
+            _cond.notify()
+    _garantir_escritor()
+
+
+def _garantir_escritor():
+    global _escritor
+    if _escritor is None or not _escritor.is_alive():
+        with _cond:
+            if _escritor is None or not _escritor.is_alive():
+                _escritor = threading.Thread(target=_loop_escritor, name="auditoria-escritor", daemon=True)
+                _escritor.start()
+
+
+def _loop_escritor():
+    while True:
+        with _cond:
+            _cond.wait_for(lambda: len(_pendentes) >= TAMANHO_LOTE, timeout=INTERVALO_GRAVACAO)
+        descarregar()
+
+
+def descarregar():
+    """Grava tudo o que está na fila agora; devolve quantos eventos foram gravados."""
+    with _gravacao_lock:
+        with _cond:
+            lote = _pendentes[:]
+            _pendentes.clear()
+        if not lote:
+            return 0
+        pool = get_pool()
+        try:
+            with pool.transacao():
+                pool.executar_varios(SQL_INSERT, lote)
+                incrementar_gravada(pool, ESCOPO_AUDITORIA)
+        except sqlite3.Error:
+            # banco ocupado/indisponível: devolve o lote para a próxima tentativa
+            with _cond:
+                _pendentes[:0] = lote
+                del _pendentes[:-MAX_PENDENTES]
+            return 0
+        incrementar_versao(ESCOPO_AUDITORIA)
+        return len(lote)
+
+
+atexit.register(descarregar)
+
+
+# --- Consulta ---
+def _distintos(coluna):
+    # "loose index scan": um seek no índice por valor distinto, sem varrer a tabela
+    q = (f"WITH RECURSIVE v(x) AS (SELECT MIN({coluna}) FROM logs_auditoria "
+         f"UNION ALL SELECT (SELECT MIN({coluna}) FROM logs_auditoria WHERE {coluna} > v.x) FROM v WHERE v.x IS NOT NULL) "
+         "SELECT x FROM v WHERE x IS NOT NULL")
+    return get_data_cacheado(ESCOPO_AUDITORIA, q)["x"].tolist()
+
+
+def acoes():
+    return _distintos("acao")
+
+
+def usuarios():
+    return _distintos("usuario")
+
+
+def _filtros(usuario=None, acao=None, data_ini=None, data_fim=None):
+    where, params = [], []
+    if usuario is not None:
+        where.append("usuario = ?"); params.append(usuario)
+    if acao is not None:
+        where.append("acao = ?"); params.append(acao)
+    if data_ini is not None:
+        where.append("data_hora >= ?"); params.append(str(data_ini))
+    if data_fim is not None:
+        # fim inclusivo: tudo antes do dia seguinte
+        where.append("data_hora < ?"); params.append(str(pd.Timestamp(data_fim).date() + timedelta(days=1)))
+    return where, params
+
+
+def contar(usuario=None, acao=None, data_ini=None, data_fim=None):
+    where, params = _filtros(usuario, acao, data_ini, data_fim)
+    where_sql = " WHERE " + " AND ".join(where) if where else ""
+    return int(get_data_cacheado(ESCOPO_AUDITORIA, f"SELECT COUNT(*) AS n FROM logs_auditoria{where_sql}",
+                                 tuple(params))["n"].iloc[0])
+
+
+def pagina(usuario=None, acao=None, data_ini=None, data_fim=None, cursor=None, tamanho=TAMANHO_PAGINA):
+    """Uma página (mais recentes primeiro) e o cursor da próxima, ou None.
+
+    ``cursor`` é o (data_hora, id) da última linha da página anterior; só a
+    primeira página (a que a aba abre a cada rerun) passa pelo cache.
+    """
+    where, params = _filtros(usuario, acao, data_ini, data_fim)
+    if cursor is not None:
+        where.append("(data_hora < ? OR (data_hora = ? AND id < ?))")
+        params += [cursor[0], cursor[0], cursor[1]]
+    where_sql = " WHERE " + " AND ".join(where) if where else ""
+    q = (f"SELECT id, data_hora, acao, usuario FROM logs_auditoria{where_sql} "
+         "ORDER BY data_hora DESC, id DESC LIMIT ?")
+    if cursor is None:
+        df = get_data_cacheado(ESCOPO_AUDITORIA, q, (*params, tamanho + 1))
+    else:
+        df = get_pool().consultar_df(q, [*params, tamanho + 1])
+    if len(df) <= tamanho:
+        return df, None
+    df = df.iloc[:tamanho]
+    ultima = df.iloc[-1]
+    return df, (ultima["data_hora"], int(ultima["id"]))
+
+
+# --- Retenção ---
+def _corte(meses_manter, hoje=None):
+    hoje = hoje or date.today()
+    return (pd.Period(hoje, freq="M") - (meses_manter - 1)).strftime("%Y-%m-01")
+
+
+def meses_antigos(meses_manter=MESES_RETENCAO, hoje=None):
+    corte = _corte(meses_manter, hoje)
+    return [r[0] for r in get_pool().consultar(
+        "SELECT DISTINCT substr(data_hora, 1, 7) FROM logs_auditoria WHERE data_hora < ? ORDER BY 1", (corte,))]
+
+
+def arquivar(meses_manter=MESES_RETENCAO, destino="tabela", hoje=None):
+    """Move os meses anteriores aos últimos ``meses_manter`` para fora da tabela principal.
+
+    ``destino``: 'tabela' (``logs_auditoria_AAAA_MM`` no mesmo banco) ou
+    'arquivo' (``data/auditoria/logs_AAAA-MM.csv.gz``). Cada mês é uma
+    transação; o arquivo é escrito antes de apagar as linhas.
+    Retorna [(mês, linhas), ...].
+    """
+    if destino not in ("tabela", "arquivo"):
+        raise ValueError(f"Destino desconhecido: {destino}")
+    descarregar()
+    movidos = []
+    for mes in meses_antigos(meses_manter, hoje):
+        ini = f"{mes}-01"
+        fim = (pd.Period(mes, freq="M") + 1).strftime("%Y-%m-01")
+        with get_pool().transacao() as conn:
+            if destino == "tabela":
+                tabela = PREFIXO_TABELA_ARQUIVO + mes.replace("-", "_")
+                conn.execute(f"CREATE TABLE IF NOT EXISTS {tabela} (id INTEGER PRIMARY KEY, data_hora TEXT, "
+                             "acao TEXT, usuario TEXT)")
+                conn.execute(f"INSERT OR IGNORE INTO {tabela} (id, data_hora, acao, usuario) "
+                             "SELECT id, data_hora, acao, usuario FROM logs_auditoria "
+                             "WHERE data_hora >= ? AND data_hora < ?", (ini, fim))
+            else:
+                df = pd.read_sql("SELECT id, data_hora, acao, usuario FROM logs_auditoria "
+                                 "WHERE data_hora >= ? AND data_hora < ? ORDER BY data_hora, id", conn,
+                                 params=(ini, fim))
+                os.makedirs(PASTA_ARQUIVO, exist_ok=True)
+                caminho = os.path.join(PASTA_ARQUIVO, f"logs_{mes}.csv.gz")
+                # mês arquivado de novo (linhas atrasadas): acrescenta ao que já existe
+                if os.path.exists(caminho):
+                    df = pd.concat([pd.read_csv(caminho), df]).drop_duplicates("id")
+                df.to_csv(caminho + ".tmp", index=False, compression="gzip")
+                os.replace(caminho + ".tmp", caminho)
+            n = conn.execute("DELETE FROM logs_auditoria WHERE data_hora >= ? AND data_hora < ?", (ini, fim)).rowcount
+            incrementar_gravada(get_pool(), ESCOPO_AUDITORIA)
+        movidos.append((mes, n))
+    if movidos:
+        incrementar_versao(ESCOPO_AUDITORIA)
+    return movidos
+
+
+def tabelas_arquivo():
+    """{mês: linhas} das tabelas de arquivo existentes."""
+    nomes = [r[0] for r in get_pool().consultar(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB ? ORDER BY name",
+        (PREFIXO_TABELA_ARQUIVO + "[0-9][0-9][0-9][0-9]_[0-9][0-9]",))]
+    return {n[len(PREFIXO_TABELA_ARQUIVO):].replace("_", "-"): get_pool().consultar(f"SELECT COUNT(*) FROM {n}")[0][0]
+            for n in nomes}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manutenção do log de auditoria.")
+    parser.add_argument("--arquivar", action="store_true", help="move meses antigos para fora de logs_auditoria")
+    parser.add_argument("--meses", type=int, default=MESES_RETENCAO, help="meses mantidos na tabela principal")
+    parser.add_argument("--destino", choices=["tabela", "arquivo"], default="tabela")
+    args = parser.parse_args(argv)
+    if not args.arquivar:
+        parser.print_help()
+        return
+    movidos = arquivar(args.meses, args.destino)
+    for mes, n in movidos:
+        print(f"{mes}: {n} linhas arquivadas ({args.destino})")
+    if not movidos:
+        print("Nada para arquivar.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""Autenticação: bcrypt com concorrência limitada e tokens de sessão assinados.
+
+* ``autenticar`` e ``create_user`` rodam o bcrypt num pool de
+  ``BCRYPT_THREADS`` threads e esperam o resultado: a thread do script
+  continua bloqueada durante o hash, mas num pico de logins no máximo
+  ``BCRYPT_THREADS`` hashes rodam juntos (os outros enfileiram em vez de
+  disputar a CPU) e, como o bcrypt solta o GIL, as demais sessões seguem
+  rodando. O custo é ``BCRYPT_CUSTO``; hashes gravados com outro custo são
+  refeitos no próximo login certo.
+* ``emitir_token``/``validar_token``: ``usuario.expira.assinatura``
+  (HMAC-SHA256), guardado na URL (``?sessao=``) para que recarregar a
+  página não peça login de novo. A assinatura cobre o hash da senha atual
+  e a época de sessões do usuário (``usuarios.sessao_epoca``): trocar a
+  senha ou sair (``encerrar_sessoes``) derruba todas as sessões dele.
+* O token na URL é um compromisso: o script do Streamlit não grava cookie
+  HttpOnly, então o token fica no histórico do navegador e em qualquer
+  link copiado da barra de endereço, e quem tiver o link entra como o
+  usuário até o token vencer (``SESSAO_HORAS``) ou ser revogado no logout.
+* As metas padrão são semeadas uma vez, na criação da conta, num INSERT.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import bcrypt
+
+from .config import (ARQUIVO_SEGREDO_SESSAO, BCRYPT_CUSTO, BCRYPT_THREADS, LISTA_CATEGORIAS, SEGREDO_SESSAO,
+                     SENHA_PADRAO_TEXTO, SESSAO_HORAS, USUARIO_PADRAO)
+from .db import get_pool, run_query
+from .shards import pool_de
+
+_executor = None
+_executor_lock = threading.Lock()
+_segredo = None
+_segredo_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=BCRYPT_THREADS, thread_name_prefix="bcrypt")
+    return _executor
+
+
+def _no_pool(funcao, *args):
+    # bloqueia quem chama: o pool só limita quantos hashes rodam ao mesmo tempo
+    return _get_executor().submit(funcao, *args).result()
+
+
+# --- Senhas ---
+def hash_senha(senha, custo=None):
+    return bcrypt.hashpw(senha.encode('utf-8'), bcrypt.gensalt(custo or BCRYPT_CUSTO)).decode('utf-8')
+
+
+def _conferir(senha, hash_salvo):
+    try:
+        return bcrypt.checkpw(senha.encode('utf-8'), hash_salvo.encode('utf-8'))
+    except ValueError:  # hash corrompido
+        return False
+
+
+def _custo(hash_salvo):
+    # '$2b$12$...' -> 12
+    try:
+        return int(hash_salvo.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def garantir_schema(conn):
+    if "sessao_epoca" not in [r[1] for r in conn.execute("PRAGMA table_info(usuarios)")]:
+        conn.execute("ALTER TABLE usuarios ADD COLUMN sessao_epoca INTEGER NOT NULL DEFAULT 0")
+
+
+def get_user_hash(username):
+    rows = get_pool().consultar("SELECT password_hash FROM usuarios WHERE username = ?", (username,))
+    return rows[0][0] if rows else None
+
+
+def autenticar(usuario, senha):
+    """True se a senha confere; bloqueia até o pool do bcrypt conferir (e, se preciso, refazer) o hash."""
+    hash_salvo = get_user_hash(usuario) if usuario else None
+    if hash_salvo and _no_pool(_conferir, senha, hash_salvo):
+        if _custo(hash_salvo) != BCRYPT_CUSTO:
+            run_query("UPDATE usuarios SET password_hash = ? WHERE username = ?",
+                      (_no_pool(hash_senha, senha), usuario))
+        return True
+    # Fallback do admin (senha texto) para não travar acesso
+    return usuario == USUARIO_PADRAO and hmac.compare_digest(senha.encode('utf-8'), SENHA_PADRAO_TEXTO.encode('utf-8'))
+
+
+def seed_metas_usuario(usuario):
+    """Metas padrão (limite 0) das categorias que o usuário ainda não tem, num único INSERT."""
+    pool_de(usuario).executar(
+        "INSERT OR IGNORE INTO metas_usuario (categoria, usuario, valor_limite) VALUES "
+        + ", ".join(["(?, ?, 0.0)"] * len(LISTA_CATEGORIAS)),
+        [v for cat in LISTA_CATEGORIAS for v in (cat, usuario)])
+
+
+def create_user(username, password):
+    run_query("INSERT INTO usuarios (username, password_hash, criado_em) VALUES (?,?,?)",
+              (username, _no_pool(hash_senha, password), datetime.now().strftime("%Y-%m-%d %H:%M")))
+    seed_metas_usuario(username)
+
+
+# --- Tokens de sessão ---
+def _chave():
+    global _segredo
+    if _segredo is None:
+        with _segredo_lock:
+            if _segredo is None:
+                _segredo = SEGREDO_SESSAO.encode('utf-8') if SEGREDO_SESSAO else _ler_ou_criar(ARQUIVO_SEGREDO_SESSAO)
+    return _segredo
+
+
+def _ler_ou_criar(arquivo):
+    # o link é atômico: com vários processos subindo juntos, só a primeira chave vale
+    if not os.path.exists(arquivo):
+        tmp = f"{arquivo}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(secrets.token_bytes(32))
+        os.chmod(tmp, 0o600)
+        try:
+            os.link(tmp, arquivo)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(tmp)
+    with open(arquivo, "rb") as f:
+        return f.read()
+
+
+def _b64(dados):
+    return base64.urlsafe_b64encode(dados).rstrip(b"=").decode('ascii')
+
+
+def _credencial(usuario):
+    # o que a assinatura cobre: (hash da senha, época das sessões)
+    rows = get_pool().consultar("SELECT password_hash, sessao_epoca FROM usuarios WHERE username = ?", (usuario,))
+    return tuple(rows[0]) if rows else (None, 0)
+
+
+def _assinar(corpo, credencial):
+    hash_salvo, epoca = credencial
+    return _b64(hmac.new(_chave(), f"{corpo}|{hash_salvo or ''}|{epoca}".encode('utf-8'), hashlib.sha256).digest())
+
+
+def emitir_token(usuario, horas=SESSAO_HORAS, agora=None):
+    corpo = f"{_b64(usuario.encode('utf-8'))}.{int((agora or time.time()) + horas * 3600)}"
+    return f"{corpo}.{_assinar(corpo, _credencial(usuario))}"
+
+
+def encerrar_sessoes(usuario):
+    """Revoga todos os tokens já emitidos para ``usuario`` (logout)."""
+    run_query("UPDATE usuarios SET sessao_epoca = sessao_epoca + 1 WHERE username = ?", (usuario,))
+
+
+def validar_token(token, agora=None):
+    """Usuário do token, ou None se for inválido, tiver expirado, a senha tiver mudado ou a sessão tiver sido
+    encerrada."""
+    try:
+        nome, expira, assinatura = (token or "").split(".")
+        usuario = base64.urlsafe_b64decode(nome + "=" * (-len(nome) % 4)).decode('utf-8')
+        expira = int(expira)
+    except ValueError:
+        return None
+    if expira < (agora or time.time()):
+        return None
+    esperada = _assinar(f"{nome}.{expira}", _credencial(usuario))
+    if not hmac.compare_digest(assinatura.encode('utf-8'), esperada.encode('utf-8')):
+        return None
+    return usuario
@@ -0,0 +1,351 @@
+"""Backups online com a API de backup do SQLite, retenção e restauração.
+
+* ``criar_backup`` copia o banco com ``Connection.backup``. Em WAL (o modo
+  do app) a cópia é um passo só: é uma transação de leitura sobre um
+  snapshot, que não bloqueia escritores, enquanto uma cópia em passos
+  recomeçaria a cada escrita de outra conexão. Em modo rollback-journal a
+  leitura bloqueia escritores, então a cópia vai em passos de
+  ``PAGINAS_POR_PASSO`` páginas com uma pausa entre eles para os escritores
+  entrarem; se as escritas a reiniciarem mais de ``MAX_REINICIOS`` vezes, o
+  restante vai num passo só.
+* A cópia passa por ``PRAGMA integrity_check`` antes de virar snapshot
+  (``backup_AAAAMMDD_HHMMSS.db.gz`` em ``backups/``); só então entra a
+  retenção, que mantém os ``BACKUP_MANTER`` mais recentes.
+* ``restaurar`` grava o snapshot por cima do banco também pela API de
+  backup, numa única transação: outras conexões (inclusive de outros
+  processos) veem o banco antigo ou o novo, nunca uma mistura.
+* Banco dividido (``shards``): cada shard vira um arquivo irmão
+  (``backup_AAAAMMDD_HHMMSS.shard_NN.db.gz``) gravado antes do catálogo, e a retenção e
+  a restauração tratam o conjunto pelo carimbo de data. Cada arquivo é um
+  snapshot próprio; os dados de um usuário estão num só.
+* Duração, tamanho do banco e do snapshot ficam em ``historico_backups``.
+
+Manutenção::
+
+    python -m cyberfinance.backup --agora [--sem-compressao]
+    python -m cyberfinance.backup --listar
+    python -m cyberfinance.backup --restaurar backups/backup_20260101_030000.db.gz
+"""
+import argparse
+import gzip
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from . import shards
+from .cache import get_cache
+from .config import BACKUP_DIR, BACKUP_INTERVALO_HORAS, BACKUP_MANTER
+from .db import get_pool
+
+PAGINAS_POR_PASSO = 1024    # 4 MB por passo com páginas de 4 KB
+PAUSA_ENTRE_PASSOS = 0.005  # segundos; é aqui que os escritores entram
+MAX_REINICIOS = 5
+ATRASO_INICIAL = 60         # segundos antes da primeira checagem do agendador
+NIVEL_COMPRESSAO = 1       # ~4x mais rápido que o 6, arquivo ~17% maior
+
+_RE_SNAPSHOT = re.compile(r"^backup_(\d{8}_\d{6})(?:\.shard_\d+)?\.db(\.gz)?$")
+
+ultimo_erro = None
+_agendador = None
+_agendador_lock = threading.Lock()
+
+
+class ErroBackup(Exception):
+    pass
+
+
+class _MuitosReinicios(Exception):
+    pass
+
+
+def garantir_schema(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS historico_backups (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                 "quando TEXT NOT NULL, tipo TEXT NOT NULL, arquivo TEXT NOT NULL, duracao_s REAL, "
+                 "tamanho_banco INTEGER, tamanho_arquivo INTEGER, passos INTEGER, reinicios INTEGER)")
+
+
+def _copiar(origem, destino, paginas, pausa):
+    """Backup (em passos fora de WAL); devolve (passos, reinícios)."""
+    if origem.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal":
+        origem.backup(destino, pages=-1)
+        return 1, 0
+    estado = {"passos": 0, "reinicios": 0, "restante": None}
+
+    def progresso(status, restante, total):
+        estado["passos"] += 1
+        if status == sqlite3.SQLITE_OK and estado["restante"] is not None and restante >= estado["restante"]:
+            # passo sem avanço: a origem mudou por outra conexão e o SQLite recomeçou do início
+            estado["reinicios"] += 1
+            if estado["reinicios"] > MAX_REINICIOS:
+                raise _MuitosReinicios()
+        estado["restante"] = restante
+        if restante and pausa:
+            time.sleep(pausa)
+
+    try:
+        origem.backup(destino, pages=paginas, progress=progresso, sleep=pausa)
+    except _MuitosReinicios:
+        origem.backup(destino, pages=-1)
+        estado["passos"] += 1
+    return estado["passos"], estado["reinicios"]
+
+
+def _verificar(conn):
+    resultado = [r[0] for r in conn.execute("PRAGMA integrity_check").fetchall()]
+    if resultado != ["ok"]:
+        raise ErroBackup("integrity_check falhou: " + "; ".join(resultado[:5]))
+
+
+def _tamanho_logico(conn):
+    return conn.execute("PRAGMA page_count").fetchone()[0] * conn.execute("PRAGMA page_size").fetchone()[0]
+
+
+def _registrar(tipo, arquivo, duracao, tamanho_banco, tamanho_arquivo, passos=None, reinicios=None):
+    get_pool().executar(
+        "INSERT INTO historico_backups (quando, tipo, arquivo, duracao_s, tamanho_banco, tamanho_arquivo, "
+        "passos, reinicios) VALUES (?,?,?,?,?,?,?,?)",
+        (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), tipo, os.path.basename(arquivo), round(duracao, 3),
+         tamanho_banco, tamanho_arquivo, passos, reinicios))
+
+
+def _arquivo_shard(arquivo, numero):
+    """backup_X.db.gz -> backup_X.shard_03.db.gz"""
+    return re.sub(r"\.db(\.gz)?$", rf".shard_{numero:02d}.db\1", arquivo)
+
+
+def _snapshot(caminho, final, comprimir, paginas_por_passo, pausa):
+    """Copia verificada de ``caminho`` em ``final``; devolve (passos, reinícios, tamanho do banco)."""
+    parcial = re.sub(r"\.gz$", "", final) + ".parcial"
+    origem = sqlite3.connect(caminho, timeout=5)
+    destino = sqlite3.connect(parcial)
+    try:
+        passos, reinicios = _copiar(origem, destino, paginas_por_passo, pausa)
+        _verificar(destino)
+        tamanho_banco = _tamanho_logico(destino)
+        destino.close()
+        if comprimir:
+            with open(parcial, "rb") as src, gzip.open(final + ".parcial", "wb", NIVEL_COMPRESSAO) as dst:
+                shutil.copyfileobj(src, dst, 1 << 20)
+            os.replace(final + ".parcial", final)
+        else:
+            os.replace(parcial, final)
+    finally:
+        origem.close()
+        destino.close()
+        for resto in (parcial, final + ".parcial"):
+            if resto != final and os.path.exists(resto):
+                os.remove(resto)
+    return passos, reinicios, tamanho_banco
+
+
+def criar_backup(pasta=BACKUP_DIR, comprimir=True, paginas_por_passo=PAGINAS_POR_PASSO,
+                 pausa=PAUSA_ENTRE_PASSOS, sufixo=""):
+    """Snapshot verificado do banco em ``pasta``; devolve o caminho do arquivo.
+
+    O arquivo final só aparece (``os.replace``) depois da verificação e da
+    compressão, então um backup interrompido nunca fica com cara de válido.
+    Os shards são gravados antes, ao lado; o catálogo fecha o conjunto.
+    """
+    inicio = time.perf_counter()
+    os.makedirs(pasta, exist_ok=True)
+    nome = f"backup_{datetime.now():%Y%m%d_%H%M%S}{sufixo}.db"
+    final = os.path.join(pasta, nome + (".gz" if comprimir else ""))
+    arquivos = [(shard.caminho, _arquivo_shard(final, i)) for i, shard in enumerate(shards.registrados())]
+    arquivos.append((get_pool().caminho, final))
+    passos = reinicios = tamanho_banco = 0
+    for origem, destino in arquivos:
+        p, r, t = _snapshot(origem, destino, comprimir, paginas_por_passo, pausa)
+        passos, reinicios, tamanho_banco = passos + p, reinicios + r, tamanho_banco + t
+    _registrar("backup", final, time.perf_counter() - inicio, tamanho_banco,
+               sum(os.path.getsize(d) for _, d in arquivos), passos, reinicios)
+    return final
+
+
+def listar(pasta=BACKUP_DIR):
+    """Arquivos de backup em ``pasta`` (inclusive os manuais ``*.db``), mais recentes primeiro."""
+    linhas = []
+    if os.path.isdir(pasta):
+        for nome in os.listdir(pasta):
+            if not (nome.endswith(".db") or nome.endswith(".db.gz")):
+                continue
+            caminho = os.path.join(pasta, nome)
+            st = os.stat(caminho)
+            linhas.append({"arquivo": nome, "modificado": datetime.fromtimestamp(st.st_mtime).strftime("%Y-%m-%d %H:%M:%S"),
+                           "tamanho_mb": round(st.st_size / 2 ** 20, 2), "comprimido": nome.endswith(".gz"),
+                           "automatico": bool(_RE_SNAPSHOT.match(nome))})
+    df = pd.DataFrame(linhas, columns=["arquivo", "modificado", "tamanho_mb", "comprimido", "automatico"])
+    return df.sort_values("modificado", ascending=False, ignore_index=True)
+
+
+def aplicar_retencao(pasta=BACKUP_DIR, manter=BACKUP_MANTER):
+    """Apaga os snapshots automáticos além dos ``manter`` mais recentes; devolve os removidos.
+
+    Arquivos fora do padrão (cópias manuais, ``*_pre_restauracao``) não são tocados.
+    """
+    if not os.path.isdir(pasta):
+        return []
+    snapshots = sorted((m.group(1), nome) for nome in os.listdir(pasta) if (m := _RE_SNAPSHOT.match(nome)))
+    # um snapshot = um carimbo (catálogo e shards juntos)
+    carimbos = sorted({c for c, _ in snapshots})
+    antigos = set(carimbos[:max(len(carimbos) - manter, 0)])
+    removidos = [nome for c, nome in snapshots if c in antigos]
+    for nome in removidos:
+        os.remove(os.path.join(pasta, nome))
+    return removidos
+
+
+def historico(limite=50):
+    return get_pool().consultar_df(
+        "SELECT quando, tipo, arquivo, duracao_s, ROUND(tamanho_banco / 1048576.0, 2) AS banco_mb, "
+        "ROUND(tamanho_arquivo / 1048576.0, 2) AS arquivo_mb, passos, reinicios "
+        "FROM historico_backups ORDER BY id DESC LIMIT ?", (limite,))
+
+
+def _abrir_snapshot(arquivo, temporario, abertos):
+    """Descompacta ``arquivo`` em ``temporario`` e verifica; (conexão, temporário) entra em ``abertos``."""
+    abertos.append((None, temporario))
+    if arquivo.endswith(".gz"):
+        with gzip.open(arquivo, "rb") as src, open(temporario, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1 << 20)
+    else:
+        shutil.copyfile(arquivo, temporario)
+    snapshot = sqlite3.connect(temporario)
+    abertos[-1] = (snapshot, temporario)
+    _verificar(snapshot)
+    return snapshot
+
+
+def restaurar(arquivo, copia_antes=True, pasta=BACKUP_DIR):
+    """Substitui o conteúdo do banco pelo snapshot ``arquivo``.
+
+    O snapshot é descompactado e verificado num arquivo temporário; com
+    ``copia_antes`` o banco atual vira ``backup_..._pre_restauracao.db.gz``.
+    Se o catálogo do snapshot lista shards, os arquivos irmãos de cada um
+    precisam estar ao lado e são restaurados antes dele.
+    Snapshots de versões antigas do schema são migrados em seguida.
+    """
+    from . import auditoria, migracoes
+
+    if not os.path.exists(arquivo):
+        raise ErroBackup(f"Arquivo não encontrado: {arquivo}")
+    inicio = time.perf_counter()
+    pool = get_pool()
+    base = os.path.dirname(os.path.abspath(pool.caminho))
+    abertos = []
+    try:
+        catalogo = _abrir_snapshot(arquivo, pool.caminho + ".restaurando", abertos)
+        alvos = []
+        if catalogo.execute("SELECT 1 FROM sqlite_master WHERE name = 'shards'").fetchone():
+            for numero, relativo in catalogo.execute("SELECT numero, caminho FROM shards ORDER BY numero").fetchall():
+                irmao = _arquivo_shard(arquivo, numero)
+                if not os.path.exists(irmao):
+                    raise ErroBackup(f"Snapshot do shard {numero} não encontrado: {irmao}")
+                destino = os.path.join(base, relativo)
+                os.makedirs(os.path.dirname(destino), exist_ok=True)
+                alvos.append((_abrir_snapshot(irmao, destino + ".restaurando", abertos), destino))
+        # o catálogo por último: é ele que aponta para os shards
+        alvos.append((catalogo, pool.caminho))
+        auditoria.descarregar()
+        if copia_antes:
+            criar_backup(pasta, sufixo="_pre_restauracao")
+        for snapshot, destino in alvos:
+            vivo = sqlite3.connect(destino, timeout=30)
+            try:
+                # um passo só: a troca inteira é uma transação de escrita no banco vivo
+                snapshot.backup(vivo, pages=-1)
+            except sqlite3.OperationalError as e:
+                raise ErroBackup(f"Não foi possível gravar no banco (tamanho de página diferente?): {e}") from e
+            finally:
+                vivo.close()
+        tamanho = sum(_tamanho_logico(snapshot) for snapshot, _ in alvos)
+    finally:
+        for snapshot, temporario in abertos:
+            if snapshot is not None:
+                snapshot.close()
+            if os.path.exists(temporario):
+                os.remove(temporario)
+    shards.esquecer()
+    migracoes.esquecer()
+    migracoes.migrar(pool)
+    get_cache().limpar()
+    _registrar("restauracao", arquivo, time.perf_counter() - inicio, tamanho, os.path.getsize(arquivo))
+    return tamanho
+
+
+# --- Agendador ---
+def _segundos_desde_ultimo():
+    quando = get_pool().consultar("SELECT MAX(quando) FROM historico_backups WHERE tipo = 'backup'")[0][0]
+    if quando is None:
+        return None
+    return (datetime.now() - datetime.strptime(quando, "%Y-%m-%d %H:%M:%S")).total_seconds()
+
+
+def _loop_agendador(intervalo_horas, manter):
+    global ultimo_erro
+    intervalo = intervalo_horas * 3600
+    time.sleep(ATRASO_INICIAL)  # não disputa o disco com o cold start do app
+    while True:
+        try:
+            decorrido = _segundos_desde_ultimo()
+            if decorrido is None or decorrido >= intervalo:
+                criar_backup()
+                aplicar_retencao(manter=manter)
+                ultimo_erro = None
+                espera = intervalo
+            else:
+                espera = intervalo - decorrido
+        except Exception as e:  # disco cheio, banco ocupado...: tenta de novo mais tarde
+            ultimo_erro = f"{datetime.now():%Y-%m-%d %H:%M:%S} {e}"
+            espera = min(intervalo, 3600)
+        time.sleep(max(espera, 1))
+
+
+def iniciar_agendador(intervalo_horas=BACKUP_INTERVALO_HORAS, manter=BACKUP_MANTER):
+    """Thread de backups periódicos (uma por processo); intervalo <= 0 desliga."""
+    global _agendador
+    if intervalo_horas <= 0 or _agendador is not None:
+        return
+    with _agendador_lock:
+        if _agendador is None:
+            _agendador = threading.Thread(target=_loop_agendador, args=(intervalo_horas, manter),
+                                          name="backup-agendador", daemon=True)
+            _agendador.start()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backups online do banco.")
+    parser.add_argument("--agora", action="store_true", help="faz um backup e aplica a retenção")
+    parser.add_argument("--sem-compressao", action="store_true")
+    parser.add_argument("--manter", type=int, default=BACKUP_MANTER, help="snapshots automáticos mantidos")
+    parser.add_argument("--listar", action="store_true")
+    parser.add_argument("--restaurar", metavar="ARQUIVO", help="substitui o banco pelo snapshot")
+    parser.add_argument("--sem-copia", action="store_true", help="não salva o banco atual antes de restaurar")
+    args = parser.parse_args(argv)
+    from . import migracoes
+
+    migracoes.migrar()
+    if args.agora:
+        caminho = criar_backup(comprimir=not args.sem_compressao)
+        print(f"Backup gravado em {caminho}")
+        for nome in aplicar_retencao(manter=args.manter):
+            print(f"Removido pela retenção: {nome}")
+    elif args.restaurar:
+        tamanho = restaurar(args.restaurar, copia_antes=not args.sem_copia)
+        print(f"Banco restaurado de {args.restaurar} ({tamanho / 2 ** 20:.1f} MB). "
+              "Reinicie o app para descartar caches de outros processos.")
+    elif args.listar:
+        print(listar().to_string(index=False))
+        print()
+        print(historico(20).to_string(index=False))
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+"""Benchmarks headless dos caminhos quentes do CyberFinance.
+
+``gerador`` cria bancos e CSVs sintéticos; ``cenarios`` mede painel, busca,
+importação, classificador, metas, previsão, PDF e auditoria sem a interface
+do Streamlit; ``medicao`` calcula percentis, vazão e pico de memória e
+compara dois resultados JSON. Uso::
+
+    python -m cyberfinance.bench gerar-banco /tmp/bench.db --usuarios 2000 --meses 24
+    python -m cyberfinance.bench rodar --banco /tmp/bench.db --saida base.json
+    python -m cyberfinance.bench comparar base.json novo.json
+"""
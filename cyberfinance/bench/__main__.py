@@ -0,0 +1,76 @@
+import argparse
+import sys
+
+from . import cenarios, gerador, medicao
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m cyberfinance.bench",
+                                     description="Dados sintéticos e benchmarks headless do CyberFinance.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("gerar-banco", help="cria um banco SQLite sintético com o schema atual")
+    p.add_argument("caminho")
+    p.add_argument("--usuarios", type=int, default=1000)
+    p.add_argument("--meses", type=int, default=24)
+    p.add_argument("--transacoes-mes", type=int, default=40, help="despesas médias por usuário e mês")
+    p.add_argument("--logs-por-usuario", type=int, default=20)
+    p.add_argument("--semente", type=int, default=gerador.SEMENTE_PADRAO)
+    p.add_argument("--sobrescrever", action="store_true")
+
+    p = sub.add_parser("gerar-csv", help="cria um extrato CSV no formato de importação")
+    p.add_argument("caminho")
+    p.add_argument("--linhas", type=int, default=10_000)
+    p.add_argument("--semente", type=int, default=gerador.SEMENTE_PADRAO)
+
+    p = sub.add_parser("rodar", help="mede os cenários sobre um banco")
+    p.add_argument("--banco", required=True)
+    p.add_argument("--cenarios", help=f"lista separada por vírgula (padrão: todos). Opções: {', '.join(cenarios.CENARIOS)}")
+    p.add_argument("--repeticoes", type=int, help="sobrepõe as repetições padrão de cada cenário")
+    p.add_argument("--aquecimento", type=int, default=2)
+    p.add_argument("--semente", type=int, default=0)
+    p.add_argument("--linhas-csv", type=int, default=cenarios.LINHAS_CSV)
+    p.add_argument("--sem-memoria", action="store_true", help="não mede o pico de memória (tracemalloc)")
+    p.add_argument("--saida", help="grava o resultado em JSON")
+
+    p = sub.add_parser("comparar", help="compara dois resultados JSON; sai com 1 se houver regressão")
+    p.add_argument("base")
+    p.add_argument("novo")
+    p.add_argument("--metrica", default=medicao.METRICA_PADRAO)
+    p.add_argument("--tolerancia", type=float, default=medicao.TOLERANCIA_PADRAO, help="variação relativa aceita (0.10 = 10%%)")
+
+    args = parser.parse_args(argv)
+
+    if args.comando == "gerar-banco":
+        def _progresso(p):
+            print(f"\r{p['usuarios']} usuários, {p['linhas']:,} linhas ({p['linhas'] / p['segundos']:,.0f} linhas/s)",
+                  end="", file=sys.stderr)
+        res = gerador.gerar_banco(args.caminho, args.usuarios, args.meses, args.transacoes_mes,
+                                  args.logs_por_usuario, args.semente, sobrescrever=args.sobrescrever,
+                                  progresso=_progresso)
+        print(file=sys.stderr)
+        print(f"{res['linhas']:,} movimentações de {res['usuarios']} usuários em {res['segundos_total']}s "
+              f"(carga {res['segundos_carga']}s); {res['tamanho_mb']} MB -> {res['caminho']}")
+    elif args.comando == "gerar-csv":
+        res = gerador.gerar_csv(args.caminho, args.linhas, args.semente)
+        print(f"{res['linhas']:,} linhas -> {res['caminho']}")
+    elif args.comando == "rodar":
+        nomes = args.cenarios.split(",") if args.cenarios else None
+        res = cenarios.executar(args.banco, nomes, args.repeticoes, args.aquecimento, args.semente,
+                                memoria=not args.sem_memoria, linhas_csv=args.linhas_csv,
+                                progresso=lambda nome, r: print(f"{nome}: p50 {r['p50_ms']:.2f} ms", file=sys.stderr))
+        b = res["banco"]
+        print(f"{b['movimentacoes']:,} movimentações, {b['usuarios']} usuários, {b['tamanho_mb']} MB")
+        print(medicao.formatar_tabela(res))
+        if args.saida:
+            medicao.salvar(res, args.saida)
+    elif args.comando == "comparar":
+        linhas = medicao.comparar(medicao.carregar(args.base), medicao.carregar(args.novo),
+                                  args.metrica, args.tolerancia)
+        print(medicao.formatar_comparacao(linhas, args.metrica))
+        return 1 if any(l[4] == "regressao" for l in linhas) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
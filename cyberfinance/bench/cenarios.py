@@ -0,0 +1,272 @@
+"""Cenários de benchmark: os caminhos quentes do app, sem Streamlit.
+
+Cada cenário recebe o ``Contexto`` (amostra de usuários e meses do banco) e
+devolve a função de uma operação, que sorteia usuário/mês/termo a cada
+chamada. As leituras usam ``.sem_cache`` para medir o custo real que o
+cache versionado esconde nas repetições do app.
+"""
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import numpy as np
+
+from .. import auditoria as aud
+from .. import auth, busca, importacao, metas, migracoes, previsao, shards
+from .. import movimentacoes as mov
+from ..classificador import classificar_ia, classify_many
+from ..db import configurar
+from . import gerador
+from .medicao import ambiente, medir
+
+AMOSTRA_USUARIOS = 50
+LINHAS_CSV = 10_000
+PREFIXO_IMPORTACAO = "bench_import_"
+ESCRITORES = 8
+LANCAMENTOS_POR_ESCRITOR = 50
+LOGINS_SIMULTANEOS = 16
+SENHA_BENCH = "senha-bench"
+
+
+class Contexto:
+    def __init__(self, pool, semente=0, amostra=AMOSTRA_USUARIOS, linhas_csv=LINHAS_CSV):
+        self.pool = pool
+        self.rng = np.random.default_rng(semente)
+        self.hoje = date.today()
+        self.linhas_csv = linhas_csv
+        self.tmp = tempfile.mkdtemp(prefix="cyberfinance_bench_")
+        todos = sorted(shards.consultar_df("SELECT DISTINCT usuario FROM resumo_mensal WHERE mes != ''")["usuario"])
+        if not todos:
+            raise ValueError("Banco sem movimentações; gere um com 'gerar-banco'.")
+        escolhidos = self.rng.choice(len(todos), size=min(amostra, len(todos)), replace=False)
+        self.usuarios = [todos[i] for i in escolhidos]
+        self.meses = {u: mov.listar_meses.sem_cache(u) for u in self.usuarios}
+        self._contador = 0
+
+    def usuario(self):
+        return self.usuarios[self.rng.integers(len(self.usuarios))]
+
+    def usuario_mes(self):
+        u = self.usuario()
+        meses = self.meses[u]
+        return u, meses[self.rng.integers(len(meses))]
+
+    def proximo(self):
+        self._contador += 1
+        return self._contador
+
+
+def painel(ctx):
+    # tudo o que a aba Painel lê ao trocar de mês
+    def op():
+        u, m = ctx.usuario_mes()
+        mov.listar_meses.sem_cache(u)
+        mov.kpis_por_mes.sem_cache(u, m)
+        mov.totais_categoria.sem_cache(u, m)
+        mov.totais_tipo.sem_cache(u, m)
+        return len(mov.carregar_mes.sem_cache(u, m))
+    return op
+
+
+def busca_global(ctx):
+    def op():
+        u = ctx.usuario()
+        termo = gerador.TERMOS_BUSCA[ctx.rng.integers(len(gerador.TERMOS_BUSCA))]
+        busca.totais.sem_cache(u, termo)
+        pagina, cursor = busca.buscar.sem_cache(u, termo)
+        n = len(pagina)
+        if cursor is not None:
+            n += len(busca.buscar.sem_cache(u, termo, cursor)[0])
+        return n
+    return op
+
+
+def importacao_csv(ctx):
+    arquivo = os.path.join(ctx.tmp, "extrato.csv")
+    gerador.gerar_csv(arquivo, ctx.linhas_csv, semente=int(ctx.rng.integers(1 << 31)))
+
+    def op():
+        # usuário novo a cada vez: mede inserção, não só a deduplicação
+        res = importacao.importar_csv(arquivo, f"{PREFIXO_IMPORTACAO}{ctx.proximo()}")
+        return res["lidas"]
+    return op
+
+
+def escritores(ctx):
+    # lançamentos avulsos de vários usuários ao mesmo tempo, um por transação (como o formulário)
+    usuarios = [f"{PREFIXO_IMPORTACAO}escritor_{i}" for i in range(ESCRITORES)]
+    hoje = ctx.hoje.isoformat()
+
+    def escrever(u):
+        pool = shards.pool_de(u)
+        for _ in range(LANCAMENTOS_POR_ESCRITOR):
+            pool.executar("INSERT INTO movimentacoes (data, categoria, descricao, valor_centavos, tipo, usuario) "
+                          "VALUES (?,?,?,?,?,?)", (hoje, "Outros", "Lancamento bench", 1990, "Despesa", u))
+
+    def op():
+        with ThreadPoolExecutor(max_workers=ESCRITORES) as executor:
+            list(executor.map(escrever, usuarios))
+        return ESCRITORES * LANCAMENTOS_POR_ESCRITOR
+    return op
+
+
+def logins(ctx):
+    # pico de logins: várias sessões autenticando ao mesmo tempo e validando o token
+    # (o bcrypt usa o custo e o pool configurados em ``auth``)
+    usuarios = [f"{PREFIXO_IMPORTACAO}login_{i}" for i in range(LOGINS_SIMULTANEOS)]
+    for u in usuarios:
+        if not auth.get_user_hash(u):
+            auth.create_user(u, SENHA_BENCH)
+
+    def entrar(u):
+        if not auth.autenticar(u, SENHA_BENCH) or auth.validar_token(auth.emitir_token(u)) != u:
+            raise RuntimeError(f"Login de {u} falhou.")
+
+    def op():
+        with ThreadPoolExecutor(max_workers=LOGINS_SIMULTANEOS) as executor:
+            list(executor.map(entrar, usuarios))
+        return LOGINS_SIMULTANEOS
+    return op
+
+
+def classificador_unitario(ctx):
+    # descrições inéditas a cada lote: o memo do classificador não ajuda
+    base = gerador.DESCRICOES
+
+    def op():
+        k = ctx.proximo()
+        for i, d in enumerate(base[ctx.rng.integers(0, len(base), 1000)]):
+            classificar_ia(f"{d} {k}-{i}", ctx.usuario())
+        return 1000
+    return op
+
+
+def classificador_lote(ctx):
+    base = gerador.DESCRICOES
+    n = 100_000
+    # ~5 mil descrições distintas, como num extrato real
+    descricoes = [f"{d} {s}" for d, s in zip(base[ctx.rng.integers(0, len(base), n)], ctx.rng.integers(0, 140, n))]
+
+    def op():
+        classify_many(descricoes, ctx.usuario())
+        return n
+    return op
+
+
+def metas_usuario(ctx):
+    def op():
+        u, m = ctx.usuario_mes()
+        return len(metas.progresso_metas.sem_cache(u, m))
+    return op
+
+
+def metas_lote(ctx):
+    # varredura de estouros de todos os usuários num mês (alertas em lote)
+    def op():
+        _, m = ctx.usuario_mes()
+        return len(metas.avaliar(m))
+    return op
+
+
+def previsao_usuario(ctx):
+    def op():
+        modelo = previsao._ajustar.sem_cache(ctx.usuario(), ctx.hoje, previsao.ALPHA_PADRAO)
+        modelo.projecao_mes_atual()
+        modelo.previsoes(3)
+        modelo.backtest()
+        return len(modelo.categorias)
+    return op
+
+
+def pdf_mes(ctx):
+    from .. import relatorio
+
+    def op():
+        u, m = ctx.usuario_mes()
+        df = mov.carregar_mes.sem_cache(u, m)
+        relatorio.gerar_pdf(df, periodo=m)
+        return len(df)
+    return op
+
+
+def auditoria(ctx):
+    # o que a aba Auditoria lê: filtros, total e primeira página (usuário comum e admin, 30 dias)
+    def op():
+        fim = np.datetime64(ctx.hoje) - ctx.rng.integers(0, 365)
+        ini = fim - 30
+        aud.acoes()
+        n = 0
+        for usuario in (ctx.usuario(), None):
+            aud.contar(usuario, None, ini, fim)
+            n += len(aud.pagina(usuario, None, ini, fim)[0])
+        return n
+    return op
+
+
+# nome -> (fábrica, repetições padrão)
+CENARIOS = {
+    "painel": (painel, 50),
+    "busca": (busca_global, 50),
+    "importacao_csv": (importacao_csv, 5),
+    "escritores": (escritores, 5),
+    "logins": (logins, 3),
+    "classificar_ia": (classificador_unitario, 20),
+    "classify_many": (classificador_lote, 10),
+    "metas": (metas_usuario, 50),
+    "metas_lote": (metas_lote, 5),
+    "previsao": (previsao_usuario, 30),
+    "pdf": (pdf_mes, 10),
+    "auditoria": (auditoria, 50),
+}
+
+
+def _limpar(ctx):
+    for pool in shards.pools():
+        with pool.transacao() as conn:
+            conn.execute("DELETE FROM movimentacoes WHERE usuario LIKE ?", (PREFIXO_IMPORTACAO + "%",))
+            conn.execute("DELETE FROM metas_usuario WHERE usuario LIKE ?", (PREFIXO_IMPORTACAO + "%",))
+    ctx.pool.executar("DELETE FROM usuarios WHERE username LIKE ?", (PREFIXO_IMPORTACAO + "%",))
+    shutil.rmtree(ctx.tmp, ignore_errors=True)
+
+
+def executar(banco, cenarios=None, repeticoes=None, aquecimento=2, semente=0, memoria=True,
+             linhas_csv=LINHAS_CSV, progresso=None):
+    """Roda os cenários sobre ``banco`` e devolve o resultado (serializável em JSON).
+
+    ``repeticoes`` sobrepõe o padrão de cada cenário. Os cenários de importação
+    de escritores e de logins gravam em usuários ``bench_import_*``, apagados no fim.
+    """
+    nomes = list(cenarios or CENARIOS)
+    desconhecidos = set(nomes) - set(CENARIOS)
+    if desconhecidos:
+        raise ValueError(f"Cenários desconhecidos: {', '.join(sorted(desconhecidos))}")
+    pool = configurar(banco)
+    migracoes.migrar(pool)
+    ctx = Contexto(pool, semente, linhas_csv=linhas_csv)
+    bancos = shards.resumo()
+    resultado = {
+        "ambiente": ambiente(),
+        "banco": {
+            "caminho": os.path.abspath(banco),
+            "tamanho_mb": round(os.path.getsize(banco) / 2 ** 20 + (bancos["tamanho_mb"].sum() if shards.ativo() else 0), 1),
+            "shards": len(shards.registrados()),
+            "movimentacoes": int(bancos["movimentacoes"].sum()),
+            "usuarios": int(bancos["usuarios"].sum()),
+            "logs_auditoria": pool.consultar("SELECT COUNT(*) FROM logs_auditoria")[0][0],
+        },
+        "parametros": {"semente": semente, "aquecimento": aquecimento, "amostra_usuarios": len(ctx.usuarios),
+                       "linhas_csv": linhas_csv},
+        "cenarios": {},
+    }
+    try:
+        for nome in nomes:
+            fabrica, padrao = CENARIOS[nome]
+            r = medir(fabrica(ctx), repeticoes or padrao, aquecimento, memoria)
+            resultado["cenarios"][nome] = r
+            if progresso:
+                progresso(nome, r)
+    finally:
+        _limpar(ctx)
+    return resultado
@@ -0,0 +1,248 @@
+"""Gerador de dados sintéticos (bancos e CSVs) para os benchmarks.
+
+Cada usuário tem um perfil de gasto por categoria (escala log-normal) com
+sazonalidade mensal: dezembro e janeiro mais caros, material escolar em
+fevereiro, férias em julho. As descrições saem de um vocabulário que
+exercita as regras do classificador e a busca (inclusive descrições que caem
+em "Outros"). Tudo é vetorizado em NumPy e gravado em blocos, então gerar
+dezenas de milhões de linhas é limitado pelo SQLite, não pelo Python.
+
+A carga em massa roda com as migrações paradas antes dos índices; índices,
+FTS e ``resumo_mensal`` são construídos uma vez no fim, bem mais rápido que
+manter tudo linha a linha.
+"""
+import os
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from .. import migracoes
+from ..config import LISTA_CATEGORIAS
+from ..db import PRAGMAS_PADRAO, PoolConexoes
+
+SEMENTE_PADRAO = 42
+TAMANHO_BLOCO = 200_000
+SENHA_BENCH = "bench"
+ACOES_AUDITORIA = ["Login Realizado", "Usuário Criado", "Metas Atualizadas", "Relatório Exportado"]
+
+# categoria -> (peso na quantidade de lançamentos, valor médio em R$, descrições)
+PERFIL_CATEGORIAS = {
+    "Alimentação": (0.34, 45.0, ["iFood pedido", "Pizza Hut", "Burger King", "Restaurante Sabor", "Mc Donalds",
+                                  "Comida japonesa", "Padaria Pao Quente", "Mercado Dia"]),
+    "Transporte": (0.18, 38.0, ["Uber viagem", "Posto Shell", "Gasolina Ipiranga", "99 corrida", "Metro recarga"]),
+    "Lazer": (0.12, 60.0, ["Netflix", "Spotify", "Steam jogo", "Cinema Cinemark", "Prime Video", "Game Pass"]),
+    "Educação": (0.06, 180.0, ["Faculdade mensalidade", "Curso Alura", "Livro Amazon", "Udemy curso"]),
+    "Hardware": (0.04, 320.0, ["Monitor 27", "Mouse gamer", "Teclado mecanico", "SSD 1TB", "Memoria RAM"]),
+    "Contas Fixas": (0.14, 210.0, ["Conta de Luz", "Agua e esgoto", "Internet Fibra", "Aluguel apartamento"]),
+    "Outros": (0.12, 75.0, ["Farmacia Drogasil", "Pet shop", "Presente aniversario", "Pix Joao", "Barbearia"]),
+}
+RECEITAS = ["Salario", "Freelance", "Reembolso", "Rendimentos"]
+
+# multiplicador do valor por mês do ano (índice 0 = janeiro), por categoria
+SAZONALIDADE = {
+    "Alimentação": [1.05, 0.95, 1.00, 0.98, 1.00, 1.02, 1.08, 1.00, 0.98, 1.00, 1.05, 1.35],
+    "Transporte": [0.95, 0.95, 1.00, 1.00, 1.00, 1.00, 1.20, 1.00, 1.00, 1.00, 1.00, 1.15],
+    "Lazer": [1.20, 0.90, 0.95, 0.95, 0.95, 1.00, 1.30, 1.00, 0.95, 1.00, 1.05, 1.40],
+    "Educação": [1.50, 1.60, 1.00, 0.90, 0.90, 0.90, 1.30, 1.10, 0.90, 0.90, 0.90, 0.80],
+    "Hardware": [0.90, 0.90, 0.90, 0.90, 1.00, 1.00, 1.00, 1.00, 1.00, 1.00, 1.60, 1.40],
+    "Contas Fixas": [1.10, 1.10, 1.05, 1.00, 0.95, 0.95, 0.95, 0.95, 1.00, 1.00, 1.05, 1.10],
+    "Outros": [1.00, 0.95, 1.00, 1.00, 1.05, 1.00, 1.00, 1.00, 1.00, 1.00, 1.10, 1.50],
+}
+
+CATEGORIAS = list(PERFIL_CATEGORIAS)
+_PESOS = np.array([PERFIL_CATEGORIAS[c][0] for c in CATEGORIAS])
+_PESOS = _PESOS / _PESOS.sum()
+_MEDIAS = np.array([PERFIL_CATEGORIAS[c][1] for c in CATEGORIAS])
+_SAZONAL = np.array([SAZONALIDADE[c] for c in CATEGORIAS])  # categorias x 12
+# todas as descrições num vetor só; cada categoria aponta para a sua fatia
+DESCRICOES = np.array([d for c in CATEGORIAS for d in PERFIL_CATEGORIAS[c][2]], dtype=object)
+_DESC_INI = np.cumsum([0] + [len(PERFIL_CATEGORIAS[c][2]) for c in CATEGORIAS])[:-1]
+_DESC_QTD = np.array([len(PERFIL_CATEGORIAS[c][2]) for c in CATEGORIAS])
+
+# termos de busca realistas: prefixos do vocabulário acima
+TERMOS_BUSCA = ["pizza", "uber", "netfl", "aluguel", "salario", "mercado", "curso", "posto shell", "farm", "ssd"]
+
+
+def nome_usuario(i):
+    return f"user{i:06d}"
+
+
+def meses_ate(fim, n_meses):
+    """Vetor datetime64[M] com os ``n_meses`` que terminam em ``fim`` (inclusivo)."""
+    ultimo = np.datetime64(fim.strftime("%Y-%m"), "M")
+    return ultimo - np.arange(n_meses - 1, -1, -1)
+
+
+def lancamentos(rng, usuarios, meses, transacoes_mes=40, com_receitas=True):
+    """DataFrame (usuario, data, categoria, descricao, valor, tipo) para ``usuarios`` x ``meses``.
+
+    ``meses`` é um vetor datetime64[M]. Despesas por usuário-mês seguem uma
+    Poisson em torno de ``transacoes_mes`` (ajustada pela atividade do
+    usuário); o valor combina a escala do usuário, a média da categoria, a
+    sazonalidade do mês e um ruído log-normal.
+    """
+    usuarios = np.asarray(usuarios, dtype=object)
+    nu, nm = len(usuarios), len(meses)
+    atividade = rng.lognormal(0.0, 0.35, nu)
+    escala = rng.lognormal(0.0, 0.5, (nu, len(CATEGORIAS)))
+
+    qtd = rng.poisson(transacoes_mes * np.repeat(atividade, nm)).astype(np.int64)
+    idx_um = np.repeat(np.arange(nu * nm), qtd)          # (usuário, mês) de cada linha
+    idx_u, idx_m = idx_um // nm, idx_um % nm
+    n = len(idx_um)
+
+    cat = rng.choice(len(CATEGORIAS), size=n, p=_PESOS)
+    mes_do_ano = (meses.astype(int) % 12)[idx_m]
+    valor = (_MEDIAS[cat] * escala[idx_u, cat] * _SAZONAL[cat, mes_do_ano]
+             * rng.lognormal(-0.125, 0.5, n)).round(2)
+    desc = DESCRICOES[_DESC_INI[cat] + rng.integers(0, 1 << 30, n) % _DESC_QTD[cat]]
+    df = pd.DataFrame({
+        "usuario": usuarios[idx_u],
+        "data": _datas_no_mes(rng, meses[idx_m]),
+        "categoria": np.array(CATEGORIAS, dtype=object)[cat],
+        "descricao": desc,
+        "valor": valor,
+        "tipo": "Despesa",
+    })
+    if com_receitas:
+        df = pd.concat([df, _receitas(rng, usuarios, meses, atividade)], ignore_index=True)
+    return df
+
+
+def _datas_no_mes(rng, meses):
+    dias_no_mes = ((meses + 1).astype("datetime64[D]") - meses.astype("datetime64[D]")).astype(int)
+    dias = (rng.random(len(meses)) * dias_no_mes).astype(int)
+    return (meses.astype("datetime64[D]") + dias).astype(str).astype(object)
+
+
+def _receitas(rng, usuarios, meses, atividade):
+    # um salário por mês (com 13º em dezembro) e uma renda extra eventual
+    nu, nm = len(usuarios), len(meses)
+    salario = 2500.0 * rng.lognormal(0.0, 0.45, nu) * np.sqrt(atividade)
+    idx_u = np.repeat(np.arange(nu), nm)
+    idx_m = np.tile(np.arange(nm), nu)
+    dezembro = (meses.astype(int) % 12 == 11)[idx_m]
+    fixas = pd.DataFrame({
+        "usuario": usuarios[idx_u],
+        "data": (meses[idx_m].astype("datetime64[D]") + 4).astype(str).astype(object),
+        "categoria": "Receita", "descricao": np.where(dezembro, "Salario + 13o", "Salario").astype(object),
+        "valor": (salario[idx_u] * np.where(dezembro, 2.0, 1.0)).round(2), "tipo": "Receita"})
+    extra = rng.random(nu * nm) < 0.3
+    eventuais = pd.DataFrame({
+        "usuario": usuarios[idx_u[extra]],
+        "data": _datas_no_mes(rng, meses[idx_m[extra]]),
+        "categoria": "Receita", "descricao": rng.choice(RECEITAS[1:], extra.sum()).astype(object),
+        "valor": (rng.lognormal(6.0, 0.8, extra.sum())).round(2), "tipo": "Receita"})
+    return pd.concat([fixas, eventuais], ignore_index=True)
+
+
+def _metas(rng, usuarios, transacoes_mes):
+    # limite em torno do gasto médio esperado; parte das categorias fica sem meta
+    linhas = []
+    for u in usuarios:
+        for cat in LISTA_CATEGORIAS:
+            if cat in PERFIL_CATEGORIAS and rng.random() < 0.8:
+                media = PERFIL_CATEGORIAS[cat][1] * PERFIL_CATEGORIAS[cat][0] * transacoes_mes
+                linhas.append((cat, u, round(float(media * rng.uniform(0.8, 1.4)), 2)))
+            else:
+                linhas.append((cat, u, 0.0))
+    return linhas
+
+
+def _logs(rng, usuarios, meses, por_usuario, fim):
+    n = len(usuarios) * por_usuario
+    ini = meses[0].astype("datetime64[m]").astype(np.int64)
+    fim = (np.datetime64(fim, "D") + 1).astype("datetime64[m]").astype(np.int64)
+    instantes = np.sort(rng.integers(ini, fim, n)).astype("datetime64[m]")
+    texto = np.datetime_as_string(instantes, unit="m")
+    texto = np.char.replace(texto.astype(str), "T", " ")
+    return list(zip(texto.tolist(), rng.choice(ACOES_AUDITORIA, n, p=[0.85, 0.02, 0.08, 0.05]).tolist(),
+                    np.asarray(usuarios, dtype=object)[rng.integers(0, len(usuarios), n)].tolist()))
+
+
+def gerar_banco(caminho, usuarios=1000, meses=24, transacoes_mes=40, logs_por_usuario=20,
+                semente=SEMENTE_PADRAO, fim=None, sobrescrever=False, progresso=None):
+    """Cria um banco completo (schema atual) com dados sintéticos.
+
+    ~ ``usuarios * meses * transacoes_mes`` despesas, mais receitas, metas,
+    usuários (senha ``bench``) e logs de auditoria. ``progresso`` recebe um
+    dict a cada bloco gravado.
+    """
+    import bcrypt
+
+    if os.path.exists(caminho):
+        if not sobrescrever:
+            raise FileExistsError(caminho)
+        for sufixo in ("", "-wal", "-shm"):
+            if os.path.exists(caminho + sufixo):
+                os.remove(caminho + sufixo)
+
+    inicio = time.perf_counter()
+    rng = np.random.default_rng(semente)
+    fim = fim or date.today()
+    vetor_meses = meses_ate(fim, meses)
+    nomes = [nome_usuario(i) for i in range(usuarios)]
+    # banco descartável: sem journal/fsync durante a carga
+    pool = PoolConexoes(caminho, pragmas={**PRAGMAS_PADRAO, "journal_mode": "OFF", "synchronous": "OFF"})
+    migracoes.migrar(pool, ate=3)
+
+    hash_senha = bcrypt.hashpw(SENHA_BENCH.encode("utf-8"), bcrypt.gensalt(4)).decode("utf-8")
+    criado_em = f"{vetor_meses[0]}-01 00:00"
+    pool.executar_varios("INSERT OR IGNORE INTO usuarios (username, password_hash, criado_em) VALUES (?,?,?)",
+                         [(u, hash_senha, criado_em) for u in nomes])
+    pool.executar_varios("INSERT OR REPLACE INTO metas_usuario (categoria, usuario, valor_limite) VALUES (?,?,?)",
+                         _metas(rng, nomes, transacoes_mes))
+    pool.executar_varios("INSERT INTO logs_auditoria (data_hora, acao, usuario) VALUES (?,?,?)",
+                         _logs(rng, nomes, vetor_meses, logs_por_usuario, fim))
+
+    # usuários por bloco de forma que cada bloco tenha ~TAMANHO_BLOCO linhas
+    por_bloco = max(1, TAMANHO_BLOCO // max(1, meses * (transacoes_mes + 2)))
+    linhas = 0
+    for i in range(0, usuarios, por_bloco):
+        df = lancamentos(rng, nomes[i:i + por_bloco], vetor_meses, transacoes_mes)
+        # o mês corrente fica parcial, como num banco real
+        df = df[df["data"] <= fim.isoformat()].sort_values("data", kind="stable")
+        pool.executar_varios(
+            "INSERT INTO movimentacoes (data, categoria, descricao, valor, tipo, usuario) VALUES (?,?,?,?,?,?)",
+            df[["data", "categoria", "descricao", "valor", "tipo", "usuario"]].itertuples(index=False, name=None))
+        linhas += len(df)
+        if progresso:
+            progresso({"usuarios": min(i + por_bloco, usuarios), "linhas": linhas,
+                       "segundos": time.perf_counter() - inicio})
+
+    carga = time.perf_counter() - inicio
+    migracoes.migrar(pool)  # centavos, índices, FTS e resumo_mensal de uma vez
+    pool.executar("ANALYZE")
+    pool.fechar_todas()
+    return {"caminho": caminho, "usuarios": usuarios, "meses": meses, "linhas": linhas,
+            "segundos_carga": round(carga, 2), "segundos_total": round(time.perf_counter() - inicio, 2),
+            "tamanho_mb": round(os.path.getsize(caminho) / 2 ** 20, 1)}
+
+
+def gerar_csv(caminho, linhas=10_000, semente=SEMENTE_PADRAO, fim=None, fracao_sem_categoria=0.3,
+              fracao_data_br=0.2):
+    """CSV no formato de ``meus_gastos.csv`` com ~``linhas`` linhas.
+
+    Parte das linhas vem sem categoria (força o classificador) e com data
+    dd/mm/aaaa e valor com vírgula, como nos extratos de banco.
+    """
+    rng = np.random.default_rng(semente)
+    fim = fim or date.today()
+    meses = max(1, linhas // 40)
+    df = lancamentos(rng, ["csv"], meses_ate(fim, meses), 40)
+    df = df[df["data"] <= fim.isoformat()].head(linhas)
+    sem_cat = rng.random(len(df)) < fracao_sem_categoria
+    br = rng.random(len(df)) < fracao_data_br
+    datas = pd.to_datetime(df["data"])
+    saida = pd.DataFrame({
+        "Data": np.where(br, datas.dt.strftime("%d/%m/%Y"), df["data"]),
+        "Categoria": df["categoria"].where(~sem_cat | (df["tipo"] == "Receita"), ""),
+        "Descricao": df["descricao"],
+        "Valor": np.where(br, df["valor"].map(lambda v: f"{v:.2f}".replace(".", ",")), df["valor"].astype(str)),
+        "Mes_Ano": "",
+        "Tipo": df["tipo"],
+    })
+    saida.to_csv(caminho, index=False)
+    return {"caminho": caminho, "linhas": len(saida)}
@@ -0,0 +1,133 @@
+"""Medição (latência, vazão, pico de memória) e comparação de resultados.
+
+Cada cenário é medido em duas passadas: as repetições cronometradas rodam
+sem ``tracemalloc`` (que distorce o tempo) e uma execução extra, sob
+``tracemalloc``, registra o pico de memória alocada pelo Python, NumPy e
+pandas. Páginas de cache do próprio SQLite não entram nessa conta.
+"""
+import json
+import platform
+import sqlite3
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+TOLERANCIA_PADRAO = 0.10
+METRICA_PADRAO = "p95_ms"
+
+
+def medir(funcao, repeticoes=30, aquecimento=3, memoria=True):
+    """Executa ``funcao()`` e resume os tempos.
+
+    ``funcao`` pode devolver a quantidade de itens processados (linhas,
+    descrições...) para a vazão em itens/s; ``None`` conta como 1.
+    """
+    for _ in range(aquecimento):
+        funcao()
+    tempos, itens = [], 0
+    for _ in range(repeticoes):
+        t = time.perf_counter()
+        n = funcao()
+        tempos.append(time.perf_counter() - t)
+        itens += 1 if n is None else n
+    pico = None
+    if memoria:
+        tracemalloc.start()
+        try:
+            funcao()
+            pico = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return resumir(tempos, itens, pico)
+
+
+def resumir(tempos, itens, pico_bytes=None):
+    ms = np.asarray(tempos) * 1000
+    total = float(np.sum(tempos))
+    return {
+        "n": len(ms),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "media_ms": round(float(ms.mean()), 3),
+        "min_ms": round(float(ms.min()), 3),
+        "max_ms": round(float(ms.max()), 3),
+        "ops_por_s": round(len(ms) / total, 2) if total else None,
+        "itens_por_s": round(itens / total, 1) if total else None,
+        "pico_memoria_mb": None if pico_bytes is None else round(pico_bytes / 2 ** 20, 2),
+    }
+
+
+def ambiente():
+    return {
+        "quando": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "plataforma": platform.platform(),
+        "processador": platform.processor() or platform.machine(),
+        "argv": sys.argv[1:],
+    }
+
+
+def salvar(resultado, caminho):
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+
+
+def carregar(caminho):
+    with open(caminho, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def comparar(base, novo, metrica=METRICA_PADRAO, tolerancia=TOLERANCIA_PADRAO):
+    """Linhas (cenario, base, novo, variacao, situacao) comparando ``metrica``.
+
+    Latências (``*_ms``, ``pico_memoria_mb``) pioram quando sobem; vazões
+    (``*_por_s``) pioram quando caem. Acima da ``tolerancia`` relativa a linha
+    é marcada como 'regressao' ou 'melhora'.
+    """
+    maior_melhor = metrica.endswith("_por_s")
+    a, b = base.get("cenarios", {}), novo.get("cenarios", {})
+    linhas = []
+    for nome in sorted(set(a) | set(b)):
+        if nome not in b:
+            linhas.append((nome, a[nome].get(metrica), None, None, "removido"))
+            continue
+        if nome not in a:
+            linhas.append((nome, None, b[nome].get(metrica), None, "novo"))
+            continue
+        va, vb = a[nome].get(metrica), b[nome].get(metrica)
+        if not va or vb is None:
+            linhas.append((nome, va, vb, None, "ok"))
+            continue
+        variacao = (vb - va) / va
+        piora = -variacao if maior_melhor else variacao
+        situacao = "regressao" if piora > tolerancia else "melhora" if piora < -tolerancia else "ok"
+        linhas.append((nome, va, vb, variacao, situacao))
+    return linhas
+
+
+def formatar_tabela(resultado):
+    cab = f"{'cenario':<18}{'n':>5}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}{'ops/s':>10}{'itens/s':>13}{'pico MB':>10}"
+    linhas = [cab, "-" * len(cab)]
+    for nome, r in resultado["cenarios"].items():
+        pico = "-" if r["pico_memoria_mb"] is None else f"{r['pico_memoria_mb']:.2f}"
+        linhas.append(f"{nome:<18}{r['n']:>5}{r['p50_ms']:>11.2f}{r['p95_ms']:>11.2f}{r['p99_ms']:>11.2f}"
+                      f"{r['ops_por_s']:>10.1f}{r['itens_por_s']:>13,.0f}{pico:>10}")
+    return "\n".join(linhas)
+
+
+def formatar_comparacao(linhas, metrica=METRICA_PADRAO):
+    saida = [f"{'cenario':<18}{'base':>12}{'novo':>12}{'variacao':>10}  situacao ({metrica})"]
+    for nome, va, vb, variacao, situacao in linhas:
+        fa = "-" if va is None else f"{va:.2f}"
+        fb = "-" if vb is None else f"{vb:.2f}"
+        fv = "-" if variacao is None else f"{variacao:+.1%}"
+        saida.append(f"{nome:<18}{fa:>12}{fb:>12}{fv:>10}  {situacao}")
+    return "\n".join(saida)
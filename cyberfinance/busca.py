@@ -0,0 +1,182 @@
+"""Busca global em movimentações via índice full-text (SQLite FTS5).
+
+``movimentacoes_fts`` é uma tabela FTS5 de conteúdo externo sobre
+``descricao`` e ``categoria``, mantida por triggers. O tokenizer remove
+acentos ('alimentacao' encontra 'Alimentação') e cada termo é buscado como
+prefixo. Resultados vêm paginados por cursor (data, id) e o total/soma sai
+de um agregado, sem materializar todas as linhas. Meses movidos para o
+arquivo frio entram pelos resultados de ``arquivo_frio.buscar``; parcelas e
+contas fixas, que são regras expandidas na leitura e não linhas indexadas,
+entram pelas ocorrências de ``recorrencias`` casadas do mesmo jeito (todo
+termo é prefixo de uma palavra da descrição ou da categoria, sem acento).
+"""
+import re
+import sqlite3
+
+import pandas as pd
+
+from . import arquivo_frio, recorrencias
+from . import movimentacoes as mov
+from .cache import cacheado
+from .shards import pool_de
+
+TAMANHO_PAGINA = 50
+COLUNAS_PAGINA = ["id", "data", "tipo", "categoria", "descricao", "valor", "destaque"]
+_TIPOS = {c: mov.TIPOS[c] for c in ("id", "tipo", "categoria", "valor_centavos")}
+MARCA_INI, MARCA_FIM = "«", "»"
+
+DDL_FTS = ("CREATE VIRTUAL TABLE movimentacoes_fts USING fts5("
+           "descricao, categoria, usuario UNINDEXED, content='movimentacoes', content_rowid='id', "
+           "tokenize='unicode61 remove_diacritics 2', prefix='2 3')")
+TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS mov_fts_ai AFTER INSERT ON movimentacoes BEGIN
+        INSERT INTO movimentacoes_fts (rowid, descricao, categoria, usuario)
+        VALUES (new.id, new.descricao, new.categoria, new.usuario);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS mov_fts_ad AFTER DELETE ON movimentacoes BEGIN
+        INSERT INTO movimentacoes_fts (movimentacoes_fts, rowid, descricao, categoria, usuario)
+        VALUES ('delete', old.id, old.descricao, old.categoria, old.usuario);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS mov_fts_au AFTER UPDATE OF descricao, categoria, usuario ON movimentacoes BEGIN
+        INSERT INTO movimentacoes_fts (movimentacoes_fts, rowid, descricao, categoria, usuario)
+        VALUES ('delete', old.id, old.descricao, old.categoria, old.usuario);
+        INSERT INTO movimentacoes_fts (rowid, descricao, categoria, usuario)
+        VALUES (new.id, new.descricao, new.categoria, new.usuario);
+    END""",
+]
+
+_fts_por_banco = {}  # caminho do banco -> índice FTS existe?
+
+
+def fts_disponivel(pool):
+    """O índice existe neste banco? (consultado uma vez; sem FTS5 a busca cai no LIKE)."""
+    if pool.caminho not in _fts_por_banco:
+        _fts_por_banco[pool.caminho] = bool(pool.consultar(
+            "SELECT 1 FROM sqlite_master WHERE name = 'movimentacoes_fts'"))
+    return _fts_por_banco[pool.caminho]
+
+
+def garantir_schema(conn):
+    """Cria índice FTS + triggers; na primeira vez indexa o histórico existente.
+
+    Com o índice já criado só recria os triggers (a migração 14 reconstrói
+    ``movimentacoes`` mantendo os ids, então o conteúdo indexado continua válido).
+    """
+    _fts_por_banco.clear()
+    existe = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'movimentacoes_fts'").fetchone()
+    if not existe:
+        try:
+            conn.execute(DDL_FTS)
+        except sqlite3.OperationalError:
+            # SQLite compilado sem FTS5: busca cai no LIKE
+            return
+    for ddl in TRIGGERS:
+        conn.execute(ddl)
+    if not existe:
+        reconstruir_indice(conn)
+
+
+def reconstruir_indice(conn):
+    conn.execute("INSERT INTO movimentacoes_fts (movimentacoes_fts) VALUES ('rebuild')")
+
+
+def montar_consulta(termo):
+    """'Alim pizz' -> '{descricao categoria} : ("alim"* "pizz"*)'; None se não sobrar termo."""
+    tokens = re.findall(r"\w+", termo or "")
+    if not tokens:
+        return None
+    return "{descricao categoria} : (" + " ".join(f'"{t}"*' for t in tokens) + ")"
+
+
+def _sem_acento(s):
+    return s.fillna("").str.normalize("NFKD").str.encode("ascii", "ignore").str.decode("ascii").str.lower()
+
+
+@cacheado
+def _recorrencias(usuario, termo):
+    """Ocorrências de parcelas e contas fixas que a busca encontraria, data desc (colunas da busca no arquivo frio)."""
+    tokens = [t for t in _sem_acento(pd.Series(re.findall(r"\w+", termo or ""), dtype=object)) if t]
+    if not tokens or not recorrencias.tem_regras(usuario):
+        return pd.DataFrame(columns=arquivo_frio.COLUNAS_BUSCA + ["destaque"])
+    oc = recorrencias.ocorrencias(usuario)
+    texto = _sem_acento(oc["descricao"]) + " " + _sem_acento(oc["categoria"])
+    ok = pd.Series(True, index=oc.index)
+    for t in tokens:
+        ok &= texto.str.contains(r"(?<!\w)" + re.escape(t), regex=True)
+    df = oc.loc[ok, arquivo_frio.COLUNAS_BUSCA]
+    df["destaque"] = arquivo_frio.destacar(df["descricao"], re.findall(r"\w+", termo))
+    return df.sort_values(["data", "id"], ascending=False, ignore_index=True)
+
+
+@cacheado
+def totais(usuario, termo):
+    """(quantidade, soma) de todos os resultados."""
+    consulta = montar_consulta(termo)
+    if consulta is None:
+        return 0, 0.0
+    pool = pool_de(usuario)
+    if not fts_disponivel(pool):
+        q, p = _like(usuario, termo, "COUNT(*), COALESCE(SUM(m.valor_centavos), 0)")
+        n, centavos = pool.consultar(q, p)[0]
+    else:
+        n, centavos = pool.consultar(
+            "SELECT COUNT(*), COALESCE(SUM(m.valor_centavos), 0) FROM movimentacoes_fts f "
+            "JOIN movimentacoes m ON m.id = f.rowid WHERE movimentacoes_fts MATCH ? AND m.usuario = ?",
+            (consulta, usuario))[0]
+    arq, rec = arquivo_frio.buscar(usuario, termo), _recorrencias(usuario, termo)
+    return (n + len(arq) + len(rec),
+            (centavos + int(arq["valor_centavos"].sum()) + int(rec["valor_centavos"].sum())) / 100)
+
+
+@cacheado
+def buscar(usuario, termo, cursor=None, tamanho=TAMANHO_PAGINA):
+    """Uma página de resultados (data desc, id desc).
+
+    ``cursor`` é o (data, id) da última linha da página anterior. Retorna
+    (DataFrame, próximo_cursor ou None).
+    """
+    consulta = montar_consulta(termo)
+    if consulta is None:
+        return pd.DataFrame(columns=COLUNAS_PAGINA), None
+    filtro_cursor, p_cursor = "", []
+    if cursor is not None:
+        filtro_cursor = " AND (m.data < ? OR (m.data = ? AND m.id < ?))"
+        p_cursor = [cursor[0], cursor[0], cursor[1]]
+    pool = pool_de(usuario)
+    if fts_disponivel(pool):
+        q = ("SELECT m.id, m.data, m.tipo, m.categoria, m.descricao, m.valor_centavos, "
+             f"highlight(movimentacoes_fts, 0, '{MARCA_INI}', '{MARCA_FIM}') AS destaque "
+             "FROM movimentacoes_fts f JOIN movimentacoes m ON m.id = f.rowid "
+             "WHERE movimentacoes_fts MATCH ? AND m.usuario = ?" + filtro_cursor +
+             " ORDER BY m.data DESC, m.id DESC LIMIT ?")
+        p = [consulta, usuario, *p_cursor, tamanho + 1]
+    else:
+        q, p = _like(usuario, termo,
+                     "m.id, m.data, m.tipo, m.categoria, m.descricao, m.valor_centavos, m.descricao AS destaque")
+        q += filtro_cursor + " ORDER BY m.data DESC, m.id DESC LIMIT ?"
+        p = [*p, *p_cursor, tamanho + 1]
+    df = pool.consultar_df(q, p, parse_dates=["data"], dtype=_TIPOS)
+    arq = arquivo_frio.buscar(usuario, termo)
+    # a mesma linha pode aparecer no banco e no arquivo durante um arquivamento; ocorrências
+    # (id negativo, um por regra e mês) nunca repetem um id de movimentação
+    extras = [arq[~arq["id"].isin(df["id"])], _recorrencias(usuario, termo)]
+    if cursor is not None:
+        extras = [e[(e["data"] < cursor[0]) | ((e["data"] == cursor[0]) & (e["id"] < cursor[1]))] for e in extras]
+    extras = [mov.tipar(e.head(tamanho + 1)) for e in extras if not e.empty]
+    if extras:
+        # categorias diferentes viram object no concat; tipar de novo
+        df = mov.tipar(pd.concat([df, *extras])) if len(df) else mov.tipar(pd.concat(extras))
+        df = df.sort_values(["data", "id"], ascending=False, ignore_index=True).head(tamanho + 1)
+    df["valor"] = df["valor_centavos"] / 100
+    proximo = None
+    if len(df) > tamanho:
+        df = df.iloc[:tamanho]
+        ultima = df.iloc[-1]
+        proximo = (ultima["data"].strftime("%Y-%m-%d"), int(ultima["id"]))
+    return df[COLUNAS_PAGINA], proximo
+
+
+def _like(usuario, termo, colunas):
+    padrao = f"%{termo}%"
+    return (f"SELECT {colunas} FROM movimentacoes m WHERE m.usuario = ? "
+            "AND (m.descricao LIKE ? OR m.categoria LIKE ?)", [usuario, padrao, padrao])
@@ -0,0 +1,176 @@
+"""Cache de leituras com invalidação por versão de dados do usuário.
+
+O Streamlit reexecuta o script inteiro a cada clique; as leituras ficam em
+memória com chave (usuário, consulta, versão) e só voltam ao SQLite depois
+que aquele usuário grava algo. A versão tem duas partes:
+
+* ``incrementar_versao(usuario)``, chamado pelas escritas que os triggers
+  abaixo não veem (o log de auditoria, o login no app);
+* ``versoes_dados``, um contador por usuário no banco de dados dele,
+  incrementado por triggers a cada escrita em ``movimentacoes``,
+  ``metas_usuario`` e ``recorrencias``. É o que invalida o cache quando
+  outro processo grava (CLI de importação, outro worker do Streamlit).
+  O log de auditoria (escopo ``ESCOPO_AUDITORIA``) não tem trigger: o
+  escritor em lote soma 1 no catálogo a cada lote (``incrementar_gravada``).
+  As regras de classificação (``ESCOPO_REGRAS``) têm triggers no catálogo
+  (``versionar_escopo``).
+
+Entradas antigas deixam de ser alcançadas e saem pelo LRU. O mês corrente
+também entra na chave: recorrências sem fim ganham uma ocorrência a cada
+virada de mês sem que ninguém grave nada.
+"""
+import threading
+from collections import OrderedDict
+from datetime import date
+from functools import wraps
+
+import pandas as pd
+
+from .db import get_data, get_pool
+
+TAMANHO_MAXIMO = 512
+ESCOPO_AUDITORIA = "__auditoria__"  # logs são lidos por todos; versão própria
+ESCOPO_REGRAS = "__regras__"  # regras de classificação (as globais valem para todos)
+ESCOPOS_CATALOGO = (ESCOPO_AUDITORIA, ESCOPO_REGRAS)
+TABELAS_VERSIONADAS = ("movimentacoes", "metas_usuario", "recorrencias")
+
+
+def _incrementa(usuario_sql):
+    return (f"INSERT INTO versoes_dados (usuario, versao) VALUES ({usuario_sql}, 1) "
+            "ON CONFLICT (usuario) DO UPDATE SET versao = versao + 1;")
+
+
+SQL_INCREMENTA = ("INSERT INTO versoes_dados (usuario, versao) VALUES (?, 1) "
+                  "ON CONFLICT (usuario) DO UPDATE SET versao = versao + 1")
+
+
+def _versionar(conn, tabela, antes, depois):
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS {tabela}_versao_ai AFTER INSERT ON {tabela} "
+                 f"BEGIN {_incrementa(depois)} END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS {tabela}_versao_ad AFTER DELETE ON {tabela} "
+                 f"BEGIN {_incrementa(antes)} END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS {tabela}_versao_au AFTER UPDATE ON {tabela} "
+                 f"BEGIN {_incrementa(antes)} {_incrementa(depois) if depois != antes else ''} END")
+
+
+def garantir_schema(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS versoes_dados (usuario TEXT PRIMARY KEY, versao INTEGER NOT NULL) "
+                 "WITHOUT ROWID")
+    for tabela in TABELAS_VERSIONADAS:
+        # usuário nulo conta como '' (mesma regra do shard_de)
+        _versionar(conn, tabela, "COALESCE(OLD.usuario, '')", "COALESCE(NEW.usuario, '')")
+
+
+def versionar_escopo(conn, tabela, escopo):
+    """Triggers que somam 1 na versão de ``escopo`` a cada escrita numa tabela do catálogo."""
+    literal = "'" + escopo.replace("'", "''") + "'"
+    _versionar(conn, tabela, literal, literal)
+
+
+class CacheLRU:
+    def __init__(self, tamanho_maximo=TAMANHO_MAXIMO):
+        self.tamanho_maximo = tamanho_maximo
+        self._dados = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, chave, padrao=None):
+        with self._lock:
+            if chave in self._dados:
+                self._dados.move_to_end(chave)
+                self.hits += 1
+                return self._dados[chave]
+            self.misses += 1
+            return padrao
+
+    def put(self, chave, valor):
+        with self._lock:
+            self._dados[chave] = valor
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.tamanho_maximo:
+                self._dados.popitem(last=False)
+                self.evictions += 1
+
+    def limpar(self):
+        with self._lock:
+            self._dados.clear()
+
+    def __len__(self):
+        return len(self._dados)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"entradas": len(self._dados), "tamanho_maximo": self.tamanho_maximo, "hits": self.hits,
+                "misses": self.misses, "evictions": self.evictions,
+                "taxa_acerto": self.hits / total if total else 0.0}
+
+
+_cache = CacheLRU()
+_versoes = {}
+_versoes_lock = threading.Lock()
+_AUSENTE = object()
+
+
+def get_cache():
+    return _cache
+
+
+def versao_gravada(usuario):
+    """Contador de escritas do usuário no banco dele (visto por todos os processos)."""
+    from .shards import pool_de
+
+    # auditoria e regras ficam no catálogo, junto das tabelas (mesmo com o banco dividido)
+    pool = get_pool() if usuario in ESCOPOS_CATALOGO else pool_de(usuario)
+    # direto na conexão: uma consulta por leitura em cache não deve poluir as métricas
+    linha = pool.conexao().execute("SELECT versao FROM versoes_dados WHERE usuario = ?",
+                                               (usuario or "",)).fetchone()
+    return linha[0] if linha else 0
+
+
+def versao_dados(usuario):
+    return _versoes.get(usuario, 0), versao_gravada(usuario)
+
+
+def incrementar_versao(usuario):
+    """Chamado por toda escrita do usuário; invalida as leituras dele."""
+    with _versoes_lock:
+        _versoes[usuario] = _versoes.get(usuario, 0) + 1
+        return _versoes[usuario]
+
+
+def incrementar_gravada(pool, escopo):
+    """Soma 1 na versão gravada de um escopo sem trigger; rode na transação da escrita."""
+    pool.executar(SQL_INCREMENTA, (escopo,))
+
+
+def _copia(valor):
+    # DataFrames são mutáveis e o app acrescenta colunas; nunca entrega o objeto do cache
+    if isinstance(valor, (pd.DataFrame, pd.Series, dict, list)):
+        return valor.copy()
+    return valor
+
+
+def cacheado(func):
+    """Decora leituras cujo primeiro argumento é o usuário."""
+    nome = f"{func.__module__}.{func.__qualname__}"
+
+    @wraps(func)
+    def wrapper(usuario, *args, **kwargs):
+        chave = (usuario, nome, args, tuple(sorted(kwargs.items())), versao_dados(usuario),
+                 date.today().replace(day=1))
+        valor = _cache.get(chave, _AUSENTE)
+        if valor is _AUSENTE:
+            valor = func(usuario, *args, **kwargs)
+            _cache.put(chave, valor)
+        return _copia(valor)
+
+    wrapper.sem_cache = func
+    return wrapper
+
+
+@cacheado
+def get_data_cacheado(usuario, q, p=()):
+    """``get_data`` com cache; ``usuario`` é o dono dos dados lidos (ou um escopo)."""
+    return get_data(q, tuple(p))
@@ -0,0 +1,183 @@
+"""Classificação automática de transações por regras.
+
+As regras (palavra-chave ou regex) ficam na tabela ``regras_classificacao``:
+as do usuário ``'*'`` valem para todos e as de cada usuário são somadas a
+elas. Todas são compiladas numa única expressão regular com um grupo nomeado
+por categoria; a regra de menor ``prioridade`` que aparece em qualquer
+posição do texto vence, exatamente como a antiga sequência de ``any(...)``.
+
+O texto é comparado já normalizado (minúsculas, sem acentos); palavras são
+normalizadas do mesmo jeito e regex perdem os acentos e ignoram caixa
+(minúsculas no padrão mudariam ``\\D``, ``\\W`` etc.). O motor compilado
+de cada usuário fica no ``cacheado`` com a versão ``ESCOPO_REGRAS``, que
+triggers no catálogo incrementam: regras editadas por outro processo também
+invalidam.
+"""
+import re
+import unicodedata
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from .cache import ESCOPO_REGRAS, cacheado, versionar_escopo
+from .db import get_pool
+from .shards import pool_de
+
+USUARIO_GLOBAL = "*"
+CATEGORIA_PADRAO = "Outros"
+TAMANHO_MEMO = 65536
+
+REGRAS_PADRAO = [
+    ("Alimentação", ['mc', 'pizza', 'ifood', 'burger', 'comida', 'restaurante']),
+    ("Transporte", ['uber', 'gasolina', 'posto', 'shell', '99', 'metro']),
+    ("Lazer", ['netflix', 'spotify', 'steam', 'cinema', 'game', 'prime']),
+    ("Educação", ['faculdade', 'curso', 'livro', 'udemy', 'alura']),
+    ("Hardware", ['monitor', 'mouse', 'teclado', 'placa', 'ssd', 'ram']),
+    ("Contas Fixas", ['luz', 'agua', 'internet', 'aluguel']),
+]
+
+
+def sem_acento(texto):
+    return unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode("ascii")
+
+
+def normalizar(texto):
+    """Minúsculas e sem acentos ('Água' -> 'agua')."""
+    return sem_acento(str(texto).lower())
+
+
+def expressao(padrao, tipo):
+    """Trecho de regex de uma regra, para casar com o texto já normalizado."""
+    return re.escape(normalizar(padrao)) if tipo == "palavra" else f"(?i:{sem_acento(padrao)})"
+
+
+def normalizar_serie(s):
+    s = pd.Series(s, dtype="object").fillna("").astype(str).str.lower()
+    return s.str.normalize("NFKD").str.encode("ascii", "ignore").str.decode("ascii")
+
+
+def _regras_padrao():
+    # (categoria, padrao, tipo, prioridade)
+    return [(cat, p, "palavra", i * 10) for i, (cat, palavras) in enumerate(REGRAS_PADRAO) for p in palavras]
+
+
+class ClassificadorRegras:
+    def __init__(self, regras, padrao=CATEGORIA_PADRAO):
+        self.padrao = padrao
+        self.categorias = []
+        grupos = []
+        for cat, padrao_regra, tipo, prioridade in sorted(regras, key=lambda r: r[3]):
+            expr = expressao(padrao_regra, tipo)
+            chave = (prioridade, cat)
+            if grupos and grupos[-1][0] == chave:
+                grupos[-1][1].append(expr)
+            else:
+                grupos.append((chave, [expr]))
+        partes = []
+        for i, ((_, cat), exprs) in enumerate(grupos):
+            self.categorias.append(cat)
+            partes.append(f"(?P<g{i}>{'|'.join(exprs)})")
+        # Lookahead: testa todas as posições, inclusive sobrepostas
+        self._re = re.compile(f"(?=(?:{'|'.join(partes)}))") if partes else None
+        self.classificar = lru_cache(maxsize=TAMANHO_MEMO)(self._classificar)
+
+    def _classificar(self, desc_normalizada):
+        if self._re is None:
+            return self.padrao
+        melhor = None
+        for m in self._re.finditer(desc_normalizada):
+            i = int(m.lastgroup[1:])
+            if melhor is None or i < melhor:
+                melhor = i
+                if i == 0:
+                    break
+        return self.padrao if melhor is None else self.categorias[melhor]
+
+    def classify_many(self, descricoes):
+        """Classifica uma Series inteira; cada descrição distinta é avaliada uma vez."""
+        norm = normalizar_serie(descricoes)
+        codigos, unicos = pd.factorize(norm)
+        cats = np.array([self.classificar(u) for u in unicos], dtype=object)
+        return pd.Series(cats[codigos], index=norm.index, dtype="object")
+
+
+# --- Persistência das regras ---
+def garantir_schema(conn):
+    conn.execute('CREATE TABLE IF NOT EXISTS regras_classificacao (id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                 'usuario TEXT NOT NULL, categoria TEXT NOT NULL, padrao TEXT NOT NULL, '
+                 "tipo TEXT NOT NULL DEFAULT 'palavra', prioridade INTEGER NOT NULL DEFAULT 100)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_regras_usuario ON regras_classificacao (usuario, prioridade)")
+    if conn.execute("SELECT COUNT(*) FROM regras_classificacao WHERE usuario = ?", (USUARIO_GLOBAL,)).fetchone()[0] == 0:
+        conn.executemany("INSERT INTO regras_classificacao (usuario, categoria, padrao, tipo, prioridade) VALUES (?,?,?,?,?)",
+                         [(USUARIO_GLOBAL, *r) for r in _regras_padrao()])
+
+
+def garantir_versao(conn):
+    versionar_escopo(conn, "regras_classificacao", ESCOPO_REGRAS)
+
+
+_motor_padrao = ClassificadorRegras(_regras_padrao())
+
+
+def carregar_regras(usuario):
+    return get_pool().consultar(
+        "SELECT categoria, padrao, tipo, prioridade FROM regras_classificacao "
+        "WHERE usuario IN (?, ?) ORDER BY prioridade, id", (usuario, USUARIO_GLOBAL))
+
+
+@cacheado
+def _motor(escopo, usuario):
+    # o escopo das regras é o "usuário" da chave do cache: a versão dele é a das regras
+    return ClassificadorRegras(carregar_regras(usuario))
+
+
+def motor_para(usuario=None):
+    """Classificador compilado do usuário (cacheado até a versão das regras mudar)."""
+    return _motor_padrao if usuario is None else _motor(ESCOPO_REGRAS, usuario)
+
+
+def adicionar_regra(usuario, categoria, padrao, tipo="palavra", prioridade=100):
+    if tipo not in ("palavra", "regex"):
+        raise ValueError(f"Tipo de regra inválido: {tipo}")
+    if tipo == "regex":
+        try:
+            if re.compile(expressao(padrao, tipo)).groupindex:
+                raise ValueError("Regras regex não podem usar grupos nomeados.")
+        except re.error as e:
+            raise ValueError(f"Regex inválida: {e}") from e
+    get_pool().executar("INSERT INTO regras_classificacao (usuario, categoria, padrao, tipo, prioridade) VALUES (?,?,?,?,?)",
+                        (usuario, categoria, padrao, tipo, prioridade))
+
+
+def remover_regra(usuario, regra_id):
+    get_pool().executar("DELETE FROM regras_classificacao WHERE id = ? AND usuario = ?", (regra_id, usuario))
+
+
+# --- API usada pelo app ---
+def classificar_ia(desc, usuario=None):
+    return motor_para(usuario).classificar(normalizar(desc))
+
+
+def classify_many(descricoes, usuario=None):
+    return motor_para(usuario).classify_many(descricoes)
+
+
+def recategorizar(usuario, categorias=(CATEGORIA_PADRAO,)):
+    """Reclassifica em massa as despesas do usuário hoje nas ``categorias`` dadas.
+
+    Retorna quantas linhas mudaram de categoria.
+    """
+    marcadores = ",".join("?" * len(categorias))
+    pool = pool_de(usuario)
+    df = pool.consultar_df(
+        f"SELECT id, descricao, categoria FROM movimentacoes WHERE usuario = ? AND tipo = 'Despesa' "
+        f"AND categoria IN ({marcadores})", (usuario, *categorias))
+    if df.empty:
+        return 0
+    df["nova"] = classify_many(df["descricao"], usuario)
+    mudou = df[df["nova"] != df["categoria"]]
+    if not mudou.empty:
+        pool.executar_varios("UPDATE movimentacoes SET categoria = ? WHERE id = ?",
+                                   list(zip(mudou["nova"], mudou["id"].astype(int))))
+    return len(mudou)
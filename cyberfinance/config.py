@@ -0,0 +1,52 @@
+import os
+
+# --- CONFIGURAÇÃO GLOBAL ---
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+DATA_DIR_OK = True
+try:
+    os.makedirs(DATA_DIR, exist_ok=True)
+except Exception:
+    DATA_DIR_OK = False
+
+DB_FILE = os.path.join(DATA_DIR, "financeiro.db") if DATA_DIR_OK else os.path.join(BASE_DIR, "financeiro.db")
+USUARIO_PADRAO = "admin"
+SENHA_PADRAO_TEXTO = "1234" # Senha para comparação de fallback
+LISTA_CATEGORIAS = ["Alimentação", "Transporte", "Lazer", "Educação", "Hardware", "Contas Fixas", "Outros"]
+
+# Cotações: "awesomeapi" (online) ou "offline" (valores fixos / fixture JSON)
+PROVEDOR_COTACOES = os.environ.get("CYBERFINANCE_COTACOES", "awesomeapi")
+ARQUIVO_COTACOES_OFFLINE = os.environ.get("CYBERFINANCE_COTACOES_ARQUIVO")
+MOEDAS_SUPORTADAS = ["USD", "EUR", "BTC"]
+
+# Instrumentação: consultas acima do limite vão para a tabela consultas_lentas
+LIMITE_CONSULTA_LENTA_MS = float(os.environ.get("CYBERFINANCE_LIMITE_LENTA_MS", "200"))
+# Exportador Prometheus (formato texto); vazio desliga
+ARQUIVO_METRICAS = os.environ.get("CYBERFINANCE_METRICAS_ARQUIVO",
+                                  os.path.join(DATA_DIR if DATA_DIR_OK else BASE_DIR, "metricas.prom"))
+
+# Backups online (API de backup do SQLite); intervalo 0 desliga o agendador
+BACKUP_DIR = os.environ.get("CYBERFINANCE_BACKUP_DIR", os.path.join(BASE_DIR, "backups"))
+BACKUP_INTERVALO_HORAS = float(os.environ.get("CYBERFINANCE_BACKUP_HORAS", "24"))
+BACKUP_MANTER = int(os.environ.get("CYBERFINANCE_BACKUP_MANTER", "14"))
+
+# Arquivo frio: meses fora do horizonte saem do SQLite para Parquet (por usuário/mês)
+PASTA_ARQUIVO_FRIO = os.environ.get("CYBERFINANCE_ARQUIVO_FRIO",
+                                    os.path.join(DATA_DIR if DATA_DIR_OK else BASE_DIR, "arquivo_frio"))
+MESES_QUENTES = int(os.environ.get("CYBERFINANCE_MESES_QUENTES", "24"))
+
+# Shards por usuário: padrão de ``python -m cyberfinance.shards --dividir`` (a lista fica no catálogo)
+NUM_SHARDS = int(os.environ.get("CYBERFINANCE_SHARDS", "8"))
+
+# Lotes headless (``python -m cyberfinance``): PDFs de fim de mês e threads da importação de pastas
+PASTA_RELATORIOS = os.environ.get("CYBERFINANCE_RELATORIOS",
+                                  os.path.join(DATA_DIR if DATA_DIR_OK else BASE_DIR, "relatorios"))
+THREADS_IMPORTACAO = int(os.environ.get("CYBERFINANCE_THREADS_IMPORTACAO", "4"))
+
+# Autenticação: custo do bcrypt, threads que rodam o bcrypt (0 = uma por CPU) e validade do token de sessão
+BCRYPT_CUSTO = int(os.environ.get("CYBERFINANCE_BCRYPT_CUSTO", "12"))
+BCRYPT_THREADS = int(os.environ.get("CYBERFINANCE_BCRYPT_THREADS", "0")) or os.cpu_count() or 1
+SESSAO_HORAS = float(os.environ.get("CYBERFINANCE_SESSAO_HORAS", "12"))
+# chave HMAC dos tokens; sem a variável, é gerada uma vez no arquivo abaixo
+SEGREDO_SESSAO = os.environ.get("CYBERFINANCE_SEGREDO_SESSAO")
+ARQUIVO_SEGREDO_SESSAO = os.path.join(DATA_DIR if DATA_DIR_OK else BASE_DIR, ".segredo_sessao")
@@ -0,0 +1,203 @@
+"""Serviço de cotações (moeda estrangeira -> BRL).
+
+Camadas, da mais barata para a mais cara:
+
+1. cache em memória com TTL;
+2. provedor (``ProvedorAwesomeAPI`` com timeout curto e todas as moedas numa
+   única requisição, ou ``ProvedorFixo`` para uso offline/fixtures);
+3. última cotação conhecida na tabela ``cotacoes`` quando o provedor falha.
+
+Toda cotação obtida é gravada em ``cotacoes`` (uma por moeda e dia), o que
+também serve de histórico para converter DataFrames inteiros pela data
+(``converter_para_brl``; a moeda de cada lançamento fica em
+``movimentacoes.moeda``).
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from .config import ARQUIVO_COTACOES_OFFLINE, MOEDAS_SUPORTADAS, PROVEDOR_COTACOES
+from .db import get_pool
+
+TTL_SEGUNDOS = 300
+TTL_FALHA_SEGUNDOS = 30   # após uma falha, não insiste no provedor a cada clique
+TIMEOUT = (2, 3)          # (conexão, leitura) em segundos
+
+_log = logging.getLogger(__name__)
+
+
+class ErroCotacao(Exception):
+    pass
+
+
+class ProvedorAwesomeAPI:
+    URL = "https://economia.awesomeapi.com.br/last/{pares}"
+
+    def __init__(self, timeout=TIMEOUT):
+        self.timeout = timeout
+
+    def buscar(self, moedas):
+        import requests  # carregado só quando a cotação é pedida
+
+        pares = ",".join(f"{m}-BRL" for m in moedas)
+        try:
+            res = requests.get(self.URL.format(pares=pares), timeout=self.timeout)
+            res.raise_for_status()
+            dados = res.json()
+            return {m: float(dados[f"{m}BRL"]["bid"]) for m in moedas if f"{m}BRL" in dados}
+        except (requests.RequestException, ValueError, KeyError) as e:
+            raise ErroCotacao(str(e)) from e
+
+
+class ProvedorFixo:
+    """Provedor offline: taxas fixas em memória ou lidas de um JSON {"USD": 5.1, ...}."""
+
+    TAXAS_PADRAO = {"USD": 5.0, "EUR": 5.5, "BTC": 300000.0}
+
+    def __init__(self, taxas=None):
+        self.taxas = dict(self.TAXAS_PADRAO if taxas is None else taxas)
+
+    @classmethod
+    def de_arquivo(cls, caminho):
+        with open(caminho, encoding="utf-8") as f:
+            return cls({k.upper(): float(v) for k, v in json.load(f).items()})
+
+    def buscar(self, moedas):
+        return {m: self.taxas[m] for m in moedas if m in self.taxas}
+
+
+def garantir_schema(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS cotacoes (moeda TEXT NOT NULL, data TEXT NOT NULL, "
+                 "valor REAL NOT NULL, obtido_em TEXT NOT NULL, PRIMARY KEY (moeda, data))")
+
+
+class ServicoCotacoes:
+    def __init__(self, provedor, ttl=TTL_SEGUNDOS):
+        self.provedor = provedor
+        self.ttl = ttl
+        self._memoria = {}   # moeda -> (valor, instante monotônico, obtido_em)
+        self._falha_ate = 0.0
+        self._lock = threading.Lock()
+
+    def cotacoes(self, moedas=None):
+        """{moeda: {"valor", "origem", "obtido_em"}}; origem é 'cache', 'provedor' ou 'historico'."""
+        moedas = [m.upper() for m in (moedas or MOEDAS_SUPORTADAS)]
+        agora = time.monotonic()
+        resultado, faltando = {}, []
+        with self._lock:
+            for m in moedas:
+                item = self._memoria.get(m)
+                if item and agora - item[1] < self.ttl:
+                    resultado[m] = {"valor": item[0], "origem": "cache", "obtido_em": item[2]}
+                else:
+                    faltando.append(m)
+        if not faltando:
+            return resultado
+
+        novas = {}
+        if agora >= self._falha_ate:
+            try:
+                # uma única requisição renova todas as moedas suportadas de uma vez
+                novas = self.provedor.buscar(sorted(set(faltando) | set(MOEDAS_SUPORTADAS)))
+            except ErroCotacao:
+                self._falha_ate = agora + TTL_FALHA_SEGUNDOS
+        if novas:
+            self._registrar(novas)
+        for m in faltando:
+            if m in novas:
+                resultado[m] = {"valor": novas[m], "origem": "provedor", "obtido_em": self._memoria[m][2]}
+            else:
+                ultima = ultima_conhecida(m)
+                if ultima is not None:
+                    resultado[m] = {"valor": ultima[0], "origem": "historico", "obtido_em": ultima[1]}
+        return resultado
+
+    def cotacao(self, moeda):
+        """Cotação de uma moeda ou ``ErroCotacao`` se não houver nem histórico."""
+        res = self.cotacoes([moeda]).get(moeda.upper())
+        if res is None:
+            raise ErroCotacao(f"Sem cotação disponível para {moeda}.")
+        return res
+
+    def _registrar(self, taxas):
+        obtido_em = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        agora = time.monotonic()
+        with self._lock:
+            for m, v in taxas.items():
+                self._memoria[m] = (v, agora, obtido_em)
+        hoje = date.today().isoformat()
+        try:
+            get_pool().executar_varios(
+                "INSERT OR REPLACE INTO cotacoes (moeda, data, valor, obtido_em) VALUES (?,?,?,?)",
+                [(m, hoje, v, obtido_em) for m, v in taxas.items()])
+        except sqlite3.Error as e:
+            # banco ocupado: a cotação obtida vale assim mesmo (fica na memória); só o histórico perde o dia
+            _log.warning("Cotações %s não gravadas: %s", ", ".join(sorted(taxas)), e)
+
+
+def ultima_conhecida(moeda):
+    rows = get_pool().consultar("SELECT valor, obtido_em FROM cotacoes WHERE moeda = ? ORDER BY data DESC LIMIT 1",
+                                (moeda,))
+    return rows[0] if rows else None
+
+
+def historico(moedas):
+    """Cotações gravadas de ``moedas`` (moeda, data, taxa), em ordem de data."""
+    marcadores = ",".join("?" * len(moedas))
+    df = get_pool().consultar_df(
+        f"SELECT moeda, data, valor AS taxa FROM cotacoes WHERE moeda IN ({marcadores}) ORDER BY data", list(moedas),
+        dtype={"taxa": "float64"})
+    df["data"] = pd.to_datetime(df["data"])
+    return df
+
+
+def converter_para_brl(df, col_valor="valor", col_moeda="moeda", col_data="data"):
+    """Converte ``col_valor`` para BRL numa passada vetorizada.
+
+    Cada linha usa a cotação da sua moeda no dia ou, sem ela, a última
+    anterior (``merge_asof`` por moeda); linhas sem data usam a última
+    conhecida e as anteriores à primeira cotação gravada, a primeira. Linhas
+    em BRL (ou sem coluna de moeda) ficam com taxa 1; moedas sem nenhuma
+    cotação, com NaN. Acrescenta as colunas ``taxa_brl`` e ``valor_brl``.
+    """
+    out = df.copy()
+    out["taxa_brl"] = 1.0
+    if col_moeda in out.columns and len(out):
+        moedas = out[col_moeda].fillna("BRL").astype(str).str.upper().to_numpy()
+        estrangeira = moedas != "BRL"
+        if estrangeira.any():
+            hist = historico(sorted(set(moedas[estrangeira])))
+            datas = pd.to_datetime(out[col_data]).to_numpy(dtype="datetime64[ns]")[estrangeira]
+            alvo = pd.DataFrame({"_pos": np.flatnonzero(estrangeira), "moeda": moedas[estrangeira],
+                                 "data": np.where(np.isnat(datas), pd.Timestamp.max.to_datetime64(), datas)})
+            taxas = pd.merge_asof(alvo.sort_values("data"), hist, on="data", by="moeda", direction="backward")
+            primeira = hist.groupby("moeda")["taxa"].first()
+            taxas["taxa"] = taxas["taxa"].fillna(taxas["moeda"].map(primeira))
+            out.iloc[taxas["_pos"].to_numpy(), out.columns.get_loc("taxa_brl")] = taxas["taxa"].to_numpy()
+    out["valor_brl"] = out[col_valor] * out["taxa_brl"]
+    return out
+
+
+_servico = None
+_servico_lock = threading.Lock()
+
+
+def criar_provedor(nome=PROVEDOR_COTACOES):
+    if nome == "offline":
+        return ProvedorFixo.de_arquivo(ARQUIVO_COTACOES_OFFLINE) if ARQUIVO_COTACOES_OFFLINE else ProvedorFixo()
+    return ProvedorAwesomeAPI()
+
+
+def get_servico():
+    global _servico
+    if _servico is None:
+        with _servico_lock:
+            if _servico is None:
+                _servico = ServicoCotacoes(criar_provedor())
+    return _servico
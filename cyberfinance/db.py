@@ -0,0 +1,178 @@
+"""Camada de conexão SQLite compartilhada.
+
+Cada thread (o Streamlit roda um script runner por sessão) recebe uma
+conexão própria e reutilizada, aberta em modo WAL para que leitores não
+bloqueiem o escritor. O cache de statements do módulo ``sqlite3`` faz o
+papel de prepared statements: a mesma string SQL é compilada uma única vez
+por conexão.
+"""
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+from .config import DB_FILE
+
+PRAGMAS_PADRAO = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",     # seguro em WAL, evita fsync a cada commit
+    "cache_size": -64000,        # ~64 MB de page cache por conexão
+    "mmap_size": 268435456,      # 256 MB mapeados em memória
+    "busy_timeout": 5000,        # espera até 5s pelo lock em vez de falhar
+    "temp_store": "MEMORY",
+}
+STATEMENTS_EM_CACHE = 256
+
+# Funções f(consulta, segundos, linhas) chamadas após cada helper do pool
+# (executar, executar_varios, consultar, consultar_df); ver ``metricas``.
+observadores = []
+
+
+def _notificar(q, inicio, linhas):
+    segundos = time.perf_counter() - inicio
+    for observador in observadores:
+        observador(q, segundos, linhas)
+
+
+class PoolConexoes:
+    """Pool de conexões SQLite, uma por thread, com transações explícitas."""
+
+    def __init__(self, caminho, pragmas=None, cached_statements=STATEMENTS_EM_CACHE):
+        self.caminho = caminho
+        self.pragmas = dict(PRAGMAS_PADRAO if pragmas is None else pragmas)
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._conexoes = {}  # ident da thread -> (thread, conexão)
+
+    def _abrir(self):
+        # isolation_level=None: autocommit; transações só via transacao()
+        conn = sqlite3.connect(self.caminho, timeout=self.pragmas.get("busy_timeout", 5000) / 1000,
+                               isolation_level=None, check_same_thread=False,
+                               cached_statements=self.cached_statements)
+        for nome, valor in self.pragmas.items():
+            conn.execute(f"PRAGMA {nome}={valor}")
+        return conn
+
+    def _recolher_orfas(self):
+        # Fecha conexões de threads que já terminaram (reruns antigos do Streamlit)
+        for ident, (thread, conn) in list(self._conexoes.items()):
+            if not thread.is_alive():
+                conn.close()
+                del self._conexoes[ident]
+
+    def conexao(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._abrir()
+            self._local.conn = conn
+            self._local.profundidade = 0
+            with self._lock:
+                self._recolher_orfas()
+                self._conexoes[threading.get_ident()] = (threading.current_thread(), conn)
+        return conn
+
+    @contextmanager
+    def transacao(self, imediata=True):
+        """Abre uma transação (BEGIN IMMEDIATE por padrão) e faz commit/rollback.
+
+        Transações aninhadas na mesma thread reaproveitam a transação externa.
+        """
+        conn = self.conexao()
+        if self._local.profundidade > 0:
+            self._local.profundidade += 1
+            try:
+                yield conn
+            finally:
+                self._local.profundidade -= 1
+            return
+        conn.execute("BEGIN IMMEDIATE" if imediata else "BEGIN")
+        self._local.profundidade = 1
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            conn.commit()
+        finally:
+            self._local.profundidade = 0
+
+    def executar(self, q, p=()):
+        inicio = time.perf_counter()
+        with self.transacao() as conn:
+            cur = conn.execute(q, p)
+        if observadores:
+            _notificar(q, inicio, cur.rowcount)
+        return cur
+
+    def executar_varios(self, q, linhas):
+        inicio = time.perf_counter()
+        with self.transacao() as conn:
+            cur = conn.executemany(q, linhas)
+        if observadores:
+            _notificar(q, inicio, cur.rowcount)
+        return cur
+
+    def consultar(self, q, p=()):
+        inicio = time.perf_counter()
+        rows = self.conexao().execute(q, p).fetchall()
+        if observadores:
+            _notificar(q, inicio, len(rows))
+        return rows
+
+    def consultar_df(self, q, p=(), parse_dates=None, dtype=None):
+        """DataFrame da consulta; ``parse_dates``/``dtype`` tipam as colunas já na leitura."""
+        inicio = time.perf_counter()
+        df = pd.read_sql(q, self.conexao(), params=p, parse_dates=parse_dates, dtype=dtype)
+        if observadores:
+            _notificar(q, inicio, len(df))
+        return df
+
+    def fechar_todas(self):
+        with self._lock:
+            for _, conn in self._conexoes.values():
+                conn.close()
+            self._conexoes.clear()
+        self._local = threading.local()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PoolConexoes(DB_FILE)
+    return _pool
+
+
+def configurar(caminho, **kwargs):
+    """Troca o banco usado pelo pool padrão (scripts, benchmarks, restore)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.fechar_todas()
+        _pool = PoolConexoes(caminho, **kwargs)
+    return _pool
+
+
+def transacao(imediata=True):
+    return get_pool().transacao(imediata)
+
+
+def run_query(q, p=()):
+    get_pool().executar(q, p)
+
+
+def run_many(q, linhas):
+    get_pool().executar_varios(q, linhas)
+
+
+def get_data(q, p=()):
+    return get_pool().consultar_df(q, p)
@@ -0,0 +1,162 @@
+"""Importação de CSV em lotes, vetorizada e transacional.
+
+O arquivo é lido em blocos (``chunksize``); cada bloco é normalizado com
+operações de coluna do pandas e gravado com um único ``executemany`` dentro
+de uma transação, liberando o lock de escrita entre um bloco e outro.
+Linhas já importadas são descartadas pelo hash de conteúdo
+(``hash_importacao``), então reprocessar o mesmo extrato não duplica nada.
+"""
+import hashlib
+import os
+import time
+import unicodedata
+from datetime import date
+
+import pandas as pd
+
+from . import arquivo_frio
+from .classificador import classify_many
+from .shards import pool_de
+
+TAMANHO_LOTE = 5000
+DESCRICAO_PADRAO = "Importado CSV"
+TIPOS_VALIDOS = {"receita": "Receita", "despesa": "Despesa"}
+
+SQL_INSERT = ("INSERT OR IGNORE INTO movimentacoes "
+              "(data, categoria, descricao, valor_centavos, tipo, usuario, hash_importacao) VALUES (?,?,?,?,?,?,?)")
+
+
+def garantir_schema(conn):
+    cols = [r[1] for r in conn.execute("PRAGMA table_info(movimentacoes)").fetchall()]
+    if "hash_importacao" not in cols:
+        conn.execute("ALTER TABLE movimentacoes ADD COLUMN hash_importacao TEXT")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_mov_hash_importacao "
+                 "ON movimentacoes (usuario, hash_importacao) WHERE hash_importacao IS NOT NULL")
+
+
+def _chave_coluna(nome):
+    # 'Descrição ' -> 'descricao'
+    nome = unicodedata.normalize("NFKD", str(nome)).encode("ascii", "ignore").decode()
+    return nome.strip().lower()
+
+
+def _coluna(df, nome, padrao):
+    return df[nome] if nome in df.columns else pd.Series(padrao, index=df.index, dtype="object")
+
+
+def _normalizar_valor(s):
+    """Aceita 109.9, '109,90', '1.234,56' e 'R$ 59,90'; o sinal é mantido ('-50,00' é estorno)."""
+    if pd.api.types.is_numeric_dtype(s):
+        return pd.to_numeric(s, errors="coerce").fillna(0.0)
+    s = s.astype(str).str.replace(r"[R$\s]", "", regex=True)
+    decimal_br = s.str.contains(",", regex=False)
+    s = s.where(~decimal_br, s.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+    return pd.to_numeric(s, errors="coerce").fillna(0.0)
+
+
+def _normalizar_data(s, hoje):
+    s = s.astype("string").str.strip()
+    d = pd.to_datetime(s, format="ISO8601", errors="coerce")
+    faltando = d.isna() & s.notna()
+    if faltando.any():
+        d[faltando] = pd.to_datetime(s[faltando], format="%d/%m/%Y", errors="coerce")
+    return d.dt.strftime("%Y-%m-%d").fillna(hoje)
+
+
+def normalizar_lote(df, usuario, hoje=None, vistos=None):
+    """Converte um bloco cru do CSV nas colunas de ``movimentacoes`` + hash.
+
+    ``vistos`` acumula as ocorrências de cada conteúdo entre blocos, para que
+    linhas idênticas legítimas do mesmo arquivo recebam hashes distintos.
+    """
+    hoje = hoje or date.today().isoformat()
+    df = df.rename(columns=_chave_coluna)
+
+    out = pd.DataFrame(index=df.index)
+    out["data"] = _normalizar_data(_coluna(df, "data", None), hoje)
+    out["descricao"] = _coluna(df, "descricao", DESCRICAO_PADRAO).fillna(DESCRICAO_PADRAO).astype(str).str.strip()
+    out["valor"] = _normalizar_valor(_coluna(df, "valor", 0.0)).round(2)
+    out["valor_centavos"] = (out["valor"] * 100).round().astype("int64")
+    tipo = _coluna(df, "tipo", "Despesa").astype(str).str.strip().str.lower()
+    out["tipo"] = tipo.map(TIPOS_VALIDOS).fillna("Despesa")
+
+    # Categoria vazia: receitas viram 'Receita', despesas passam pelo classificador em lote
+    cat = _coluna(df, "categoria", None).astype("string").str.strip().replace("", pd.NA)
+    receita_sem_cat = cat.isna() & (out["tipo"] == "Receita")
+    cat[receita_sem_cat] = "Receita"
+    sem_cat = cat.isna()
+    if sem_cat.any():
+        cat[sem_cat] = classify_many(out.loc[sem_cat, "descricao"], usuario).to_numpy()
+    out["categoria"] = cat.astype(object)
+
+    out["usuario"] = usuario
+    # Hash de conteúdo + número da ocorrência
+    base = (out["usuario"] + "|" + out["data"] + "|" + out["tipo"] + "|" + out["categoria"] + "|"
+            + out["descricao"] + "|" + out["valor"].map("{:.2f}".format))
+    ocorrencia = base.groupby(base).cumcount()
+    if vistos is not None:
+        if vistos:
+            ocorrencia += base.map(vistos).fillna(0).astype(int)
+        for k, n in base.value_counts().items():
+            vistos[k] = vistos.get(k, 0) + n
+    out["hash_importacao"] = [hashlib.sha1(k.encode("utf-8")).hexdigest()
+                              for k in base + "#" + ocorrencia.astype(str)]
+    return out
+
+
+def importar_csv(arquivo, usuario, tamanho_lote=TAMANHO_LOTE, progresso=None, **read_csv_kwargs):
+    """Importa ``arquivo`` (caminho ou file-like) em blocos.
+
+    ``progresso`` recebe um dict com o andamento após cada bloco
+    (``lidas``, ``inseridas``, ``duplicadas``, ``segundos``, ``linhas_por_s``, ``fracao``).
+    """
+    pool = pool_de(usuario)
+    inicio = time.perf_counter()
+    total_bytes = _tamanho(arquivo)
+    stats = {"lidas": 0, "inseridas": 0, "duplicadas": 0}
+    vistos = {}
+
+    for bloco in pd.read_csv(arquivo, chunksize=tamanho_lote, dtype=str, keep_default_na=True, **read_csv_kwargs):
+        norm = normalizar_lote(bloco, usuario, vistos=vistos)
+        lidas = len(norm)
+        arquivadas = arquivo_frio.hashes_arquivados(usuario, norm)
+        if arquivadas:
+            # meses já no arquivo frio: o índice único do SQLite não vê esses hashes
+            norm = norm[~norm["hash_importacao"].isin(arquivadas)]
+        linhas = list(norm[["data", "categoria", "descricao", "valor_centavos", "tipo", "usuario", "hash_importacao"]]
+                      .itertuples(index=False, name=None))
+        with pool.transacao() as conn:
+            # rowcount ignora as linhas descartadas pelo OR IGNORE
+            inseridas = max(conn.executemany(SQL_INSERT, linhas).rowcount, 0)
+
+        stats["lidas"] += lidas
+        stats["inseridas"] += inseridas
+        stats["duplicadas"] += lidas - inseridas
+        if progresso:
+            progresso(_andamento(stats, inicio, arquivo, total_bytes))
+
+    return _andamento(stats, inicio, arquivo, total_bytes, fim=True)
+
+
+def _tamanho(arquivo):
+    try:
+        if hasattr(arquivo, "getbuffer"):
+            return arquivo.getbuffer().nbytes
+        if hasattr(arquivo, "seek"):
+            pos = arquivo.tell(); arquivo.seek(0, 2); n = arquivo.tell(); arquivo.seek(pos)
+            return n
+        return os.path.getsize(arquivo)
+    except Exception:
+        return None
+
+
+def _andamento(stats, inicio, arquivo, total_bytes, fim=False):
+    segundos = time.perf_counter() - inicio
+    fracao = 1.0 if fim else None
+    if not fim and total_bytes and hasattr(arquivo, "tell"):
+        try:
+            fracao = min(arquivo.tell() / total_bytes, 1.0)
+        except Exception:
+            pass
+    return dict(stats, segundos=segundos, fracao=fracao,
+                linhas_por_s=stats["lidas"] / segundos if segundos > 0 else 0.0)
@@ -0,0 +1,87 @@
+"""Motor de metas (orçamento mensal por categoria).
+
+O gasto de todas as categorias, em qualquer intervalo de meses, sai de uma
+única consulta ao resumo mensal (uma linha por usuário, categoria e mês); os
+limites entram por um join vetorizado no pandas. Sem filtro de usuário, a
+mesma rotina avalia todos os usuários de uma vez (lotes noturnos de alerta
+de estouro), com a consulta espalhada em paralelo pelos shards.
+"""
+import pandas as pd
+
+from . import recorrencias, shards
+from .cache import cacheado
+from .config import LISTA_CATEGORIAS
+from .shards import pool_de
+
+
+def meses_entre(mes_ini, mes_fim=None):
+    """['2026-01', ..., mes_fim] (inclusivo)."""
+    mes_fim = mes_fim or mes_ini
+    return [p.strftime("%Y-%m") for p in pd.period_range(mes_ini, mes_fim, freq="M")]
+
+
+def _gastos(mes_ini, mes_fim, usuario=None):
+    # Lido do resumo_mensal: uma linha por (usuário, mês, categoria), somado às recorrências
+    q = ("SELECT usuario, categoria, mes, total_centavos FROM resumo_mensal "
+         "WHERE tipo = 'Despesa' AND mes >= ? AND mes <= ?")
+    if usuario is None:
+        df = shards.consultar_df(q, (mes_ini, mes_fim))
+    else:
+        df = pool_de(usuario).consultar_df(q + " AND usuario = ?", (mes_ini, mes_fim, usuario))
+    if usuario is None or recorrencias.tem_regras(usuario):
+        rec = recorrencias.agregados(usuario, mes_ini, mes_fim)
+        rec = rec.loc[rec["tipo"] == "Despesa", ["usuario", "categoria", "mes", "total_centavos"]]
+        if len(rec):
+            df = pd.concat([df, rec]) if len(df) else rec
+            df = df.groupby(["usuario", "categoria", "mes"], as_index=False).sum()
+    df["gasto"] = df.pop("total_centavos") / 100
+    return df
+
+
+def _limites(usuario=None):
+    q = "SELECT usuario, categoria, valor_limite AS limite FROM metas_usuario"
+    if usuario is None:
+        return shards.consultar_df(q)
+    return pool_de(usuario).consultar_df(q + " WHERE usuario = ?", (usuario,))
+
+
+def avaliar(mes_ini, mes_fim=None, usuario=None):
+    """Gasto x limite por (usuário, mês, categoria); ``usuario=None`` avalia todos."""
+    meses = meses_entre(mes_ini, mes_fim)
+    gastos = _gastos(meses[0], meses[-1], usuario)
+    grade = _limites(usuario).merge(pd.DataFrame({"mes": meses}), how="cross")
+    # outer: gasto em categoria sem meta cadastrada aparece com limite 0
+    df = grade.merge(gastos, on=["usuario", "categoria", "mes"], how="outer")
+    df["limite"] = df["limite"].fillna(0.0)
+    df["gasto"] = df["gasto"].fillna(0.0)
+    df["percentual"] = (df["gasto"] / df["limite"].where(df["limite"] > 0)).fillna(0.0)
+    df["estourou"] = (df["limite"] > 0) & (df["gasto"] > df["limite"])
+    return df[["usuario", "mes", "categoria", "limite", "gasto", "percentual", "estourou"]] \
+        .sort_values(["usuario", "mes", "categoria"], ignore_index=True)
+
+
+@cacheado
+def progresso_metas(usuario, mes_ini, mes_fim=None):
+    return avaliar(mes_ini, mes_fim, usuario)
+
+
+def estouros(mes_ini, mes_fim=None, usuario=None):
+    """Só as linhas estouradas; base dos alertas em lote."""
+    df = avaliar(mes_ini, mes_fim, usuario)
+    return df[df["estourou"]].reset_index(drop=True)
+
+
+@cacheado
+def carregar_metas(usuario):
+    """{categoria: limite} com todas as categorias padrão (0.0 quando não cadastrada)."""
+    limites = dict.fromkeys(LISTA_CATEGORIAS, 0.0)
+    for cat, val in pool_de(usuario).consultar("SELECT categoria, valor_limite FROM metas_usuario WHERE usuario = ?", (usuario,)):
+        limites[cat] = float(val or 0.0)
+    return limites
+
+
+def salvar_metas(usuario, metas):
+    """Grava todos os limites numa única transação."""
+    pool_de(usuario).executar_varios(
+        "INSERT OR REPLACE INTO metas_usuario (categoria, usuario, valor_limite) VALUES (?, ?, ?)",
+        [(cat, usuario, float(val)) for cat, val in metas.items()])
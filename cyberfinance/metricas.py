@@ -0,0 +1,225 @@
+"""Instrumentação: tempo das consultas e das seções do app.
+
+Cada helper do pool (``run_query``, ``get_data``...) e cada seção marcada
+com ``secao()`` gera um registro (tipo, nome, segundos, linhas) num buffer
+circular em memória; o painel de admin e o exportador Prometheus leem daí.
+As consultas são agrupadas pela impressão digital do SQL (literais viram
+``?``), então a mesma consulta com parâmetros diferentes soma no mesmo item.
+
+Consultas acima de ``LIMITE_CONSULTA_LENTA_MS`` vão para a tabela
+``consultas_lentas``, gravada por uma thread própria para não pesar (nem
+abrir transação) na thread que fez a consulta.
+"""
+import hashlib
+import os
+import queue
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+from . import db
+from .cache import get_cache
+from .config import ARQUIVO_METRICAS, LIMITE_CONSULTA_LENTA_MS
+
+TAMANHO_BUFFER = 5000
+INTERVALO_EXPORTACAO = 15  # segundos
+
+_registros = deque(maxlen=TAMANHO_BUFFER)   # (instante, tipo, nome, segundos, linhas)
+_acumulados = {}                            # (tipo, nome) -> [quantidade, segundos, linhas] desde o início
+_textos = {}                                # impressão digital -> SQL normalizado
+_textos_por_sql = {}                        # SQL cru -> impressão digital (normaliza uma vez só)
+_lock = threading.Lock()
+_local = threading.local()
+_lentas = queue.Queue()
+_instalado = False
+_instalar_lock = threading.Lock()
+
+_RE_TEXTO = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMERO = re.compile(r"\b\d+(?:\.\d+)?\b")
+_RE_LISTA = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_RE_ESPACO = re.compile(r"\s+")
+
+
+def normalizar_sql(q):
+    """'SELECT * FROM t WHERE id IN (1, 2) AND x = 'a'' -> 'SELECT * FROM t WHERE id IN (?+) AND x = ?'."""
+    q = _RE_TEXTO.sub("?", q)
+    q = _RE_NUMERO.sub("?", q)
+    q = _RE_LISTA.sub("(?+)", q)
+    return _RE_ESPACO.sub(" ", q).strip()
+
+
+def impressao_digital(q):
+    """(id curto, SQL normalizado); o id é estável entre processos."""
+    texto = normalizar_sql(q)
+    return hashlib.sha1(texto.encode("utf-8")).hexdigest()[:12], texto
+
+
+def registrar(tipo, nome, segundos, linhas=None):
+    with _lock:
+        _registros.append((time.time(), tipo, nome, segundos, linhas))
+        acc = _acumulados.setdefault((tipo, nome), [0, 0.0, 0])
+        acc[0] += 1
+        acc[1] += segundos
+        acc[2] += linhas or 0
+
+
+def _observar_consulta(q, segundos, linhas):
+    if getattr(_local, "interno", False):
+        return
+    digital = _textos_por_sql.get(q)
+    if digital is None:
+        if len(_textos_por_sql) > TAMANHO_BUFFER:
+            _textos_por_sql.clear()  # SQL montado com literais não pode crescer sem limite
+        digital, texto = impressao_digital(q)
+        _textos_por_sql[q] = digital
+        _textos[digital] = texto
+    registrar("sql", digital, segundos, linhas)
+    if segundos * 1000 >= LIMITE_CONSULTA_LENTA_MS:
+        _lentas.put((datetime.now().strftime("%Y-%m-%d %H:%M:%S"), digital, _textos[digital],
+                     round(segundos * 1000, 2), linhas, threading.current_thread().name))
+
+
+@contextmanager
+def secao(nome):
+    """Cronometra um trecho do app (uma aba, um gráfico...)."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar("secao", nome, time.perf_counter() - inicio)
+
+
+def garantir_schema(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS consultas_lentas (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                 "quando TEXT NOT NULL, impressao TEXT NOT NULL, consulta TEXT NOT NULL, ms REAL NOT NULL, "
+                 "linhas INTEGER, thread TEXT)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_consultas_lentas_impressao ON consultas_lentas (impressao, ms)")
+
+
+def _gravar_lentas():
+    _local.interno = True  # as gravações desta thread não se medem
+    while True:
+        lote = [_lentas.get()]
+        while True:
+            try:
+                lote.append(_lentas.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            db.get_pool().executar_varios(
+                "INSERT INTO consultas_lentas (quando, impressao, consulta, ms, linhas, thread) VALUES (?,?,?,?,?,?)",
+                lote)
+        except Exception:
+            pass  # log de lentas é best-effort; nunca derruba o app
+
+
+def _exportar_periodicamente(caminho, intervalo):
+    while True:
+        time.sleep(intervalo)
+        try:
+            exportar_prometheus(caminho)
+        except OSError:
+            pass
+
+
+def instalar(arquivo_prometheus=ARQUIVO_METRICAS, intervalo=INTERVALO_EXPORTACAO):
+    """Liga a coleta no pool e as threads do log de lentas e do exportador (uma vez por processo)."""
+    global _instalado
+    if _instalado:
+        return
+    with _instalar_lock:
+        if _instalado:
+            return
+        db.observadores.append(_observar_consulta)
+        threading.Thread(target=_gravar_lentas, name="metricas-lentas", daemon=True).start()
+        if arquivo_prometheus:
+            threading.Thread(target=_exportar_periodicamente, args=(arquivo_prometheus, intervalo),
+                             name="metricas-exportador", daemon=True).start()
+        _instalado = True
+
+
+def resumo(tipo=None):
+    """p50/p95 por consulta ou seção sobre a janela do buffer, mais pesadas primeiro."""
+    with _lock:
+        df = pd.DataFrame(list(_registros), columns=["instante", "tipo", "nome", "segundos", "linhas"])
+    if tipo is not None:
+        df = df[df["tipo"] == tipo]
+    if df.empty:
+        return pd.DataFrame(columns=["tipo", "nome", "n", "p50_ms", "p95_ms", "max_ms", "total_ms",
+                                     "linhas_media", "consulta"])
+    df["ms"] = df["segundos"] * 1000
+    g = df.groupby(["tipo", "nome"])
+    out = pd.DataFrame({
+        "n": g.size(),
+        "p50_ms": g["ms"].quantile(0.5),
+        "p95_ms": g["ms"].quantile(0.95),
+        "max_ms": g["ms"].max(),
+        "total_ms": g["ms"].sum(),
+        "linhas_media": g["linhas"].mean(),
+    }).reset_index()
+    out["consulta"] = out["nome"].map(_textos).fillna("")
+    return out.sort_values("total_ms", ascending=False, ignore_index=True).round(2)
+
+
+def consultas_lentas(limite=50):
+    return db.get_pool().consultar_df(
+        "SELECT quando, ms, linhas, impressao, consulta, thread FROM consultas_lentas ORDER BY id DESC LIMIT ?",
+        (limite,))
+
+
+def _rotulo(valor):
+    return str(valor).replace("\\", "\\\\").replace("\n", " ").replace('"', '\\"')
+
+
+def texto_prometheus():
+    """Métricas no formato texto do Prometheus.
+
+    Quantis saem da janela do buffer; ``_sum``/``_count`` são cumulativos
+    desde o início do processo, como o Prometheus espera de um summary.
+    """
+    r = resumo()
+    with _lock:
+        acumulados = dict((k, list(v)) for k, v in _acumulados.items())
+    linhas = []
+    for tipo, metrica, rotulo, ajuda in (
+            ("sql", "cyberfinance_consulta_segundos", "consulta", "Tempo das consultas SQL por impressão digital."),
+            ("secao", "cyberfinance_secao_segundos", "secao", "Tempo de renderização das seções do app.")):
+        linhas += [f"# HELP {metrica} {ajuda}", f"# TYPE {metrica} summary"]
+        for row in r[r["tipo"] == tipo].itertuples():
+            nome = _rotulo(row.nome)
+            linhas.append(f'{metrica}{{{rotulo}="{nome}",quantile="0.5"}} {row.p50_ms / 1000:.6f}')
+            linhas.append(f'{metrica}{{{rotulo}="{nome}",quantile="0.95"}} {row.p95_ms / 1000:.6f}')
+        for (t, nome), (n, seg, _) in sorted(acumulados.items()):
+            if t == tipo:
+                linhas.append(f'{metrica}_sum{{{rotulo}="{_rotulo(nome)}"}} {seg:.6f}')
+                linhas.append(f'{metrica}_count{{{rotulo}="{_rotulo(nome)}"}} {n}')
+    linhas += ["# HELP cyberfinance_consulta_linhas_total Linhas devolvidas/afetadas por consulta.",
+               "# TYPE cyberfinance_consulta_linhas_total counter"]
+    for (t, nome), (_, _, total_linhas) in sorted(acumulados.items()):
+        if t == "sql":
+            linhas.append(f'cyberfinance_consulta_linhas_total{{consulta="{_rotulo(nome)}"}} {total_linhas}')
+    linhas += ["# HELP cyberfinance_consulta_info Texto normalizado de cada impressão digital.",
+               "# TYPE cyberfinance_consulta_info gauge"]
+    for digital, texto in sorted(_textos.items()):
+        linhas.append(f'cyberfinance_consulta_info{{consulta="{digital}",sql="{_rotulo(texto[:300])}"}} 1')
+    stats = get_cache().stats()
+    for chave, tipo_prom in (("hits", "counter"), ("misses", "counter"), ("evictions", "counter"),
+                             ("entradas", "gauge")):
+        sufixo = "_total" if tipo_prom == "counter" else ""
+        linhas += [f"# TYPE cyberfinance_cache_{chave}{sufixo} {tipo_prom}",
+                   f"cyberfinance_cache_{chave}{sufixo} {stats[chave]}"]
+    return "\n".join(linhas) + "\n"
+
+
+def exportar_prometheus(caminho=ARQUIVO_METRICAS):
+    """Grava o arquivo de forma atômica (o scraper nunca lê um arquivo pela metade)."""
+    tmp = f"{caminho}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(texto_prometheus())
+    os.replace(tmp, caminho)
+    return caminho
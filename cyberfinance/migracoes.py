@@ -0,0 +1,198 @@
+"""Migrações de schema versionadas por ``PRAGMA user_version``.
+
+Cada passo roda uma única vez por banco, em ordem, na sua própria transação
+(``BEGIN IMMEDIATE``, então processos concorrentes não aplicam o mesmo passo
+duas vezes). Depois da primeira chamada no processo, ``migrar()`` é um no-op
+que não toca no SQLite: o Streamlit pode chamá-la a cada rerun.
+
+Os passos são idempotentes (``IF NOT EXISTS``/checagem de coluna) porque os
+bancos antigos chegam aqui com ``user_version = 0`` e parte do schema já
+criada pelo antigo ``init_db``.
+"""
+import os
+import threading
+import time
+from datetime import datetime
+
+from . import (arquivo_frio, auditoria, auth, backup, busca, cache, classificador, cotacoes, importacao,
+               metricas, recorrencias, resumo, shards)
+from . import movimentacoes as mov
+from .config import LISTA_CATEGORIAS, SENHA_PADRAO_TEXTO, USUARIO_PADRAO
+from .db import get_pool
+
+# formato atual (centavos inteiros; ``valor`` em reais gerado) — migração 14 e shards novos
+_DDL_MOVIMENTACOES = ("CREATE TABLE {} (id INTEGER PRIMARY KEY AUTOINCREMENT, data DATE, categoria TEXT, "
+                      "descricao TEXT, valor_centavos INTEGER NOT NULL DEFAULT 0, tipo TEXT, usuario TEXT, "
+                      "hash_importacao TEXT, valor REAL GENERATED ALWAYS AS (valor_centavos / 100.0) VIRTUAL)")
+_DDL_METAS_USUARIO = ('CREATE TABLE IF NOT EXISTS metas_usuario (categoria TEXT NOT NULL, usuario TEXT NOT NULL, '
+                      'valor_limite REAL, PRIMARY KEY (categoria, usuario))')
+
+
+def _m001_tabelas_base(conn):
+    conn.execute('CREATE TABLE IF NOT EXISTS movimentacoes (id INTEGER PRIMARY KEY AUTOINCREMENT, data DATE, categoria TEXT, descricao TEXT, valor REAL, tipo TEXT)')
+    conn.execute('CREATE TABLE IF NOT EXISTS logs_auditoria (id INTEGER PRIMARY KEY AUTOINCREMENT, data_hora TEXT, acao TEXT, usuario TEXT)')
+    conn.execute('CREATE TABLE IF NOT EXISTS metas (categoria TEXT PRIMARY KEY, valor_limite REAL)')
+    conn.execute(_DDL_METAS_USUARIO)
+    conn.execute('CREATE TABLE IF NOT EXISTS usuarios (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE NOT NULL, password_hash TEXT NOT NULL, criado_em TEXT)')
+    # Inicializa metas zeradas se não existirem (legado)
+    if conn.execute("SELECT COUNT(*) FROM metas").fetchone()[0] == 0:
+        conn.executemany("INSERT INTO metas (categoria, valor_limite) VALUES (?, ?)", [(cat, 0.0) for cat in LISTA_CATEGORIAS])
+
+
+def _m002_dados_por_usuario(conn):
+    # movimentacoes: adiciona coluna usuario se não existir
+    cols_mov = [r[1] for r in conn.execute("PRAGMA table_info(movimentacoes)").fetchall()]
+    if "usuario" not in cols_mov:
+        conn.execute("ALTER TABLE movimentacoes ADD COLUMN usuario TEXT")
+        conn.execute("UPDATE movimentacoes SET usuario = ? WHERE usuario IS NULL", (USUARIO_PADRAO,))
+    # metas_usuario vazia: migra metas legadas para admin
+    if conn.execute("SELECT COUNT(*) FROM metas_usuario").fetchone()[0] == 0:
+        conn.execute("INSERT OR REPLACE INTO metas_usuario (categoria, usuario, valor_limite) "
+                     "SELECT categoria, ?, valor_limite FROM metas", (USUARIO_PADRAO,))
+
+
+def _m003_admin_padrao(conn):
+    if conn.execute("SELECT COUNT(*) FROM usuarios WHERE username = ?", (USUARIO_PADRAO,)).fetchone()[0] == 0:
+        hash_admin = auth.hash_senha(SENHA_PADRAO_TEXTO)  # custo da config, como os demais usuários
+        conn.execute("INSERT INTO usuarios (username, password_hash, criado_em) VALUES (?,?,?)",
+                     (USUARIO_PADRAO, hash_admin, datetime.now().strftime("%Y-%m-%d %H:%M")))
+
+
+def _m014_valor_centavos(conn):
+    # SQLite não altera o tipo de uma coluna: recria a tabela com centavos
+    # inteiros e ``valor`` (reais) como coluna gerada, mantendo os ids
+    if not mov.em_centavos(conn):
+        seq = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'movimentacoes'").fetchone()
+        conn.execute(_DDL_MOVIMENTACOES.format("movimentacoes_nova"))
+        conn.execute("INSERT INTO movimentacoes_nova (id, data, categoria, descricao, valor_centavos, tipo, usuario, "
+                     "hash_importacao) SELECT id, data, categoria, descricao, "
+                     "CAST(ROUND(COALESCE(valor, 0) * 100) AS INTEGER), tipo, usuario, hash_importacao "
+                     "FROM movimentacoes")
+        conn.execute("DROP TABLE movimentacoes")
+        conn.execute("ALTER TABLE movimentacoes_nova RENAME TO movimentacoes")
+        if seq:
+            # ids de linhas já apagadas (ou no arquivo frio) não podem voltar
+            if not conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'movimentacoes'",
+                                seq).rowcount:
+                conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('movimentacoes', ?)", seq)
+    # o DROP levou índices e triggers; o resumo passa a somar centavos
+    mov.garantir_indices(conn)
+    importacao.garantir_schema(conn)
+    busca.garantir_schema(conn)
+    conn.execute("DROP TABLE IF EXISTS resumo_mensal")
+    resumo.garantir_schema(conn)
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone():
+        # o DROP levou também as estatísticas; sem elas o planner troca o plano da busca FTS
+        conn.execute("ANALYZE movimentacoes")
+        conn.execute("ANALYZE resumo_mensal")
+
+
+def _s001_dados_usuario(conn):
+    # shard novo: só as tabelas de dados por usuário, já no formato atual
+    conn.execute(_DDL_MOVIMENTACOES.format("IF NOT EXISTS movimentacoes"))
+    conn.execute(_DDL_METAS_USUARIO)
+    mov.garantir_indices(conn)
+    importacao.garantir_schema(conn)
+    busca.garantir_schema(conn)
+    arquivo_frio.garantir_schema(conn)
+    resumo.garantir_schema(conn)
+    recorrencias.garantir_schema(conn)
+
+
+# (versão, descrição, função) — nunca reordenar nem remover; só acrescentar no fim
+MIGRACOES = [
+    (1, "tabelas base", _m001_tabelas_base),
+    (2, "movimentacoes.usuario e metas por usuário", _m002_dados_por_usuario),
+    (3, "usuário admin padrão", _m003_admin_padrao),
+    (4, "índices de cobertura (usuario, data)", mov.garantir_indices),
+    (5, "hash de importação de CSV", importacao.garantir_schema),
+    (6, "regras de classificação", classificador.garantir_schema),
+    (7, "índice full-text da busca", busca.garantir_schema),
+    (8, "resumo mensal materializado", resumo.garantir_schema),
+    (9, "histórico de cotações", cotacoes.garantir_schema),
+    (10, "log de consultas lentas", metricas.garantir_schema),
+    (11, "índices do log de auditoria", auditoria.garantir_schema),
+    (12, "histórico de backups", backup.garantir_schema),
+    (13, "catálogo do arquivo frio", arquivo_frio.garantir_schema),
+    (14, "valores em centavos inteiros", _m014_valor_centavos),
+    (15, "recorrências e parcelamentos", recorrencias.garantir_schema),
+    (16, "catálogo de shards", shards.garantir_schema),
+    (17, "versões de dados por usuário", cache.garantir_schema),
+    (18, "época das sessões (logout revoga os tokens)", auth.garantir_schema),
+    (19, "moeda das movimentações", mov.garantir_moeda),
+    (20, "versão das regras de classificação", classificador.garantir_versao),
+]
+VERSAO_ATUAL = MIGRACOES[-1][0]
+
+# Bancos de shard (ver ``shards``) têm numeração própria; passos novos de
+# tabelas por usuário entram nas duas listas
+MIGRACOES_SHARD = [
+    (1, "dados por usuário", _s001_dados_usuario),
+    (2, "versões de dados por usuário", cache.garantir_schema),
+    (3, "moeda das movimentações", mov.garantir_moeda),
+]
+
+_migrados = set()
+_lock = threading.Lock()
+ultima_execucao = {}  # caminho -> {"aplicadas": [...], "segundos": float}
+
+
+def versao(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def _aplicar(pool, passos, alvo):
+    inicio = time.perf_counter()
+    aplicadas = []
+    conn = pool.conexao()
+    if versao(conn) < alvo:
+        for numero, descricao, passo in passos:
+            if numero > alvo:
+                break
+            with pool.transacao() as c:
+                # relê dentro da transação: outro processo pode ter migrado antes
+                if versao(c) >= numero:
+                    continue
+                passo(c)
+                c.execute(f"PRAGMA user_version = {int(numero)}")
+            aplicadas.append(f"{numero:03d} {descricao}")
+    ultima_execucao[pool.caminho] = {"aplicadas": aplicadas, "segundos": time.perf_counter() - inicio}
+    return aplicadas
+
+
+def migrar(pool=None, ate=None, shard=False):
+    """Aplica as migrações pendentes do banco do ``pool`` (uma vez por processo).
+
+    ``ate`` para numa versão intermediária (carga em massa antes dos índices);
+    nesse caso o banco não é marcado como migrado. ``shard`` aplica
+    ``MIGRACOES_SHARD``; o catálogo (pool padrão) leva junto os shards
+    registrados nele.
+    """
+    pool = pool or get_pool()
+    passos = MIGRACOES_SHARD if shard else MIGRACOES
+    alvo = passos[-1][0] if ate is None else ate
+    if pool.caminho in _migrados:
+        return []
+    with _lock:
+        if pool.caminho in _migrados:
+            return []
+        aplicadas = _aplicar(pool, passos, alvo)
+        if alvo != passos[-1][0]:
+            return aplicadas
+        if not shard and pool is get_pool():
+            for p in shards.registrados():
+                if p.caminho not in _migrados:
+                    feitas = _aplicar(p, MIGRACOES_SHARD, MIGRACOES_SHARD[-1][0])
+                    aplicadas += [f"{os.path.basename(p.caminho)} {a}" for a in feitas]
+                    _migrados.add(p.caminho)
+        _migrados.add(pool.caminho)
+        return aplicadas
+
+
+def esquecer(caminho=None):
+    """Força nova checagem no próximo ``migrar()`` (restore de backup, testes)."""
+    with _lock:
+        if caminho is None:
+            _migrados.clear()
+        else:
+            _migrados.discard(caminho)
@@ -0,0 +1,184 @@
+"""Consultas agregadas de movimentações feitas no próprio SQLite.
+
+O painel só precisa da lista de meses, dos KPIs e dos totais por categoria;
+tudo isso sai do resumo materializado ``resumo_mensal`` (ver ``resumo``), e
+as linhas brutas são carregadas apenas para o mês selecionado (juntando a
+partição do arquivo frio, se o mês foi arquivado). As leituras passam pelo cache
+versionado por usuário (``cache.cacheado``). Ocorrências de recorrências e
+parcelamentos (``recorrencias``) não são linhas da tabela: entram somadas
+aos agregados e expandidas no quadro do mês.
+
+Dinheiro é gravado em centavos inteiros (``valor_centavos``); ``valor`` é
+uma coluna gerada em reais, mantida para leituras ad hoc. Os quadros de
+lançamentos chegam tipados: data como datetime, texto repetido (tipo,
+categoria, usuário) como ``category`` e centavos como int64.
+"""
+from datetime import date
+
+import pandas as pd
+
+from . import arquivo_frio, recorrencias
+from .cache import cacheado
+from .shards import pool_de
+
+INDICES = [
+    # (usuario, data) + colunas agregadas: cobre lista de meses e KPIs por período
+    "CREATE INDEX IF NOT EXISTS idx_mov_usuario_data ON movimentacoes (usuario, data, tipo, categoria, valor_centavos)",
+    # (usuario, tipo, categoria, data): cobre totais por categoria e metas
+    "CREATE INDEX IF NOT EXISTS idx_mov_usuario_tipo_cat_data "
+    "ON movimentacoes (usuario, tipo, categoria, data, valor_centavos)",
+]
+
+# Quadro de lançamentos (painel, relatório, busca): colunas lidas e dtypes compactos
+COLUNAS = ["id", "data", "categoria", "descricao", "valor_centavos", "tipo", "usuario"]
+CATEGORICAS = ["categoria", "tipo", "usuario"]
+TIPOS = {"id": "int64", "valor_centavos": "int64", **dict.fromkeys(CATEGORICAS, "category")}
+
+
+def em_centavos(conn):
+    """A tabela já guarda ``valor_centavos``? (bancos anteriores à migração 14 têm ``valor`` REAL)"""
+    return "valor_centavos" in [r[1] for r in conn.execute("PRAGMA table_info(movimentacoes)").fetchall()]
+
+
+def garantir_indices(conn):
+    if not em_centavos(conn):
+        # banco legado no meio da migração: a 14 recria a tabela e os índices
+        return
+    for ddl in INDICES:
+        conn.execute(ddl)
+
+
+def garantir_moeda(conn):
+    """Moeda de cada lançamento (padrão 'BRL'); ``cotacoes.converter_para_brl`` converte pela data."""
+    if "moeda" not in [r[1] for r in conn.execute("PRAGMA table_info(movimentacoes)").fetchall()]:
+        conn.execute("ALTER TABLE movimentacoes ADD COLUMN moeda TEXT NOT NULL DEFAULT 'BRL'")
+
+
+def tipar(df):
+    """Aplica os dtypes de ``TIPOS`` (e data datetime) e acrescenta ``valor`` em reais."""
+    if "data" in df.columns:
+        df = df.assign(data=pd.to_datetime(df["data"]))
+    df = df.astype({c: t for c, t in TIPOS.items() if c in df.columns})
+    if "valor_centavos" in df.columns:
+        df["valor"] = df["valor_centavos"] / 100
+    return df
+
+
+def intervalo_mes(mes):
+    """'2026-01' -> ('2026-01-01', '2026-02-01'), limites [início, fim)."""
+    ano, m = (int(x) for x in mes.split("-"))
+    ini = date(ano, m, 1)
+    fim = date(ano + (m == 12), m % 12 + 1, 1)
+    return ini.isoformat(), fim.isoformat()
+
+
+@cacheado
+def listar_meses(usuario):
+    rows = pool_de(usuario).consultar(
+        "SELECT DISTINCT mes FROM resumo_mensal WHERE usuario = ? AND mes != '' ORDER BY mes DESC", (usuario,))
+    meses = [r[0] for r in rows]
+    if not recorrencias.tem_regras(usuario):
+        return meses
+    return sorted(set(meses) | set(recorrencias.meses(usuario)), reverse=True)
+
+
+def _somar(df, extra, chaves):
+    """``df`` + agregados das recorrências (mesmas colunas), somados por ``chaves``."""
+    if extra.empty:
+        return df
+    return (pd.concat([df, extra]) if len(df) else extra).groupby(chaves, as_index=False).sum()
+
+
+@cacheado
+def kpis_por_mes(usuario, mes=None):
+    """Receita, despesa e saldo por mês (ou só do mês informado)."""
+    q = ("SELECT mes, "
+         "COALESCE(SUM(CASE WHEN tipo = 'Receita' THEN total_centavos END), 0) AS receita, "
+         "COALESCE(SUM(CASE WHEN tipo = 'Despesa' THEN total_centavos END), 0) AS despesa, "
+         "COALESCE(SUM(CASE WHEN tipo = 'Despesa' THEN quantidade END), 0) AS n_despesas "
+         "FROM resumo_mensal WHERE usuario = ? AND mes != ''")
+    p = [usuario]
+    if mes:
+        q += " AND mes = ?"
+        p.append(mes)
+    q += " GROUP BY mes ORDER BY mes"
+    df = pool_de(usuario).consultar_df(q, p)
+    if recorrencias.tem_regras(usuario):
+        rec = recorrencias.agregados(usuario, mes, mes)
+        receita, despesa = rec["tipo"] == "Receita", rec["tipo"] == "Despesa"
+        df = _somar(df, pd.DataFrame({"mes": rec["mes"], "receita": rec["total_centavos"].where(receita, 0),
+                                      "despesa": rec["total_centavos"].where(despesa, 0),
+                                      "n_despesas": rec["quantidade"].where(despesa, 0)}), "mes")
+    # somas exatas em centavos; reais só na saída
+    df["saldo"] = df["receita"] - df["despesa"]
+    df[["receita", "despesa", "saldo"]] = df[["receita", "despesa", "saldo"]] / 100
+    return df
+
+
+def kpis_mes(usuario, mes):
+    df = kpis_por_mes(usuario, mes)
+    if df.empty:
+        return {"receita": 0.0, "despesa": 0.0, "saldo": 0.0}
+    r = df.iloc[0]
+    return {"receita": float(r["receita"]), "despesa": float(r["despesa"]), "saldo": float(r["saldo"])}
+
+
+@cacheado
+def totais_categoria(usuario, mes, tipo="Despesa"):
+    df = pool_de(usuario).consultar_df(
+        "SELECT categoria, total_centavos FROM resumo_mensal "
+        "WHERE usuario = ? AND mes = ? AND tipo = ? ORDER BY categoria", (usuario, mes, tipo))
+    if recorrencias.tem_regras(usuario):
+        rec = recorrencias.agregados(usuario, mes, mes)
+        df = _somar(df, rec.loc[rec["tipo"] == tipo, ["categoria", "total_centavos"]], "categoria")
+    df["valor"] = df.pop("total_centavos") / 100
+    return df
+
+
+@cacheado
+def totais_tipo(usuario, mes):
+    """Receita x despesa do mês (gráfico de balanço)."""
+    df = pool_de(usuario).consultar_df(
+        "SELECT tipo, SUM(total_centavos) AS total_centavos FROM resumo_mensal "
+        "WHERE usuario = ? AND mes = ? GROUP BY tipo ORDER BY tipo", (usuario, mes))
+    if recorrencias.tem_regras(usuario):
+        df = _somar(df, recorrencias.agregados(usuario, mes, mes)[["tipo", "total_centavos"]], "tipo")
+    df["valor"] = df.pop("total_centavos") / 100
+    return df
+
+
+@cacheado
+def carregar_mes(usuario, mes):
+    ini, fim = intervalo_mes(mes)
+    df = pool_de(usuario).consultar_df(
+        f"SELECT {', '.join(COLUNAS)} FROM movimentacoes WHERE usuario = ? AND data >= ? AND data < ? "
+        "ORDER BY data, id", (usuario, ini, fim), parse_dates=["data"], dtype=TIPOS)
+    if mes in arquivo_frio.meses_arquivados(usuario):
+        arq = tipar(arquivo_frio.ler(usuario, ini, fim, colunas=COLUNAS))
+        arq = arq[~arq["id"].isin(df["id"])]
+        # categorias diferentes viram object no concat; tipar de novo
+        df = tipar(pd.concat([arq, df])) if len(df) else arq
+        df = df.sort_values(["data", "id"], ignore_index=True)
+    rec = recorrencias.ocorrencias(usuario, ini, fim) if recorrencias.tem_regras(usuario) else ()
+    if len(rec):
+        rec = tipar(rec)
+        df = tipar(pd.concat([df, rec])) if len(df) else rec
+        df = df.sort_values(["data", "id"], ignore_index=True)
+    df["valor"] = df["valor_centavos"] / 100
+    df["mes"] = pd.Series(mes, index=df.index, dtype="category")
+    return df
+
+
+@cacheado
+def gastos_mensais(usuario):
+    """Série de despesas por mês (fim de mês), meses sem gasto preenchidos com 0."""
+    df = kpis_por_mes(usuario)
+    df = df[df["n_despesas"] > 0]
+    if df.empty:
+        return pd.Series(dtype=float, name="valor")
+    idx = pd.PeriodIndex(df["mes"], freq="M")
+    s = pd.Series(df["despesa"].to_numpy(), index=idx, name="valor")
+    s = s.reindex(pd.period_range(idx.min(), idx.max(), freq="M"), fill_value=0.0)
+    s.index = s.index.to_timestamp(how="end").normalize()
+    s.index.name = "data"
+    return s
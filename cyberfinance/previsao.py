@@ -0,0 +1,174 @@
+"""Previsão de gastos por categoria (aba Previsão).
+
+Os gastos mensais saem do ``resumo_mensal`` e viram uma matriz
+categorias x meses; todos os modelos são operações NumPy sobre essa matriz
+inteira, então o custo não cresce com o número de transações:
+
+* projeção de fim de mês do mês corrente (ritmo diário combinado com EWMA);
+* EWMA e sazonal ingênuo (mesmo mês do ano anterior) para os próximos N meses;
+* backtest com origem móvel para medir o erro de cada método.
+
+O modelo ajustado fica no cache por (usuário, versão dos dados, dia).
+"""
+import calendar
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from . import recorrencias
+from .cache import cacheado
+from .shards import pool_de
+
+ALPHA_PADRAO = 0.5
+SAZONALIDADE = 12
+METODOS = ("ewma", "sazonal")
+
+
+def _ordinal(ano, mes):
+    return ano * 12 + (mes - 1)
+
+
+def _mes_str(ordinal):
+    return f"{ordinal // 12:04d}-{ordinal % 12 + 1:02d}"
+
+
+class ModeloPrevisao:
+    """Matriz de gastos mensais (categorias x meses) e previsões derivadas dela.
+
+    ``historico`` cobre só meses fechados (anteriores a ``hoje``);
+    ``mes_atual`` é o gasto parcial do mês corrente.
+    """
+
+    def __init__(self, categorias, ordinal_ini, historico, mes_atual, hoje, alpha=ALPHA_PADRAO):
+        self.categorias = list(categorias)
+        self.ordinal_ini = ordinal_ini
+        self.historico = historico
+        self.mes_atual = mes_atual
+        self.hoje = hoje
+        self.alpha = alpha
+        self.niveis = self._niveis_ewma(historico, alpha)
+
+    @classmethod
+    def de_resumo(cls, df, hoje, alpha=ALPHA_PADRAO):
+        """``df``: colunas categoria, mes ('YYYY-MM') e total."""
+        atual = _ordinal(hoje.year, hoje.month)
+        if df.empty:
+            return cls([], atual, np.zeros((0, 0)), np.zeros(0), hoje, alpha)
+        anos = df["mes"].str.slice(0, 4).astype(int).to_numpy()
+        meses = df["mes"].str.slice(5, 7).astype(int).to_numpy()
+        ordinais = _ordinal(anos, meses)
+        categorias, idx_cat = np.unique(df["categoria"].to_numpy(dtype=str), return_inverse=True)
+        ini = int(ordinais.min())
+        fim = max(int(ordinais.max()), atual)
+        matriz = np.zeros((len(categorias), fim - ini + 1))
+        np.add.at(matriz, (idx_cat, ordinais - ini), df["total"].to_numpy(dtype=float))
+        col_atual = atual - ini
+        historico = matriz[:, :col_atual] if col_atual > 0 else np.zeros((len(categorias), 0))
+        mes_atual = matriz[:, col_atual] if col_atual >= 0 else np.zeros(len(categorias))
+        return cls(categorias, ini, historico, mes_atual, hoje, alpha)
+
+    @staticmethod
+    def _niveis_ewma(x, alpha):
+        """Nível EWMA após cada mês (coluna t = nível com dados até t)."""
+        niveis = np.empty_like(x)
+        if x.shape[1] == 0:
+            return niveis
+        niveis[:, 0] = x[:, 0]
+        for t in range(1, x.shape[1]):
+            niveis[:, t] = alpha * x[:, t] + (1 - alpha) * niveis[:, t - 1]
+        return niveis
+
+    @property
+    def meses_historico(self):
+        return [_mes_str(self.ordinal_ini + t) for t in range(self.historico.shape[1])]
+
+    def projecao_mes_atual(self):
+        """Gasto até hoje, ritmo diário e projeção de fim de mês por categoria."""
+        dias_mes = calendar.monthrange(self.hoje.year, self.hoje.month)[1]
+        decorrido = self.hoje.day / dias_mes
+        ritmo = self.mes_atual / decorrido
+        base = self.niveis[:, -1] if self.niveis.shape[1] else ritmo
+        # no início do mês o ritmo é ruidoso: pesa mais a média histórica
+        projecao = np.maximum(decorrido * ritmo + (1 - decorrido) * base, self.mes_atual)
+        return pd.DataFrame({"categoria": self.categorias, "gasto_ate_hoje": self.mes_atual,
+                             "projecao_fim_mes": projecao, "media_ewma": base})
+
+    def prever(self, n_meses=3, metodo="ewma"):
+        """Matriz categorias x ``n_meses`` para os meses seguintes ao corrente."""
+        if metodo not in METODOS:
+            raise ValueError(f"Método desconhecido: {metodo}")
+        c, t = self.historico.shape
+        if t == 0:
+            return np.zeros((c, n_meses))
+        ewma = np.repeat(self.niveis[:, -1:], n_meses, axis=1)
+        if metodo == "ewma":
+            return ewma
+        # mês alvo h (1..n) está a t + h colunas do início; mesmo mês do ano anterior = t + h - 12
+        alvo = t + np.arange(1, n_meses + 1) - SAZONALIDADE
+        ok = (alvo >= 0) & (alvo < t)
+        prev = ewma.copy()
+        prev[:, ok] = self.historico[:, alvo[ok]]
+        return prev
+
+    def previsoes(self, n_meses=3):
+        """DataFrame longo (mes, categoria, ewma, sazonal)."""
+        atual = _ordinal(self.hoje.year, self.hoje.month)
+        meses = [_mes_str(atual + h) for h in range(1, n_meses + 1)]
+        ewma, saz = self.prever(n_meses, "ewma"), self.prever(n_meses, "sazonal")
+        return pd.DataFrame({
+            "mes": np.tile(meses, len(self.categorias)),
+            "categoria": np.repeat(self.categorias, n_meses),
+            "ewma": ewma.ravel(), "sazonal": saz.ravel()})
+
+    def backtest(self, horizonte=1, min_historico=3):
+        """Erro de previsão com origem móvel sobre os meses fechados.
+
+        Para cada origem t, prevê o mês t + horizonte - 1 usando só meses < t.
+        Retorna {metodo: {"mae", "mape", "n"}} agregando todas as categorias.
+        """
+        x = self.historico
+        c, t = x.shape
+        origens = np.arange(min_historico, t - horizonte + 1)
+        if c == 0 or len(origens) == 0:
+            return {m: {"mae": float("nan"), "mape": float("nan"), "n": 0} for m in METODOS}
+        alvos = origens + horizonte - 1
+        real = x[:, alvos]
+        ewma = self.niveis[:, origens - 1]
+        saz_idx = alvos - SAZONALIDADE
+        saz = np.where(saz_idx >= 0, x[:, np.clip(saz_idx, 0, None)], ewma)
+        resultado = {}
+        for nome, prev in (("ewma", ewma), ("sazonal", saz)):
+            erro = np.abs(prev - real)
+            com_gasto = real > 0
+            resultado[nome] = {
+                "mae": float(erro.mean()),
+                "mape": float((erro[com_gasto] / real[com_gasto]).mean()) if com_gasto.any() else float("nan"),
+                "n": int(erro.size)}
+        return resultado
+
+
+def _gastos_resumo(usuario):
+    df = pool_de(usuario).consultar_df(
+        "SELECT categoria, mes, total FROM resumo_mensal WHERE usuario = ? AND tipo = 'Despesa' AND mes != ''",
+        (usuario,), dtype={"categoria": "category", "mes": "category"})
+    if not recorrencias.tem_regras(usuario):
+        return df
+    rec = recorrencias.agregados(usuario)
+    rec = rec[rec["tipo"] == "Despesa"]
+    if rec.empty:
+        return df
+    # de_resumo soma linhas repetidas de (categoria, mes): basta empilhar
+    rec = pd.DataFrame({"categoria": rec["categoria"], "mes": rec["mes"], "total": rec["total_centavos"] / 100})
+    return (pd.concat([df, rec], ignore_index=True) if len(df) else rec).astype(
+        {"categoria": "category", "mes": "category"})
+
+
+@cacheado
+def _ajustar(usuario, hoje, alpha):
+    return ModeloPrevisao.de_resumo(_gastos_resumo(usuario), hoje, alpha)
+
+
+def ajustar(usuario, hoje=None, alpha=ALPHA_PADRAO):
+    """Modelo do usuário; ``hoje`` entra na chave do cache (troca a cada dia)."""
+    return _ajustar(usuario, hoje or date.today(), alpha)
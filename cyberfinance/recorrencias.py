@@ -0,0 +1,173 @@
+"""Recorrências e parcelamentos guardados como regra, não como N linhas.
+
+Uma linha de ``recorrencias`` descreve o cronograma inteiro: início,
+quantidade de ocorrências (NULL = conta fixa sem fim), intervalo em meses,
+valor em centavos e, no parcelamento, a política de arredondamento do
+resto. Lançar uma compra em 12x é um único INSERT.
+
+As ocorrências são expandidas sob demanda, vetorizadas no numpy e só para
+a janela consultada (``ocorrencias``/``agregados``). Os quadros e
+agregados do painel, das metas e da previsão juntam essa expansão às
+linhas reais de ``movimentacoes``; o ``resumo_mensal`` continua só com as
+linhas reais. Contas sem fim geram ocorrências até o mês corrente.
+
+Ocorrências recebem ``id`` negativo (-id da regra): no máximo uma por
+regra em cada mês, então o id é único dentro de um mês.
+"""
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from . import shards
+from .cache import cacheado
+from .shards import pool_de
+
+ARREDONDAMENTOS = ("primeiras", "ultima")  # onde cai o resto da divisão das parcelas
+COLUNAS = ["id", "data", "categoria", "descricao", "valor_centavos", "tipo", "usuario"]
+_FIM_ABERTO = "9999-12-01"
+
+
+def garantir_schema(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS recorrencias (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                 "usuario TEXT NOT NULL, descricao TEXT, categoria TEXT, tipo TEXT NOT NULL DEFAULT 'Despesa', "
+                 "inicio DATE NOT NULL, quantidade INTEGER, intervalo_meses INTEGER NOT NULL DEFAULT 1, "
+                 "valor_centavos INTEGER NOT NULL, parcelado INTEGER NOT NULL DEFAULT 0, "
+                 "arredondamento TEXT NOT NULL DEFAULT 'primeiras', encerrada_em DATE, criado_em TEXT)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_recorrencias_usuario ON recorrencias (usuario)")
+
+
+def criar(usuario, descricao, categoria, valor, inicio, quantidade=None, intervalo_meses=1, tipo="Despesa",
+          parcelado=False, arredondamento="primeiras"):
+    """Grava a regra (um INSERT) e devolve o id.
+
+    ``valor`` em reais: total da compra quando ``parcelado`` (dividido em
+    ``quantidade`` parcelas), senão o valor de cada ocorrência.
+    """
+    if parcelado and not quantidade:
+        raise ValueError("Parcelamento exige a quantidade de parcelas.")
+    if quantidade is not None and quantidade < 1 or intervalo_meses < 1:
+        raise ValueError("Quantidade e intervalo precisam ser positivos.")
+    if arredondamento not in ARREDONDAMENTOS:
+        raise ValueError(f"Arredondamento inválido: {arredondamento}")
+    cur = pool_de(usuario).executar(
+        "INSERT INTO recorrencias (usuario, descricao, categoria, tipo, inicio, quantidade, intervalo_meses, "
+        "valor_centavos, parcelado, arredondamento, criado_em) VALUES (?,?,?,?,?,?,?,?,?,?,?)",
+        (usuario, descricao, categoria, tipo, str(inicio), quantidade, intervalo_meses, round(valor * 100),
+         int(parcelado), arredondamento, datetime.now().strftime("%Y-%m-%d %H:%M")))
+    return cur.lastrowid
+
+
+def encerrar(usuario, id_regra, em=None):
+    """Para de gerar ocorrências a partir de ``em`` (hoje); as anteriores continuam."""
+    pool_de(usuario).executar("UPDATE recorrencias SET encerrada_em = ? WHERE id = ? AND usuario = ?",
+                        (str(em or date.today()), id_regra, usuario))
+
+
+def excluir(usuario, id_regra):
+    pool_de(usuario).executar("DELETE FROM recorrencias WHERE id = ? AND usuario = ?", (id_regra, usuario))
+
+
+def _ler_regras(usuario=None):
+    q = ("SELECT id, usuario, descricao, categoria, tipo, inicio, quantidade, intervalo_meses, valor_centavos, "
+         "parcelado, arredondamento, encerrada_em FROM recorrencias")
+    if usuario is None:
+        return shards.consultar_df(q + " ORDER BY id")
+    return pool_de(usuario).consultar_df(q + " WHERE usuario = ? ORDER BY id", (usuario,))
+
+
+@cacheado
+def regras(usuario):
+    return _ler_regras(usuario)
+
+
+@cacheado
+def tem_regras(usuario):
+    """Atalho para os leitores: a maioria dos usuários não tem regra nenhuma."""
+    return bool(pool_de(usuario).consultar("SELECT 1 FROM recorrencias WHERE usuario = ? LIMIT 1", (usuario,)))
+
+
+def _horizonte(hoje=None):
+    # contas sem fim vão até o último dia do mês corrente
+    return (pd.Period(hoje or date.today(), freq="M") + 1).strftime("%Y-%m-01")
+
+
+def expandir(r, ini=None, fim=None, hoje=None):
+    """Ocorrências das regras ``r`` com data em [ini, fim), como linhas de ``movimentacoes`` (data em texto)."""
+    if r.empty:
+        return pd.DataFrame(columns=COLUNAS)
+    ini = np.datetime64(str(ini or "0001-01-01")[:10], "D")
+    inicio = pd.to_datetime(r["inicio"]).to_numpy().astype("datetime64[D]")
+    mes0 = inicio.astype("datetime64[M]").astype(np.int64)
+    dia = (inicio - inicio.astype("datetime64[M]").astype("datetime64[D]")).astype(np.int64)
+    intervalo = r["intervalo_meses"].to_numpy(np.int64)
+    n = pd.to_numeric(r["quantidade"]).fillna(0).to_numpy(np.int64)  # 0 = sem fim (coluna só de NULL vem como object)
+    # limite exclusivo por regra: janela, encerramento e, sem quantidade, o horizonte
+    lim = np.full(len(r), np.datetime64(str(fim or _FIM_ABERTO)[:10], "D"))
+    encerrada = pd.to_datetime(r["encerrada_em"]).to_numpy().astype("datetime64[D]")
+    lim = np.where(np.isnat(encerrada), lim, np.minimum(lim, encerrada))
+    lim = np.where(n == 0, np.minimum(lim, np.datetime64(_horizonte(hoje), "D")), lim)
+
+    # faixa de ocorrências k (mês = mes0 + k * intervalo) que cai nos meses da janela
+    kmin = np.maximum(0, -((mes0 - ini.astype("datetime64[M]").astype(np.int64)) // intervalo))
+    kmax = ((lim - 1).astype("datetime64[M]").astype(np.int64) - mes0) // intervalo
+    kmax = np.where(n > 0, np.minimum(kmax, n - 1), kmax)
+    cont = np.clip(kmax - kmin + 1, 0, None)
+    i = np.repeat(np.arange(len(r)), cont)
+    k = np.arange(cont.sum()) - np.repeat(np.cumsum(cont) - cont, cont) + kmin[i]
+
+    mes = (mes0[i] + k * intervalo[i]).astype("datetime64[M]")
+    inicio_mes = mes.astype("datetime64[D]")
+    dias_mes = ((mes + 1).astype("datetime64[D]") - inicio_mes).astype(np.int64)
+    data = inicio_mes + np.minimum(dia[i], dias_mes - 1)  # dia 31 vira o último dia dos meses curtos
+    ok = (data >= ini) & (data < lim[i])
+    i, k, data = i[ok], k[ok], data[ok]
+
+    # parcelas: total // n e o resto distribuído conforme a política da regra
+    total = r["valor_centavos"].to_numpy(np.int64)[i]
+    parcelado = r["parcelado"].to_numpy(bool)[i]
+    partes = np.where(parcelado, n[i], 1)
+    base, resto = total // partes, total % partes
+    primeiras = r["arredondamento"].to_numpy()[i] == "primeiras"
+    valor = base + np.where(primeiras, k < resto, np.where(k == partes - 1, resto, 0))
+
+    descricao = r["descricao"].fillna("").to_numpy(object)[i]
+    rotulo = parcelado & (partes > 1)
+    if rotulo.any():
+        sufixo = pd.Series(k[rotulo] + 1).astype(str) + "/" + pd.Series(partes[rotulo]).astype(str)
+        descricao[rotulo] = (pd.Series(descricao[rotulo]) + " (" + sufixo + ")").to_numpy()
+    return pd.DataFrame({
+        "id": -r["id"].to_numpy(np.int64)[i],
+        "data": np.datetime_as_string(data, unit="D"),
+        "categoria": r["categoria"].to_numpy(object)[i],
+        "descricao": descricao,
+        "valor_centavos": valor,
+        "tipo": r["tipo"].to_numpy(object)[i],
+        "usuario": r["usuario"].to_numpy(object)[i],
+    }, columns=COLUNAS)
+
+
+def ocorrencias(usuario, ini=None, fim=None, hoje=None):
+    """Ocorrências do usuário em [ini, fim); ``usuario=None`` expande as regras de todos."""
+    r = regras(usuario) if usuario is not None else _ler_regras()
+    return expandir(r, ini, fim, hoje)
+
+
+def agregados(usuario, mes_ini=None, mes_fim=None, hoje=None):
+    """Soma e quantidade por (usuario, mes, tipo, categoria), no formato do ``resumo_mensal``."""
+    fim = (pd.Period(mes_fim, freq="M") + 1).strftime("%Y-%m-01") if mes_fim else None
+    oc = ocorrencias(usuario, f"{mes_ini}-01" if mes_ini else None, fim, hoje)
+    colunas = ["usuario", "mes", "tipo", "categoria", "total_centavos", "quantidade"]
+    if oc.empty:
+        return pd.DataFrame(columns=colunas)
+    oc["mes"] = oc["data"].str.slice(0, 7)
+    chaves = ["usuario", "mes", "tipo", "categoria"]
+    oc[chaves] = oc[chaves].fillna("")
+    df = oc.groupby(chaves, as_index=False).agg(total_centavos=("valor_centavos", "sum"),
+                                                 quantidade=("id", "size"))
+    return df[colunas]
+
+
+def meses(usuario, hoje=None):
+    """Meses ('AAAA-MM') com alguma ocorrência do usuário."""
+    return sorted(set(ocorrencias(usuario, hoje=hoje)["data"].str.slice(0, 7)))
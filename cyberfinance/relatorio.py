@@ -0,0 +1,168 @@
+"""Relatório PDF do período (extrato tabular, subtotais e saldo corrente).
+
+Há um único motor de relatório baseado em ``PDFRelatorio``: tabela em
+colunas com cabeçalho repetido a cada página, saldo acumulado por linha e
+subtotais por categoria no fim. A renderização roda num pool de threads
+(fora da thread do script do Streamlit) e o resultado fica em cache por
+(usuário, período, versão dos dados, mês corrente), a mesma chave do
+``cacheado``: baixar de novo o mesmo mês não custa nada, e a virada do mês
+(que expande mais ocorrências das recorrências) gera o PDF de novo.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from fpdf import FPDF
+
+from .cache import CacheLRU, versao_dados
+from .movimentacoes import carregar_mes
+
+MAX_WORKERS = 2
+TAMANHO_CACHE = 32
+ALTURA_LINHA = 5
+
+# (título, largura mm, alinhamento) — soma 190 mm (A4 retrato com margens de 10 mm)
+COLUNAS = [("Data", 22, "L"), ("Tipo", 18, "L"), ("Categoria", 32, "L"),
+           ("Descricao", 68, "L"), ("Valor (R$)", 25, "R"), ("Saldo (R$)", 25, "R")]
+
+
+def txt(t):
+    return str(t).encode('latin-1', 'replace').decode('latin-1')
+
+
+def moeda(v):
+    # 1234.5 -> '1.234,50'
+    return f"{v:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+class PDFRelatorio(FPDF):
+    def __init__(self, titulo="RELATORIO CYBERFINANCE", subtitulo=""):
+        super().__init__()
+        self.titulo = titulo
+        self.subtitulo = subtitulo
+        self.em_tabela = False
+        self.alias_nb_pages()
+        self.set_auto_page_break(True, margin=15)
+
+    def header(self):
+        self.set_font('Arial', 'B', 15)
+        self.cell(0, 10, txt(self.titulo), 0, 1, 'C')
+        if self.subtitulo:
+            self.set_font('Arial', '', 9)
+            self.cell(0, 5, txt(self.subtitulo), 0, 1, 'C')
+        self.ln(2)
+        if self.em_tabela:
+            self.cabecalho_tabela()
+
+    def footer(self):
+        self.set_y(-12)
+        self.set_font('Arial', 'I', 8)
+        self.cell(0, 8, f"Pagina {self.page_no()}/{{nb}}", 0, 0, 'C')
+
+    def cabecalho_tabela(self):
+        self.set_font('Arial', 'B', 8)
+        self.set_fill_color(220, 230, 235)
+        for titulo, largura, alinh in COLUNAS:
+            self.cell(largura, ALTURA_LINHA + 1, txt(titulo), 1, 0, alinh, 1)
+        self.ln()
+        self.set_font('Arial', '', 8)
+
+    def linha(self, valores, negrito=False):
+        self.set_font('Arial', 'B' if negrito else '', 8)
+        for (_, largura, alinh), v in zip(COLUNAS, valores):
+            self.cell(largura, ALTURA_LINHA, self._caber(txt(v), largura), 'LR', 0, alinh)
+        self.ln()
+
+    def _caber(self, texto, largura):
+        # corta o texto na largura da coluna em vez de quebrar a linha
+        limite = largura - 2
+        if self.get_string_width(texto) <= limite:
+            return texto
+        while texto and self.get_string_width(texto + "...") > limite:
+            texto = texto[:-1]
+        return texto + "..."
+
+
+def gerar_pdf(df_v, periodo=""):
+    """Renderiza o relatório de ``df_v`` (quadro de ``movimentacoes.carregar_mes`` do período)."""
+    df = df_v.sort_values(["data", "id"]) if "id" in df_v.columns else df_v.sort_values("data")
+    # somas em centavos inteiros: saldo e totais sem erro de ponto flutuante
+    centavos = df["valor_centavos"]
+    receita, despesa = df["tipo"] == "Receita", df["tipo"] == "Despesa"
+    saldo = (centavos.where(receita, 0) - centavos.where(despesa, 0)).cumsum() / 100
+    r = centavos[receita].sum() / 100
+    d = centavos[despesa].sum() / 100
+
+    pdf = PDFRelatorio(subtitulo=f"Periodo: {periodo}" if periodo else "")
+    pdf.add_page()
+    pdf.set_font("Arial", 'B', 11)
+    pdf.cell(0, 7, txt("Resumo Financeiro do Periodo"), 0, 1)
+    pdf.set_font("Arial", size=10)
+    pdf.cell(63, 7, txt(f"Total Ganhos: R$ {moeda(r)}"), 1, 0)
+    pdf.cell(63, 7, txt(f"Total Gastos: R$ {moeda(d)}"), 1, 0)
+    pdf.cell(64, 7, txt(f"Saldo Final: R$ {moeda(r - d)}"), 1, 1)
+    pdf.ln(4)
+
+    pdf.set_font("Arial", 'B', 11)
+    pdf.cell(0, 7, txt(f"Extrato Detalhado ({len(df)} lancamentos):"), 0, 1)
+    pdf.em_tabela = True
+    pdf.cabecalho_tabela()
+    datas = df["data"].astype(str).str.slice(0, 10)
+    for data, tipo, cat, desc, valor, s in zip(datas, df["tipo"], df["categoria"], df["descricao"],
+                                               df["valor"], saldo):
+        pdf.linha([data, tipo, cat, desc, moeda(valor), moeda(s)])
+    pdf.em_tabela = False
+    pdf.cell(sum(c[1] for c in COLUNAS), 0, "", "T", 1)
+
+    # Subtotais por categoria
+    pdf.ln(4)
+    pdf.set_font("Arial", 'B', 11)
+    pdf.cell(0, 7, txt("Subtotais por Categoria:"), 0, 1)
+    subt = df.groupby(["tipo", "categoria"], observed=True)["valor_centavos"].agg(["count", "sum"]).reset_index()
+    subt["sum"] = subt["sum"] / 100
+    pdf.set_font("Arial", 'B', 8)
+    for titulo, largura in (("Tipo", 30), ("Categoria", 60), ("Lancamentos", 30), ("Total (R$)", 35)):
+        pdf.cell(largura, ALTURA_LINHA + 1, txt(titulo), 1, 0, 'L', 0)
+    pdf.ln()
+    pdf.set_font("Arial", '', 8)
+    for tipo, cat, n, total in subt.itertuples(index=False, name=None):
+        pdf.cell(30, ALTURA_LINHA, txt(tipo), 1, 0)
+        pdf.cell(60, ALTURA_LINHA, txt(cat), 1, 0)
+        pdf.cell(30, ALTURA_LINHA, str(n), 1, 0, 'R')
+        pdf.cell(35, ALTURA_LINHA, moeda(total), 1, 1, 'R')
+
+    out = pdf.output(dest='S')
+    # fpdf 1.7 devolve str latin-1; fpdf2 devolve bytearray
+    return out.encode('latin-1') if isinstance(out, str) else bytes(out)
+
+
+def relatorio_mes(usuario, mes):
+    return gerar_pdf(carregar_mes(usuario, mes), periodo=mes)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_pedidos_lock = threading.Lock()
+_resultados = CacheLRU(TAMANHO_CACHE)
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="relatorio")
+    return _executor
+
+
+def solicitar_relatorio(usuario, mes):
+    """Future com os bytes do PDF; pedidos repetidos do mesmo período/versão reaproveitam o mesmo."""
+    chave = (usuario, mes, versao_dados(usuario), date.today().replace(day=1))
+    futuro = _resultados.get(chave)
+    if futuro is None or (futuro.done() and futuro.exception() is not None):
+        with _pedidos_lock:
+            futuro = _resultados.get(chave)
+            if futuro is None or (futuro.done() and futuro.exception() is not None):
+                futuro = _get_executor().submit(relatorio_mes, usuario, mes)
+                _resultados.put(chave, futuro)
+    return futuro
@@ -0,0 +1,114 @@
+"""Resumo mensal materializado (``resumo_mensal``).
+
+Uma linha por (usuario, mes, tipo, categoria) com soma e quantidade,
+mantida por triggers de insert/update/delete em ``movimentacoes``. KPIs,
+gráficos e tendência leem daqui, então o custo depende do número de meses
+e não do número de transações.
+
+Para bancos já existentes::
+
+    python -m cyberfinance.resumo --reconstruir
+"""
+import argparse
+
+from . import movimentacoes as mov
+from . import shards
+from .shards import pool_de
+
+# Soma em centavos inteiros (exata); ``total`` em reais é gerada para quem lê em reais
+DDL = ("CREATE TABLE IF NOT EXISTS resumo_mensal (usuario TEXT NOT NULL, mes TEXT NOT NULL, "
+       "tipo TEXT NOT NULL, categoria TEXT NOT NULL, total_centavos INTEGER NOT NULL DEFAULT 0, "
+       "quantidade INTEGER NOT NULL DEFAULT 0, total REAL GENERATED ALWAYS AS (total_centavos / 100.0) VIRTUAL, "
+       "PRIMARY KEY (usuario, mes, tipo, categoria)) WITHOUT ROWID")
+
+# Chaves nulas viram '' (a PK de tabelas WITHOUT ROWID não aceita NULL)
+_CHAVE = "COALESCE({r}.usuario, ''), COALESCE(substr({r}.data, 1, 7), ''), COALESCE({r}.tipo, ''), COALESCE({r}.categoria, '')"
+_ONDE = ("usuario = COALESCE({r}.usuario, '') AND mes = COALESCE(substr({r}.data, 1, 7), '') "
+         "AND tipo = COALESCE({r}.tipo, '') AND categoria = COALESCE({r}.categoria, '')")
+
+_SOMA = f"""
+        INSERT INTO resumo_mensal (usuario, mes, tipo, categoria, total_centavos, quantidade)
+        VALUES ({_CHAVE.format(r='new')}, new.valor_centavos, 1)
+        ON CONFLICT (usuario, mes, tipo, categoria)
+        DO UPDATE SET total_centavos = total_centavos + excluded.total_centavos, quantidade = quantidade + 1;"""
+_SUBTRAI = f"""
+        UPDATE resumo_mensal SET total_centavos = total_centavos - old.valor_centavos, quantidade = quantidade - 1
+        WHERE {_ONDE.format(r='old')};
+        DELETE FROM resumo_mensal WHERE {_ONDE.format(r='old')} AND quantidade <= 0;"""
+
+TRIGGERS = [
+    f"CREATE TRIGGER IF NOT EXISTS mov_resumo_ai AFTER INSERT ON movimentacoes BEGIN {_SOMA} END",
+    f"CREATE TRIGGER IF NOT EXISTS mov_resumo_ad AFTER DELETE ON movimentacoes BEGIN {_SUBTRAI} END",
+    ("CREATE TRIGGER IF NOT EXISTS mov_resumo_au AFTER UPDATE OF usuario, data, tipo, categoria, valor_centavos "
+     f"ON movimentacoes BEGIN {_SUBTRAI} {_SOMA} END"),
+]
+
+
+def garantir_schema(conn):
+    existe = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'resumo_mensal'").fetchone()
+    conn.execute(DDL)
+    for ddl in TRIGGERS:
+        conn.execute(ddl)
+    if not existe and mov.em_centavos(conn):
+        # banco legado (valor REAL): a migração 14 recria o resumo depois de converter
+        reconstruir(conn)
+
+
+def reconstruir(conn=None, usuario=None):
+    """Recalcula o resumo a partir de ``movimentacoes`` e do arquivo frio (todos ou um usuário).
+
+    Sem ``conn``, recalcula em cada shard (ou no do usuário) e soma as linhas.
+    """
+    if conn is None:
+        linhas = 0
+        for pool in [pool_de(usuario)] if usuario is not None else shards.pools():
+            with pool.transacao() as c:
+                linhas += reconstruir(c, usuario)
+        return linhas
+    filtro, p = ("WHERE usuario = ?", (usuario,)) if usuario is not None else ("", ())
+    conn.execute(f"DELETE FROM resumo_mensal {filtro}", p)
+    conn.execute(f"INSERT INTO resumo_mensal (usuario, mes, tipo, categoria, total_centavos, quantidade) "
+                 f"SELECT {_CHAVE.format(r='m')}, SUM(m.valor_centavos), COUNT(*) "
+                 f"FROM movimentacoes m {filtro.replace('usuario', 'm.usuario')} GROUP BY 1, 2, 3, 4", p)
+    if _tem_arquivo_frio(conn):
+        from .arquivo_frio import agregados
+
+        arq = agregados(usuario)
+        if usuario is None:
+            # as partições são de todos; neste banco entram só as dos usuários dele
+            donos = [r[0] for r in conn.execute("SELECT DISTINCT usuario FROM meses_arquivados").fetchall()]
+            arq = arq[arq["usuario"].isin(donos)]
+        conn.executemany(
+            "INSERT INTO resumo_mensal (usuario, mes, tipo, categoria, total_centavos, quantidade) "
+            "VALUES (?,?,?,?,?,?) ON CONFLICT (usuario, mes, tipo, categoria) DO UPDATE SET "
+            "total_centavos = total_centavos + excluded.total_centavos, "
+            "quantidade = quantidade + excluded.quantidade",
+            zip(*(arq[c].tolist() for c in arq.columns)))
+    return conn.execute("SELECT COUNT(*) FROM resumo_mensal").fetchone()[0]
+
+
+def _tem_arquivo_frio(conn):
+    # o catálogo nasce na migração 13; a primeira reconstrução roda na 8
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'meses_arquivados'").fetchone():
+        return False
+    return conn.execute("SELECT 1 FROM meses_arquivados LIMIT 1").fetchone() is not None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manutenção do resumo mensal materializado.")
+    parser.add_argument("--reconstruir", action="store_true", help="recalcula resumo_mensal a partir de movimentacoes")
+    parser.add_argument("--usuario", help="limita a reconstrução a um usuário")
+    args = parser.parse_args(argv)
+    if not args.reconstruir:
+        parser.print_help()
+        return
+    linhas = 0
+    for pool in [pool_de(args.usuario)] if args.usuario else shards.pools():
+        with pool.transacao() as conn:
+            garantir_schema(conn)
+            linhas += reconstruir(conn, args.usuario)
+    print(f"resumo_mensal reconstruído: {linhas} linhas.")
+
+
+if __name__ == "__main__":
+    main()
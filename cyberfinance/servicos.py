@@ -0,0 +1,174 @@
+"""Camada de serviços: as operações do app sem Streamlit.
+
+O ``app.py`` só desenha a tela. Lançamentos e os lotes noturnos
+passam por aqui e rodam igual de um script ou do CLI (``python -m
+cyberfinance``):
+
+* ``importar_pasta``: CSVs de uma pasta (uma subpasta por usuário), com
+  usuários diferentes em paralelo e os arquivos de cada um em ordem;
+* ``relatorios_mes``: o PDF do mês de cada usuário, num pool de processos
+  (o fpdf é Python puro; em threads os relatórios disputariam o GIL);
+* ``metas.estouros``: a varredura de estouros de orçamento de todos os
+  usuários, já vetorizada.
+"""
+import hashlib
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from glob import glob
+
+import pandas as pd
+
+from . import importacao, recorrencias, shards
+from .classificador import classificar_ia
+from .config import THREADS_IMPORTACAO
+from .db import configurar, get_pool
+from .shards import pool_de
+
+SQL_LANCAMENTO = ("INSERT INTO movimentacoes (data, categoria, descricao, valor_centavos, tipo, usuario) "
+                  "VALUES (?,?,?,?,?,?)")
+
+
+# --- Lançamentos ---
+def lancar_despesa(usuario, data, descricao, valor, categoria="Auto", parcelas=1, fixa=False):
+    """Despesa avulsa, parcelada (``parcelas`` > 1) ou conta fixa; devolve a categoria gravada.
+
+    Parcelas e contas fixas viram uma regra de ``recorrencias``; as
+    ocorrências são expandidas na leitura. Parcelada e fixa ao mesmo tempo
+    é ``ValueError``. O cache é invalidado pelos triggers de ``versoes_dados``.
+    """
+    if parcelas > 1 and fixa:
+        raise ValueError("Escolha parcelas ou conta fixa, não os dois.")
+    cat = classificar_ia(descricao, usuario) if categoria == "Auto" else categoria
+    if parcelas > 1:
+        recorrencias.criar(usuario, descricao, cat, valor, data, quantidade=parcelas, parcelado=True)
+    elif fixa:
+        recorrencias.criar(usuario, descricao, cat, valor, data)
+    else:
+        pool_de(usuario).executar(SQL_LANCAMENTO, (str(data), cat, descricao, round(valor * 100), "Despesa", usuario))
+    return cat
+
+
+def lancar_receita(usuario, data, fonte, valor, fixa=False):
+    if fixa:
+        recorrencias.criar(usuario, fonte, "Receita", valor, data, tipo="Receita")
+    else:
+        pool_de(usuario).executar(SQL_LANCAMENTO, (str(data), "Receita", fonte, round(valor * 100), "Receita", usuario))
+
+
+# --- Importação de pastas ---
+def arquivos_csv(pasta, usuario=None):
+    """[(usuario, caminho), ...]: com ``usuario``, os CSVs da própria pasta; sem, os de cada subpasta
+    (o nome da subpasta é o usuário)."""
+    if usuario is not None:
+        return [(usuario, c) for c in sorted(glob(os.path.join(pasta, "*.csv")))]
+    return [(u, c) for u in sorted(os.listdir(pasta)) if os.path.isdir(os.path.join(pasta, u))
+            for c in sorted(glob(os.path.join(pasta, u, "*.csv")))]
+
+
+def importar_pasta(pasta, usuario=None, threads=THREADS_IMPORTACAO, progresso=None):
+    """Importa os CSVs de ``pasta``; devolve um DataFrame com uma linha por arquivo.
+
+    Cada usuário importa os seus arquivos em sequência numa thread; com o
+    banco dividido, usuários em shards diferentes gravam ao mesmo tempo.
+    Um arquivo com erro não interrompe os outros (coluna ``erro``).
+    ``progresso`` recebe a linha de cada arquivo concluído.
+    """
+    por_usuario = {}
+    for u, caminho in arquivos_csv(pasta, usuario):
+        por_usuario.setdefault(u, []).append(caminho)
+
+    def importar_usuario(item):
+        u, caminhos = item
+        linhas = []
+        for caminho in caminhos:
+            linha = {"usuario": u, "arquivo": caminho, "lidas": 0, "inseridas": 0, "duplicadas": 0,
+                     "segundos": 0.0, "erro": None}
+            try:
+                res = importacao.importar_csv(caminho, u)
+                linha.update({k: res[k] for k in ("lidas", "inseridas", "duplicadas")},
+                             segundos=round(res["segundos"], 3))
+            except Exception as e:
+                linha["erro"] = str(e)
+            if progresso:
+                progresso(linha)
+            linhas.append(linha)
+        return linhas
+
+    colunas = ["usuario", "arquivo", "lidas", "inseridas", "duplicadas", "segundos", "erro"]
+    if not por_usuario:
+        return pd.DataFrame(columns=colunas)
+    with ThreadPoolExecutor(max_workers=max(1, min(threads, len(por_usuario))),
+                            thread_name_prefix="importacao") as executor:
+        partes = list(executor.map(importar_usuario, por_usuario.items()))
+    return pd.DataFrame([linha for parte in partes for linha in parte], columns=colunas)
+
+
+# --- Relatórios de fim de mês ---
+def usuarios_do_mes(mes):
+    """Usuários com algum lançamento em ``mes`` (real, arquivado ou de recorrência)."""
+    df = shards.consultar_df("SELECT DISTINCT usuario FROM resumo_mensal WHERE mes = ?", (mes,))
+    rec = recorrencias.agregados(None, mes, mes)
+    return sorted((set(df["usuario"]) | set(rec["usuario"])) - {None, ""})
+
+
+def arquivo_relatorio(pasta, usuario, mes):
+    nome = re.sub(r"[^\w.-]+", "_", usuario)
+    if nome != usuario:
+        # nomes diferentes não podem cair no mesmo arquivo depois da limpeza
+        nome += "_" + hashlib.blake2b(usuario.encode("utf-8"), digest_size=3).hexdigest()
+    return os.path.join(pasta, f"relatorio_{mes}_{nome}.pdf")
+
+
+def _iniciar_processo(caminho):
+    # o processo filho abre as próprias conexões (catálogo e shards)
+    configurar(caminho)
+
+
+def _gravar_relatorio(usuario, mes, pasta):
+    from .movimentacoes import carregar_mes
+    from .relatorio import gerar_pdf
+
+    df = carregar_mes(usuario, mes)
+    caminho = arquivo_relatorio(pasta, usuario, mes)
+    with open(caminho + ".tmp", "wb") as f:
+        f.write(gerar_pdf(df, periodo=mes))
+    os.replace(caminho + ".tmp", caminho)
+    return {"usuario": usuario, "arquivo": caminho, "lancamentos": len(df),
+            "kb": round(os.path.getsize(caminho) / 1024, 1), "erro": None}
+
+
+def relatorios_mes(mes, pasta, usuarios=None, processos=None, progresso=None):
+    """Grava em ``pasta`` o PDF de ``mes`` de cada usuário; devolve um DataFrame por usuário.
+
+    ``usuarios`` padrão: ``usuarios_do_mes``. Com mais de um processo, os
+    relatórios são espalhados num ``ProcessPoolExecutor``; um relatório com
+    erro não interrompe os outros (coluna ``erro``).
+    """
+    usuarios = usuarios_do_mes(mes) if usuarios is None else list(usuarios)
+    os.makedirs(pasta, exist_ok=True)
+    processos = min(processos or os.cpu_count() or 1, max(len(usuarios), 1))
+    linhas = []
+
+    def concluir(usuario, calcular):
+        try:
+            linha = calcular()
+        except Exception as e:
+            linha = {"usuario": usuario, "arquivo": None, "lancamentos": 0, "kb": 0.0, "erro": str(e)}
+        if progresso:
+            progresso(linha)
+        linhas.append(linha)
+
+    if processos == 1:
+        for u in usuarios:
+            concluir(u, lambda: _gravar_relatorio(u, mes, pasta))
+    else:
+        # spawn: um fork herdaria as conexões SQLite e as threads de fundo deste processo
+        with ProcessPoolExecutor(processos, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_iniciar_processo, initargs=(get_pool().caminho,)) as executor:
+            futuros = {executor.submit(_gravar_relatorio, u, mes, pasta): u for u in usuarios}
+            for futuro in as_completed(futuros):
+                concluir(futuros[futuro], futuro.result)
+    colunas = ["usuario", "arquivo", "lancamentos", "kb", "erro"]
+    return pd.DataFrame(linhas, columns=colunas).sort_values("usuario", ignore_index=True)
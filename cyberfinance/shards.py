@@ -0,0 +1,280 @@
+"""Dados de cada usuário em um shard SQLite próprio, escolhido por hash do nome.
+
+O SQLite tem um escritor por arquivo: importações de CSV, parcelamentos e
+metas de usuários diferentes esperam uns pelos outros no mesmo lock. Depois
+de ``dividir``, ``movimentacoes`` (com a busca FTS e o ``resumo_mensal``),
+``metas_usuario``, ``recorrencias`` e ``meses_arquivados`` de cada usuário
+ficam em ``shards/shard_NN.db``, ao lado do banco principal, que vira o
+catálogo: ``usuarios``, auditoria, cotações, métricas, backups, regras de
+classificação e a tabela ``shards`` com a lista de arquivos.
+
+* ``pool_de(usuario)`` é o pool do shard do usuário (ou o pool padrão, num
+  banco não dividido); toda rotina por usuário lê e grava por ele.
+* ``pools()`` lista os bancos com dados de usuários. ``em_paralelo`` e
+  ``consultar_df`` espalham uma leitura por todos numa thread pool e juntam
+  o resultado (visões do admin, alertas de metas em lote).
+* O shard é ``blake2b(usuario) % n``, estável entre processos; ``n`` é o
+  número de linhas de ``shards`` e só é escolhido na divisão.
+
+A divisão copia as linhas de cada usuário para o seu shard mantendo os ids,
+registra os shards e esvazia as tabelas no catálogo na mesma transação.
+Rode com o app parado: processos abertos continuam lendo o catálogo.
+
+Manutenção::
+
+    python -m cyberfinance.shards --dividir 8 [--vacuum]
+    python -m cyberfinance.shards --listar
+"""
+import argparse
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+from .cache import get_cache
+from .config import NUM_SHARDS
+from .db import PoolConexoes, get_pool
+
+PASTA = "shards"  # relativa à pasta do catálogo
+MAX_WORKERS = 8
+# tabelas copiadas na divisão (colunas explícitas: a ordem física pode variar entre bancos antigos)
+TABELAS = {
+    "movimentacoes": "id, data, categoria, descricao, valor_centavos, tipo, usuario, hash_importacao, moeda",
+    "resumo_mensal": "usuario, mes, tipo, categoria, total_centavos, quantidade",
+    "metas_usuario": "categoria, usuario, valor_limite",
+    "recorrencias": "id, usuario, descricao, categoria, tipo, inicio, quantidade, intervalo_meses, valor_centavos, "
+                    "parcelado, arredondamento, encerrada_em, criado_em",
+    "meses_arquivados": "usuario, mes, linhas, total, arquivado_em",
+    "versoes_dados": "usuario, versao",
+}
+
+_estado = (None, [])  # (pool do catálogo, pools dos shards registrados nele)
+_estado_lock = threading.Lock()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def garantir_schema(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS shards (numero INTEGER PRIMARY KEY, caminho TEXT NOT NULL, "
+                 "criado_em TEXT NOT NULL)")
+
+
+def shard_de(usuario, n):
+    """Índice do shard de ``usuario`` entre ``n`` (usuário nulo cai junto com '')."""
+    h = hashlib.blake2b((usuario or "").encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(h, "big") % n
+
+
+def _caminho(catalogo, relativo):
+    return os.path.join(os.path.dirname(os.path.abspath(catalogo.caminho)), relativo)
+
+
+def registrados():
+    """Pools dos shards do catálogo atual ([] se o banco não foi dividido)."""
+    global _estado
+    catalogo = get_pool()
+    dono, lista = _estado
+    if dono is not catalogo:
+        with _estado_lock:
+            dono, lista = _estado
+            if dono is not catalogo:
+                lista = []
+                if catalogo.consultar("SELECT 1 FROM sqlite_master WHERE name = 'shards'"):
+                    lista = [PoolConexoes(_caminho(catalogo, c), catalogo.pragmas)
+                             for (c,) in catalogo.consultar("SELECT caminho FROM shards ORDER BY numero")]
+                _estado = (catalogo, lista)
+    return lista
+
+
+def esquecer():
+    """Relê a lista de shards na próxima chamada (restore de backup)."""
+    global _estado
+    with _estado_lock:
+        for pool in _estado[1]:
+            pool.fechar_todas()
+        _estado = (None, [])
+
+
+def ativo():
+    return bool(registrados())
+
+
+def pool_de(usuario):
+    lista = registrados()
+    return lista[shard_de(usuario, len(lista))] if lista else get_pool()
+
+
+def pools():
+    """Bancos com dados de usuários: os shards ou, sem divisão, o próprio catálogo."""
+    return registrados() or [get_pool()]
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="shards")
+    return _executor
+
+
+def em_paralelo(funcao, alvos=None):
+    """[funcao(pool) for pool in alvos], um shard por thread; ``alvos`` padrão: ``pools()``."""
+    alvos = pools() if alvos is None else list(alvos)
+    if len(alvos) == 1:
+        return [funcao(alvos[0])]
+    return list(_get_executor().map(funcao, alvos))
+
+
+def consultar_df(q, p=(), **kwargs):
+    """A mesma consulta em todos os shards, concatenada (agregue por chaves que incluam o usuário)."""
+    partes = em_paralelo(lambda pool: pool.consultar_df(q, p, **kwargs))
+    cheias = [df for df in partes if len(df)]
+    if len(cheias) <= 1:
+        return cheias[0] if cheias else partes[0]
+    return pd.concat(cheias, ignore_index=True)
+
+
+def resumo():
+    """Usuários, lançamentos e tamanho de cada banco de dados de usuários."""
+    def contar(pool):
+        conn = pool.conexao()
+        return {"banco": os.path.basename(pool.caminho),
+                "usuarios": conn.execute("SELECT COUNT(DISTINCT usuario) FROM resumo_mensal").fetchone()[0],
+                "movimentacoes": conn.execute("SELECT COUNT(*) FROM movimentacoes").fetchone()[0],
+                "tamanho_mb": round(os.path.getsize(pool.caminho) / 2 ** 20, 1)}
+    return pd.DataFrame(em_paralelo(contar))
+
+
+# --- Divisão ---
+def _gatilhos(conn):
+    # os triggers das tabelas copiadas (resumo, FTS, versões) ficam fora durante cópias e limpezas em massa
+    return conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' "
+                        f"AND tbl_name IN ({', '.join('?' * len(TABELAS))})", list(TABELAS)).fetchall()
+
+
+def _sem_gatilhos(conn, gatilhos):
+    for nome, _ in gatilhos:
+        conn.execute(f"DROP TRIGGER IF EXISTS {nome}")
+
+
+def _tem_fts(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'movimentacoes_fts'").fetchone() is not None
+
+
+def _sequencias(conn):
+    return dict(conn.execute("SELECT name, seq FROM sqlite_sequence "
+                             "WHERE name IN ('movimentacoes', 'recorrencias')").fetchall())
+
+
+def _copiar(catalogo, shard, numero, n, sequencias):
+    """Copia para ``shard`` as linhas dos usuários do shard ``numero``; devolve os lançamentos copiados."""
+    with shard.transacao() as conn:
+        gatilhos = _gatilhos(conn)
+        _sem_gatilhos(conn, gatilhos)
+    conn = catalogo.conexao()
+    conn.execute("ATTACH DATABASE ? AS shard", (shard.caminho,))
+    try:
+        with catalogo.transacao():
+            for tabela, colunas in TABELAS.items():
+                cur = conn.execute(f"INSERT INTO shard.{tabela} ({colunas}) SELECT {colunas} FROM main.{tabela} "
+                                   "WHERE shard_de(usuario, ?) = ?", (n, numero))
+                if tabela == "movimentacoes":
+                    linhas = cur.rowcount
+            # ids já usados (inclusive os de linhas apagadas ou no arquivo frio) não voltam
+            for nome, seq in sequencias.items():
+                if not conn.execute("UPDATE shard.sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?",
+                                    (seq, nome)).rowcount:
+                    conn.execute("INSERT INTO shard.sqlite_sequence (name, seq) VALUES (?, ?)", (nome, seq))
+    finally:
+        conn.execute("DETACH DATABASE shard")
+    with shard.transacao() as c:
+        if _tem_fts(c):
+            c.execute("INSERT INTO movimentacoes_fts (movimentacoes_fts) VALUES ('rebuild')")
+        for _, sql in gatilhos:
+            c.execute(sql)
+    shard.conexao().execute("ANALYZE")
+    return linhas
+
+
+def dividir(n=NUM_SHARDS, vacuum=False, progresso=None):
+    """Divide o banco monolítico em ``n`` shards; devolve [(arquivo, lançamentos), ...].
+
+    Cada shard é criado com ``migracoes.MIGRACOES_SHARD`` e recebe suas linhas
+    numa transação; só depois o catálogo registra os shards e esvazia as
+    tabelas de dados, tudo de uma vez. Arquivos de uma divisão interrompida
+    (não registrados) são recriados.
+    """
+    from . import auditoria, migracoes
+
+    if n < 2:
+        raise ValueError("A divisão precisa de pelo menos 2 shards.")
+    catalogo = get_pool()
+    migracoes.migrar(catalogo)
+    if ativo():
+        raise ValueError("O banco já está dividido em shards.")
+    auditoria.descarregar()
+    os.makedirs(_caminho(catalogo, PASTA), exist_ok=True)
+    relativos = [f"{PASTA}/shard_{i:02d}.db" for i in range(n)]
+    conn = catalogo.conexao()
+    conn.create_function("shard_de", 2, shard_de, deterministic=True)
+    sequencias = _sequencias(conn)
+    novos, copiados = [], []
+    for i, relativo in enumerate(relativos):
+        if progresso:
+            progresso(i, n)
+        caminho = _caminho(catalogo, relativo)
+        for resto in (caminho, caminho + "-wal", caminho + "-shm"):
+            if os.path.exists(resto):
+                os.remove(resto)
+        shard = PoolConexoes(caminho, catalogo.pragmas)
+        migracoes.migrar(shard, shard=True)
+        copiados.append((relativo, _copiar(catalogo, shard, i, n, sequencias)))
+        novos.append(shard)
+
+    agora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    with catalogo.transacao() as c:
+        c.executemany("INSERT INTO shards (numero, caminho, criado_em) VALUES (?,?,?)",
+                      [(i, r, agora) for i, r in enumerate(relativos)])
+        gatilhos = _gatilhos(c)
+        _sem_gatilhos(c, gatilhos)
+        for tabela in TABELAS:
+            c.execute(f"DELETE FROM {tabela}")
+        if _tem_fts(c):
+            c.execute("INSERT INTO movimentacoes_fts (movimentacoes_fts) VALUES ('delete-all')")
+        for _, sql in gatilhos:
+            c.execute(sql)
+    if vacuum:
+        conn.execute("VACUUM")
+    global _estado
+    with _estado_lock:
+        _estado = (catalogo, novos)
+    get_cache().limpar()
+    return copiados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shards de dados por usuário.")
+    parser.add_argument("--dividir", type=int, nargs="?", const=NUM_SHARDS, metavar="N",
+                        help=f"divide o banco monolítico em N shards (padrão {NUM_SHARDS})")
+    parser.add_argument("--vacuum", action="store_true", help="compacta o catálogo depois de dividir")
+    parser.add_argument("--listar", action="store_true", help="usuários e lançamentos por shard")
+    args = parser.parse_args(argv)
+    from . import migracoes
+
+    migracoes.migrar()
+    if args.dividir:
+        copiados = dividir(args.dividir, args.vacuum,
+                           progresso=lambda i, n: print(f"shard {i + 1}/{n}...", end="\r", flush=True))
+        print(f"{sum(n for _, n in copiados)} lançamentos divididos em {len(copiados)} shards.")
+    elif args.listar:
+        print(resumo().to_string(index=False))
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""Cada teste roda num banco próprio em ``tmp_path``, sem backup agendado e com o arquivo frio à parte."""
+import os
+import tempfile
+
+os.environ.setdefault("CYBERFINANCE_BACKUP_HORAS", "0")
+os.environ.setdefault("CYBERFINANCE_ARQUIVO_FRIO", tempfile.mkdtemp(prefix="cyberfinance_frio_"))
+os.environ.setdefault("CYBERFINANCE_BCRYPT_CUSTO", "4")
+os.environ.setdefault("CYBERFINANCE_SEGREDO_SESSAO", "segredo-dos-testes")
+
+import pytest  # noqa: E402
+
+from cyberfinance import migracoes, shards  # noqa: E402
+from cyberfinance.cache import get_cache  # noqa: E402
+from cyberfinance.db import configurar  # noqa: E402
+
+
+def _trocar_banco(caminho):
+    shards.esquecer()
+    migracoes.esquecer()
+    get_cache().limpar()
+    return configurar(str(caminho))
+
+
+@pytest.fixture
+def abrir_banco(tmp_path):
+    """Aponta o pool padrão para um arquivo em ``tmp_path`` (sem migrar); devolve o pool."""
+    pools = []
+
+    def abrir(nome="financeiro.db"):
+        pools.append(_trocar_banco(tmp_path / nome))
+        return pools[-1]
+
+    yield abrir
+    shards.esquecer()
+    for pool in pools:
+        pool.fechar_todas()
+
+
+@pytest.fixture
+def banco(abrir_banco):
+    """Banco novo já migrado."""
+    pool = abrir_banco()
+    migracoes.migrar()
+    return pool
@@ -0,0 +1,43 @@
+import subprocess
+import sys
+
+from cyberfinance import auditoria, db
+from cyberfinance.db import get_pool
+
+
+def consultas_ao_banco(funcao):
+    feitas = []
+    observador = lambda q, segundos, linhas: feitas.append(q)  # noqa: E731
+    db.observadores.append(observador)
+    try:
+        funcao()
+    finally:
+        db.observadores.remove(observador)
+    return feitas
+
+
+def ler_aba():
+    return auditoria.acoes(), auditoria.usuarios(), auditoria.contar(), auditoria.pagina()[0]
+
+
+def test_aba_relida_sem_ir_ao_banco_ate_um_lote_novo(banco):
+    auditoria.registrar("Login Realizado", "ana", "2025-01-10 10:00:00")
+    auditoria.descarregar()
+    antes = ler_aba()
+    assert antes[:3] == (["Login Realizado"], ["ana"], 1)
+    assert consultas_ao_banco(ler_aba) == []
+
+    auditoria.registrar("Usuário Criado", "bia", "2025-01-11 10:00:00")
+    auditoria.descarregar()
+    depois = ler_aba()
+    assert depois[:3] == (["Login Realizado", "Usuário Criado"], ["ana", "bia"], 2)
+    assert depois[3]["usuario"].tolist() == ["bia", "ana"]
+
+
+def test_lote_gravado_por_outro_processo_invalida(banco):
+    assert auditoria.contar() == 0
+    codigo = ("import sys; from cyberfinance.db import configurar; from cyberfinance import auditoria; "
+              "configurar(sys.argv[1]); auditoria.registrar('Login Realizado', 'ana'); auditoria.descarregar()")
+    subprocess.run([sys.executable, "-c", codigo, get_pool().caminho], check=True)
+    assert auditoria.contar() == 1
+    assert auditoria.usuarios() == ["ana"]
@@ -0,0 +1,42 @@
+import bcrypt
+
+from cyberfinance import auth
+from cyberfinance.config import BCRYPT_CUSTO, SENHA_PADRAO_TEXTO, USUARIO_PADRAO
+from cyberfinance.db import run_query
+
+
+def test_token_identifica_o_usuario(banco):
+    auth.create_user("ana", "s3nha")
+    token = auth.emitir_token("ana", agora=1000)
+    assert auth.validar_token(token, agora=1000) == "ana"
+    assert auth.validar_token(token, agora=1000 + auth.SESSAO_HORAS * 3600 + 1) is None
+    assert auth.validar_token(token[:-2] + "xx", agora=1000) is None
+    assert auth.validar_token("lixo") is None
+    assert auth.validar_token(None) is None
+
+
+def test_logout_revoga_os_tokens_emitidos(banco):
+    auth.create_user("ana", "s3nha")
+    auth.create_user("bia", "s3nha")
+    antigos = [auth.emitir_token("ana"), auth.emitir_token("ana")]
+    da_bia = auth.emitir_token("bia")
+
+    auth.encerrar_sessoes("ana")
+
+    assert [auth.validar_token(t) for t in antigos] == [None, None]
+    assert auth.validar_token(da_bia) == "bia"
+    assert auth.validar_token(auth.emitir_token("ana")) == "ana"
+
+
+def test_trocar_a_senha_revoga_os_tokens(banco):
+    auth.create_user("ana", "s3nha")
+    token = auth.emitir_token("ana")
+    run_query("UPDATE usuarios SET password_hash = ? WHERE username = 'ana'", (auth.hash_senha("outra"),))
+    assert auth.validar_token(token) is None
+    assert auth.autenticar("ana", "outra") and not auth.autenticar("ana", "s3nha")
+
+
+def test_admin_padrao_usa_o_custo_da_config(banco):
+    hash_admin = auth.get_user_hash(USUARIO_PADRAO)
+    assert hash_admin.split("$")[2] == f"{BCRYPT_CUSTO:02d}"
+    assert bcrypt.checkpw(SENHA_PADRAO_TEXTO.encode("utf-8"), hash_admin.encode("utf-8"))
@@ -0,0 +1,44 @@
+import pandas as pd
+
+from cyberfinance import busca, recorrencias
+from cyberfinance.servicos import SQL_LANCAMENTO
+from cyberfinance.shards import pool_de
+
+
+def todas_as_paginas(usuario, termo, tamanho):
+    paginas, cursor = [], None
+    while True:
+        df, cursor = busca.buscar(usuario, termo, cursor, tamanho)
+        paginas.append(df)
+        if cursor is None:
+            return pd.concat(paginas, ignore_index=True)
+
+
+def test_busca_encontra_parcelas_e_contas_fixas(banco):
+    pool_de("ana").executar(SQL_LANCAMENTO, ("2025-01-20", "Hardware", "Capa para notebook", 9990, "Despesa", "ana"))
+    recorrencias.criar("ana", "Notebook Gamer", "Eletrônicos", 1000.0, "2025-01-31", quantidade=10, parcelado=True)
+    recorrencias.criar("ana", "Internet Fibra", "Contas Fixas", 99.9, "2025-01-05")
+    recorrencias.criar("bia", "Notebook da Bia", "Hardware", 500.0, "2025-01-10", quantidade=2, parcelado=True)
+
+    assert busca.totais("ana", "notebook") == (11, 99.9 + 1000.0)
+    assert busca.totais("ana", "eletronicos") == (10, 1000.0)
+    fixas = len(recorrencias.ocorrencias("ana").query("descricao == 'Internet Fibra'"))
+    assert busca.totais("ana", "internet fib") == (fixas, round(fixas * 99.9, 2))
+
+    df, proximo = busca.buscar("ana", "note 3")
+    assert df["descricao"].tolist() == ["Notebook Gamer (3/10)"] and proximo is None
+    assert df["destaque"].tolist() == ["«Notebook» Gamer («3»/10)"]
+    assert df["data"].dt.strftime("%Y-%m-%d").tolist() == ["2025-03-31"]
+    assert df["valor"].tolist() == [100.0]
+
+
+def test_paginas_juntam_linhas_e_ocorrencias_sem_repetir(banco):
+    pool_de("ana").executar_varios(SQL_LANCAMENTO, [(f"2025-{m:02d}-15", "Hardware", f"Notebook peça {m}", 1000,
+                                                     "Despesa", "ana") for m in range(1, 7)])
+    recorrencias.criar("ana", "Notebook", "Hardware", 1000.0, "2025-02-15", quantidade=10, parcelado=True)
+
+    tudo = todas_as_paginas("ana", "notebook", 4)
+    assert len(tudo) == busca.totais("ana", "notebook")[0] == 16
+    assert not tudo.duplicated(["data", "id"]).any()
+    assert tudo["data"].is_monotonic_decreasing
+    assert (tudo["id"] < 0).sum() == 10
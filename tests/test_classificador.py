@@ -0,0 +1,33 @@
+import pytest
+
+from cyberfinance import classificador
+from cyberfinance.db import get_pool
+
+
+@pytest.mark.parametrize("padrao, texto", [
+    (r"Água\s+Mineral", "AGUA MINERAL crystal"),
+    (r"pão de (queijo|mel)", "Pao de Mel"),
+    (r"NF\d+", "nf123 farmacia"),
+    (r"\D{3}ção", "Manutenção"),
+])
+def test_regex_casa_com_o_texto_normalizado(banco, padrao, texto):
+    classificador.adicionar_regra("ana", "Mercado", padrao, tipo="regex", prioridade=1)
+    assert classificador.classificar_ia(texto, "ana") == "Mercado"
+    assert classificador.classify_many([texto], "ana").tolist() == ["Mercado"]
+
+
+def test_regras_gravadas_por_fora_invalidam_o_motor(banco):
+    assert classificador.classificar_ia("Feira do bairro", "ana") == "Outros"
+    motor = classificador.motor_para("ana")
+    assert classificador.motor_para("ana") is motor
+
+    # outro processo (sem passar por adicionar_regra) grava uma regra global
+    get_pool().executar("INSERT INTO regras_classificacao (usuario, categoria, padrao, tipo, prioridade) "
+                        "VALUES ('*', 'Alimentação', 'feira', 'palavra', 5)")
+    assert classificador.classificar_ia("Feira do bairro", "ana") == "Alimentação"
+
+    regra_id = get_pool().consultar("SELECT id FROM regras_classificacao WHERE padrao = 'feira'")[0][0]
+    get_pool().executar("UPDATE regras_classificacao SET categoria = 'Lazer' WHERE id = ?", (regra_id,))
+    assert classificador.classificar_ia("Feira do bairro", "ana") == "Lazer"
+    get_pool().executar("DELETE FROM regras_classificacao WHERE id = ?", (regra_id,))
+    assert classificador.classificar_ia("Feira do bairro", "ana") == "Outros"
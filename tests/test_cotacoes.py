@@ -0,0 +1,64 @@
+import math
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from cyberfinance import cotacoes
+from cyberfinance.db import get_pool
+
+TAXAS = [("USD", "2025-01-10", 5.0), ("USD", "2025-02-01", 6.0), ("EUR", "2025-01-15", 6.5),
+         ("EUR", "2025-03-01", 7.0)]
+
+
+@pytest.fixture
+def historico(banco):
+    banco.executar_varios("INSERT INTO cotacoes (moeda, data, valor, obtido_em) VALUES (?,?,?,'2025-01-01')", TAXAS)
+    return banco
+
+
+def test_converte_quadro_misto_pela_data(historico):
+    df = pd.DataFrame({
+        "data": ["2025-01-10", "2025-01-31", "2025-02-01", "2025-01-01", "2025-01-20", "2025-04-01",
+                 "2025-01-05", None, "2025-01-20"],
+        "moeda": ["USD", "usd", "USD", "USD", "EUR", "EUR", "BRL", "USD", None],
+        "valor": [10.0, 10.0, 10.0, 10.0, 10.0, 10.0, 10.0, 10.0, 10.0],
+    })
+    out = cotacoes.converter_para_brl(df)
+    # dia exato, última anterior, nova taxa, antes da primeira, EUR, EUR depois da última,
+    # BRL, sem data (última conhecida), moeda nula (BRL)
+    assert out["taxa_brl"].tolist() == [5.0, 5.0, 6.0, 5.0, 6.5, 7.0, 1.0, 6.0, 1.0]
+    assert out["valor_brl"].tolist() == [50.0, 50.0, 60.0, 50.0, 65.0, 70.0, 10.0, 60.0, 10.0]
+    assert out.index.equals(df.index) and list(out.columns[:3]) == list(df.columns)
+
+
+def test_moeda_sem_cotacao_fica_nan(historico):
+    out = cotacoes.converter_para_brl(pd.DataFrame({"data": ["2025-01-10"] * 2, "moeda": ["BTC", "USD"],
+                                                    "valor": [1.0, 2.0]}))
+    assert math.isnan(out["taxa_brl"].iloc[0]) and out["valor_brl"].iloc[1] == 10.0
+
+
+def test_sem_coluna_de_moeda_tudo_em_brl(banco):
+    out = cotacoes.converter_para_brl(pd.DataFrame({"data": ["2025-01-10"], "valor": [3.0]}))
+    assert out["valor_brl"].tolist() == [3.0]
+
+
+def test_movimentacoes_tem_moeda_com_padrao_brl(historico):
+    historico.executar("INSERT INTO movimentacoes (data, categoria, descricao, valor_centavos, tipo, usuario) "
+                   "VALUES ('2025-01-10', 'Outros', 'x', 100, 'Despesa', 'ana')")
+    historico.executar("INSERT INTO movimentacoes (data, categoria, descricao, valor_centavos, tipo, usuario, moeda) "
+                   "VALUES ('2025-01-10', 'Outros', 'y', 100, 'Despesa', 'ana', 'USD')")
+    df = get_pool().consultar_df("SELECT data, moeda, valor FROM movimentacoes ORDER BY id")
+    assert cotacoes.converter_para_brl(df)["valor_brl"].tolist() == [1.0, 5.0]
+
+
+def test_falha_ao_gravar_nao_perde_a_cotacao(banco, monkeypatch, caplog):
+    def travado(*_):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(banco, "executar_varios", travado)
+    servico = cotacoes.ServicoCotacoes(cotacoes.ProvedorFixo({"USD": 5.2, "EUR": 6.1, "BTC": 1.0}))
+    res = servico.cotacao("USD")
+    assert (res["valor"], res["origem"]) == (5.2, "provedor")
+    assert "database is locked" in caplog.text
+    assert servico.cotacao("usd")["origem"] == "cache"
@@ -0,0 +1,81 @@
+import sqlite3
+
+import pytest
+
+from cyberfinance import migracoes
+
+# formato do financeiro.db original: sem ``usuario``, valor em reais (REAL), user_version 0
+DDL_LEGADO = [
+    "CREATE TABLE movimentacoes (id INTEGER PRIMARY KEY AUTOINCREMENT, data DATE, categoria TEXT, "
+    "descricao TEXT, valor REAL, tipo TEXT)",
+    "CREATE TABLE logs_auditoria (id INTEGER PRIMARY KEY AUTOINCREMENT, data_hora TEXT, acao TEXT, usuario TEXT)",
+    "CREATE TABLE metas (categoria TEXT PRIMARY KEY, valor_limite REAL)",
+]
+LINHAS = [
+    ("2025-01-05", "Alimentação", "Mercado", 109.9, "Despesa"),
+    ("2025-01-10", "Alimentação", "Padaria", 0.1 + 0.2, "Despesa"),
+    ("2025-01-20", "Receita", "Salário", 5432.1, "Receita"),
+    ("2025-02-01", "Transporte", "Uber", 19.99, "Despesa"),
+    ("2025-02-03", "Transporte", "Metrô", 4.4, "Despesa"),
+    ("2025-02-14", "Lazer", "Cinema", 1.005, "Despesa"),
+    ("2025-02-15", "Lazer", "Estorno cinema", -30.0, "Despesa"),
+    ("2025-03-01", "Contas Fixas", "Aluguel", 1500.0, "Despesa"),
+]
+
+
+@pytest.fixture
+def legado(tmp_path):
+    caminho = tmp_path / "financeiro.db"
+    conn = sqlite3.connect(caminho)
+    for ddl in DDL_LEGADO:
+        conn.execute(ddl)
+    conn.executemany("INSERT INTO movimentacoes (data, categoria, descricao, valor, tipo) VALUES (?,?,?,?,?)",
+                     LINHAS)
+    # a última linha apagada: o AUTOINCREMENT não pode reaproveitar o id dela
+    conn.execute("INSERT INTO movimentacoes (data, categoria, descricao, valor, tipo) "
+                 "VALUES ('2025-03-02', 'Outros', 'Apagada', 1, 'Despesa')")
+    conn.execute("DELETE FROM movimentacoes WHERE descricao = 'Apagada'")
+    conn.commit()
+    conn.close()
+    return caminho
+
+
+def test_migra_banco_legado(legado, abrir_banco):
+    originais = dict(sqlite3.connect(legado).execute("SELECT id, valor FROM movimentacoes").fetchall())
+    pool = abrir_banco(legado.name)
+    assert migracoes.versao(pool.conexao()) == 0
+
+    aplicadas = migracoes.migrar()
+
+    conn = pool.conexao()
+    # a 14 não é a última: o banco vai até a versão atual, não só até os centavos
+    assert migracoes.versao(conn) == migracoes.VERSAO_ATUAL
+    assert len(aplicadas) == migracoes.VERSAO_ATUAL
+    colunas = {r[1]: r[2] for r in conn.execute("PRAGMA table_info(movimentacoes)")}
+    assert colunas["valor_centavos"] == "INTEGER"
+    centavos = dict(conn.execute("SELECT id, valor_centavos FROM movimentacoes").fetchall())
+    assert centavos == {i: round(v * 100) for i, v in originais.items()}
+    assert conn.execute("SELECT DISTINCT usuario FROM movimentacoes").fetchall() == [("admin",)]
+    assert conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'movimentacoes'").fetchone() == (9,)
+    assert pool.executar("INSERT INTO movimentacoes (data, categoria, descricao, valor_centavos, tipo, usuario) "
+                         "VALUES ('2025-03-05', 'Outros', 'Nova', 100, 'Despesa', 'admin')").lastrowid == 10
+
+
+def test_resumo_confere_com_a_soma_das_linhas(legado, abrir_banco):
+    pool = abrir_banco(legado.name)
+    migracoes.migrar()
+    pool.executar("DELETE FROM movimentacoes WHERE descricao = 'Metrô'")
+    pool.executar("UPDATE movimentacoes SET valor_centavos = 2500 WHERE descricao = 'Uber'")
+
+    consulta = ("SELECT usuario, substr(data, 1, 7), tipo, categoria, SUM(valor_centavos), COUNT(*) "
+                "FROM movimentacoes GROUP BY 1, 2, 3, 4 ORDER BY 1, 2, 3, 4")
+    resumo = pool.consultar("SELECT usuario, mes, tipo, categoria, total_centavos, quantidade "
+                            "FROM resumo_mensal ORDER BY 1, 2, 3, 4")
+    assert resumo == pool.consultar(consulta)
+
+
+def test_migrar_de_novo_nao_aplica_nada(legado, abrir_banco):
+    abrir_banco(legado.name)
+    migracoes.migrar()
+    migracoes.esquecer()
+    assert migracoes.migrar() == []
@@ -0,0 +1,86 @@
+import pandas as pd
+import pytest
+
+from cyberfinance import recorrencias
+
+
+def regra(id=1, inicio="2025-01-10", quantidade=None, valor_centavos=10000, parcelado=False,
+          arredondamento="primeiras", intervalo_meses=1, encerrada_em=None, descricao="Conta"):
+    return {"id": id, "usuario": "ana", "descricao": descricao, "categoria": "Outros", "tipo": "Despesa",
+            "inicio": inicio, "quantidade": quantidade, "intervalo_meses": intervalo_meses,
+            "valor_centavos": valor_centavos, "parcelado": int(parcelado), "arredondamento": arredondamento,
+            "encerrada_em": encerrada_em}
+
+
+def expandir(*regras, ini=None, fim=None, hoje="2025-06-15"):
+    return recorrencias.expandir(pd.DataFrame(list(regras)), ini, fim, hoje)
+
+
+@pytest.mark.parametrize("total, n, arredondamento, esperado", [
+    (10000, 3, "primeiras", [3334, 3333, 3333]),
+    (10000, 3, "ultima", [3333, 3333, 3334]),
+    (10001, 3, "primeiras", [3334, 3334, 3333]),
+    (10001, 3, "ultima", [3333, 3333, 3335]),
+    (9999, 3, "primeiras", [3333, 3333, 3333]),
+    (5, 12, "primeiras", [1] * 5 + [0] * 7),
+])
+def test_parcelas_somam_o_total(total, n, arredondamento, esperado):
+    df = expandir(regra(valor_centavos=total, quantidade=n, parcelado=True, arredondamento=arredondamento))
+    assert df["valor_centavos"].tolist() == esperado
+    assert df["valor_centavos"].sum() == total
+    assert df["descricao"].tolist() == [f"Conta ({k}/{n})" for k in range(1, n + 1)]
+
+
+@pytest.mark.parametrize("inicio, intervalo, esperado", [
+    ("2025-01-31", 1, ["2025-01-31", "2025-02-28", "2025-03-31", "2025-04-30"]),
+    ("2024-01-31", 1, ["2024-01-31", "2024-02-29", "2024-03-31", "2024-04-30"]),
+    ("2025-01-30", 1, ["2025-01-30", "2025-02-28", "2025-03-30", "2025-04-30"]),
+    ("2024-11-30", 3, ["2024-11-30", "2025-02-28", "2025-05-30", "2025-08-30"]),
+])
+def test_dia_alem_do_fim_do_mes_cai_no_ultimo_dia(inicio, intervalo, esperado):
+    df = expandir(regra(inicio=inicio, quantidade=4, intervalo_meses=intervalo))
+    assert df["data"].tolist() == esperado
+
+
+@pytest.mark.parametrize("encerrada_em, meses", [
+    (None, ["2025-01", "2025-02", "2025-03", "2025-04", "2025-05", "2025-06"]),
+    ("2025-04-10", ["2025-01", "2025-02", "2025-03"]),   # o dia do encerramento já não gera
+    ("2025-04-11", ["2025-01", "2025-02", "2025-03", "2025-04"]),
+    ("2025-01-10", []),
+])
+def test_encerrada_em(encerrada_em, meses):
+    df = expandir(regra(inicio="2025-01-10", encerrada_em=encerrada_em))
+    assert df["data"].str.slice(0, 7).tolist() == meses
+
+
+def test_sem_fim_vai_ate_o_mes_corrente():
+    df = expandir(regra(inicio="2025-01-31"), hoje="2025-06-01")
+    assert df["data"].tolist()[-1] == "2025-06-30"
+    assert len(df) == 6
+
+
+@pytest.mark.parametrize("cortes", [
+    ["2024-12-01", "2025-01-01", "2025-02-01", "2025-03-01", "2025-04-01", "2025-07-01", "2026-01-01"],
+    ["2024-12-01", "2025-01-15", "2025-02-27", "2025-03-02", "2025-06-30", "2026-01-01"],
+    ["2024-12-01", "2025-01-31", "2025-02-28", "2025-03-31", "2026-01-01"],
+])
+def test_janelas_consecutivas_reproduzem_a_expansao_completa(cortes):
+    regras = [
+        regra(1, "2025-01-31", quantidade=10, valor_centavos=10000, parcelado=True),
+        regra(2, "2025-01-15", intervalo_meses=2),
+        regra(3, "2024-12-28", quantidade=4, intervalo_meses=3, valor_centavos=999, parcelado=True,
+              arredondamento="ultima"),
+        regra(4, "2025-02-28", encerrada_em="2025-05-28"),
+    ]
+    completa = expandir(*regras, ini=cortes[0], fim=cortes[-1])
+    partes = pd.concat([expandir(*regras, ini=a, fim=b) for a, b in zip(cortes, cortes[1:])], ignore_index=True)
+    chave = ["id", "data"]
+    assert not partes.duplicated(chave).any()
+    pd.testing.assert_frame_equal(partes.sort_values(chave, ignore_index=True),
+                                  completa.sort_values(chave, ignore_index=True))
+    assert completa.loc[completa["id"] == -1, "valor_centavos"].sum() == 10000
+
+
+def test_janela_fora_das_ocorrencias():
+    assert expandir(regra(quantidade=3), ini="2025-04-01", fim="2025-05-01").empty
+    assert list(expandir(ini="2025-01-01").columns) == recorrencias.COLUNAS
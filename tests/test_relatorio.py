@@ -0,0 +1,22 @@
+from datetime import date
+
+from cyberfinance import relatorio, servicos
+
+
+class _Data(date):
+    hoje = date(2025, 3, 20)
+
+    @classmethod
+    def today(cls):
+        return cls.hoje
+
+
+def test_pdf_reaproveitado_ate_a_virada_do_mes(banco, monkeypatch):
+    monkeypatch.setattr(relatorio, "date", _Data)
+    servicos.lancar_despesa("ana", "2025-03-10", "Padaria", 12.5, "Alimentação")
+    primeiro = relatorio.solicitar_relatorio("ana", "2025-03")
+    assert primeiro.result(timeout=30)[:4] == b"%PDF"
+    assert relatorio.solicitar_relatorio("ana", "2025-03") is primeiro
+
+    monkeypatch.setattr(_Data, "hoje", date(2025, 4, 1))
+    assert relatorio.solicitar_relatorio("ana", "2025-03") is not primeiro
@@ -0,0 +1,20 @@
+import pytest
+
+from cyberfinance import movimentacoes, recorrencias, servicos
+
+
+def test_parcelada_e_fixa_ao_mesmo_tempo_falha(banco):
+    with pytest.raises(ValueError):
+        servicos.lancar_despesa("ana", "2025-03-10", "Notebook", 3000.0, "Compras", parcelas=3, fixa=True)
+    assert recorrencias.regras("ana").empty
+
+
+def test_leituras_em_cache_veem_os_lancamentos(banco):
+    assert movimentacoes.kpis_mes("ana", "2025-03")["despesa"] == 0
+    servicos.lancar_despesa("ana", "2025-03-10", "Padaria", 12.5, "Alimentação")
+    assert movimentacoes.kpis_mes("ana", "2025-03")["despesa"] == 12.5
+    assert recorrencias.regras("ana").empty
+    servicos.lancar_despesa("ana", "2025-03-05", "Notebook", 300.0, "Compras", parcelas=3)
+    assert len(recorrencias.regras("ana")) == 1
+    servicos.lancar_receita("ana", "2025-03-01", "Salário", 5000.0)
+    assert movimentacoes.kpis_mes("ana", "2025-03")["receita"] == 5000
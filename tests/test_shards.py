@@ -0,0 +1,88 @@
+import os
+
+import pytest
+
+from cyberfinance import busca, shards
+from cyberfinance.db import get_pool
+
+USUARIOS = [None] + [f"user{i:02d}" for i in range(12)]
+SQL = ("INSERT INTO movimentacoes (data, categoria, descricao, valor_centavos, tipo, usuario) "
+       "VALUES (?,?,?,?,?,?)")
+
+
+def contar(pool, tabela):
+    return pool.consultar(f"SELECT COUNT(*) FROM {tabela}")[0][0]
+
+
+def contar_de(pool, tabela, usuario):
+    return pool.consultar(f"SELECT COUNT(*) FROM {tabela} WHERE usuario IS ?", (usuario,))[0][0]
+
+
+@pytest.fixture
+def dividido(banco):
+    linhas = [(f"2025-{m:02d}-10", "Alimentação", f"Mercado {u} {m}", 1000 * (i + 1) + m, "Despesa", u)
+              for i, u in enumerate(USUARIOS) for m in range(1, 1 + i % 4 + 1)]
+    banco.executar_varios(SQL, linhas)
+    banco.executar_varios("INSERT INTO metas_usuario (categoria, usuario, valor_limite) VALUES (?,?,?)",
+                          [("Lazer", u, 100.0) for u in USUARIOS if u])
+    # o maior id apagado antes da divisão não pode voltar num shard
+    banco.executar("DELETE FROM movimentacoes WHERE id = (SELECT MAX(id) FROM movimentacoes)")
+    esperado = {u: contar_de(banco, "movimentacoes", u) for u in USUARIOS}
+    copiados = shards.dividir(4)
+    return banco, esperado, copiados
+
+
+def test_linhas_de_cada_usuario_no_seu_shard(dividido):
+    catalogo, esperado, copiados = dividido
+    lista = shards.registrados()
+    assert len(lista) == 4
+    assert [os.path.basename(p.caminho) for p in lista] == [f"shard_{i:02d}.db" for i in range(4)]
+    assert len({shards.shard_de(u, 4) for u in USUARIOS}) > 1
+
+    por_shard = [sum(c for u, c in esperado.items() if shards.shard_de(u, 4) == i) for i in range(4)]
+    assert [linhas for _, linhas in copiados] == por_shard
+    assert [contar(p, "movimentacoes") for p in lista] == por_shard
+    for u, total in esperado.items():
+        assert shards.pool_de(u) is lista[shards.shard_de(u, 4)]
+        assert contar_de(shards.pool_de(u), "movimentacoes", u) == total
+        assert sum(contar_de(p, "movimentacoes", u) for p in lista) == total
+        if u:
+            assert contar_de(shards.pool_de(u), "metas_usuario", u) == 1
+    assert shards.pool_de(None) is shards.pool_de("")
+
+
+def test_catalogo_fica_sem_dados_de_usuario(dividido):
+    catalogo = get_pool()
+    for tabela in shards.TABELAS:
+        assert contar(catalogo, tabela) == 0, tabela
+    assert catalogo.consultar("SELECT COUNT(*) FROM movimentacoes_fts")[0][0] == 0
+    assert contar(catalogo, "usuarios") >= 1  # admin continua no catálogo
+    assert shards.pools() == shards.registrados()
+
+
+def test_resumo_e_fts_seguem_funcionando_no_shard(dividido):
+    _, esperado, _ = dividido
+    u = "user05"
+    pool = shards.pool_de(u)
+    antes = pool.consultar("SELECT total_centavos, quantidade FROM resumo_mensal "
+                           "WHERE usuario = ? AND mes = '2025-01' AND categoria = 'Alimentação'", (u,))[0]
+    assert busca.totais(u, "Mercado")[0] == esperado[u]
+
+    novo = pool.executar(SQL, ("2025-01-20", "Alimentação", "Quitanda Orgânica", 2550, "Despesa", u)).lastrowid
+    assert novo == sum(esperado.values()) + 2  # depois da linha apagada antes da divisão
+    depois = pool.consultar("SELECT total_centavos, quantidade FROM resumo_mensal "
+                            "WHERE usuario = ? AND mes = '2025-01' AND categoria = 'Alimentação'", (u,))[0]
+    assert depois == (antes[0] + 2550, antes[1] + 1)
+    assert pool.consultar("SELECT rowid FROM movimentacoes_fts WHERE movimentacoes_fts MATCH ?",
+                          ('"quitanda"*',)) == [(novo,)]
+    assert busca.totais(u, "quitanda") == (1, 25.5)
+
+    pool.executar("DELETE FROM movimentacoes WHERE id = ?", (novo,))
+    assert pool.consultar("SELECT total_centavos, quantidade FROM resumo_mensal "
+                          "WHERE usuario = ? AND mes = '2025-01' AND categoria = 'Alimentação'", (u,))[0] == antes
+    assert busca.totais(u, "quitanda")[0] == 0
+
+
+def test_dividir_duas_vezes_falha(dividido):
+    with pytest.raises(ValueError):
+        shards.dividir(4)